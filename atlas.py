@@ -0,0 +1,79 @@
+''' the images of gfx/mates, gfx/status_effects and gfx/icons packed into a texture atlas
+
+    python atlas.py
+
+packs them into gfx/atlas/game.atlas and gfx/atlas/game-0.png (the build needs Pillow, the
+game does not). Run it again after adding or changing images. At startup preload uploads
+the pages of the atlas once, get_texture then returns regions of them, so showing a Mate or
+a status effect never reads or decodes a png. Images missing from the atlas are loaded from
+their own file, an outdated atlas only costs some time.
+'''
+import glob
+import json
+import os
+
+from kivy.core.image import Image as CoreImage
+
+root = os.path.dirname(os.path.abspath(__file__))
+source_dirs = ('gfx/mates', 'gfx/status_effects', 'gfx/icons')
+atlas_path = 'gfx/atlas/game'
+page_size = 1536
+
+# path of an image -> its texture, a region of a page for the images in the atlas
+textures = {}
+# path of an image -> the page it is drawn from, the image itself if it is not in the atlas
+pages = {}
+# the whole texture of each page
+page_textures = {}
+# id in the atlas -> (page, texture)
+regions = {}
+
+def get_sources():
+    ''' the paths of the images packed into the atlas, relative to root '''
+    return sorted(path.replace(os.sep, '/') for folder in source_dirs for path in glob.glob(folder + '/*.png', root_dir=root))
+
+def get_uid(path):
+    ''' the id of an image in the atlas, as kivy.atlas names it: the path with _ for / '''
+    return os.path.splitext(path)[0].replace('/', '_')
+
+def build():
+    from kivy.atlas import Atlas
+    os.chdir(root)
+    os.makedirs(os.path.dirname(atlas_path), exist_ok=True)
+    for path in glob.glob(atlas_path + '*'):
+        os.remove(path)
+    Atlas.create(atlas_path, get_sources(), page_size, use_path=True)
+
+def preload():
+    ''' upload the pages of the atlas and the images missing from it '''
+    try:
+        with open(os.path.join(root, atlas_path + '.atlas')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    for name, ids in meta.items():
+        page = os.path.join(os.path.dirname(atlas_path), name)
+        texture = page_textures[page] = CoreImage(os.path.join(root, page)).texture
+        for uid, (x, y, w, h) in ids.items():
+            regions[uid] = page, texture.get_region(x, y, w, h)
+    for path in get_sources():
+        get_texture(path)
+
+def get_texture(path):
+    texture = textures.get(path)
+    if texture is None:
+        if get_uid(path) in regions:
+            pages[path], texture = regions[get_uid(path)]
+        else:
+            pages[path] = path
+            texture = page_textures[path] = CoreImage(os.path.join(root, path)).texture
+        textures[path] = texture
+    return texture
+
+def get_page(path):
+    ''' the page the image at path is drawn from, see page_textures '''
+    get_texture(path)
+    return pages[path]
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,37 @@
+''' helpers shared by the benchmarks and the tests: timing, empty boards and running kivy
+without a display '''
+import os
+import sys
+import timeit
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import engine
+
+# kivy opens an offscreen window with a mock OpenGL backend, unless told otherwise
+offscreen_defaults = {'SDL_VIDEODRIVER': 'offscreen', 'KIVY_WINDOW': 'sdl2', 'KIVY_GL_BACKEND': 'mock'}
+
+def get_offscreen_environ():
+    ''' a copy of os.environ running kivy headless, without parsing the command line and
+    logging through the logging module '''
+    environ = dict(os.environ)
+    for name, value in offscreen_defaults.items():
+        environ.setdefault(name, value)
+    environ.update(KIVY_NO_ARGS='1', KIVY_LOG_MODE='PYTHON')
+    return environ
+
+def use_offscreen_window():
+    ''' run kivy headless in this process, has to be called before kivy is imported '''
+    os.environ.update(get_offscreen_environ())
+
+def best(function, number, repeat=5):
+    ''' the best time of one call in seconds '''
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+def create_empty_match(cols=engine.cols, rows=None):
+    ''' a sandbox Match with no Mates on the board '''
+    match = engine.Match('sandbox', cols=cols, rows=rows, seed=0)
+    for mate in match.get_mates():
+        match.set_cell(match.index(mate), None)
+    return match
@@ -0,0 +1,89 @@
+''' frame benchmark: the time of a frame of the board screen, growing boards full of Mates
+
+    python benchmarks/frame.py
+
+Runs the app (offscreen if no display is set) and compares the Ticker with the dispatch it
+replaced, where every layout passed update on to all of its children and the bars of every
+Mate were refreshed each frame. Frames are timed while the timer runs and while the game
+waits for the player to choose an ability. The memory column is the Python memory kept by
+the board of the match and its view.
+'''
+import os
+import random
+import sys
+import tracemalloc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+os.chdir(root)
+
+from common import best, use_offscreen_window
+
+use_offscreen_window()
+
+from kivy.clock import Clock
+
+import main
+
+# (cols, number of mates)
+boards = ((7, 8), (16, 64), (24, 256))
+dt = 1/60.
+
+def tree_walk(widget):
+    ''' the dispatch before the Ticker: layouts called update on all of their children and
+    skipped those raising AttributeError, the PlayingField refreshed all Mates '''
+    for child in widget.children:
+        if isinstance(child, main.PlayingField):
+            child.dirty = True
+            child.update(dt)
+        elif isinstance(child, (main.BoardScreen, main.BasicBoxLayout, main.MagicMatesGame)):
+            tree_walk(child)
+        else:
+            try:
+                child.update(dt)
+            except AttributeError:
+                pass
+
+def fill_board(playing_field, cols, mates):
+    ''' a sandbox match on a cols x cols board with Mates on random cells, none of them ever ready '''
+    playing_field.cols = cols
+    playing_field.rows = cols
+    playing_field.start_game('sandbox')
+    match = playing_field.match
+    cells = [k for k in range(cols**2) if match.cells[k] is None]
+    random.Random(0).shuffle(cells)
+    for k in range(mates - len(match.get_mates())):
+        match.create_mate(1 + k%2, [], 'axe', cells[k])
+    for mate in match.get_mates():
+        mate.t = -1e9
+    playing_field.sync_board()
+
+def benchmark(app):
+    sm = app.root
+    sm.current = 'board'
+    game = sm.screens_dict['board'].ids['game']
+    playing_field = game.ids['playing_field']
+    print('{:<16} {:<10} {:>14} {:>14} {:>10}'.format('board', 'state', 'tree walk', 'ticker', 'memory'))
+    for cols, mates in boards:
+        playing_field.start_game('sandbox')
+        tracemalloc.start()
+        fill_board(playing_field, cols, mates)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        for state, is_running in (('running', True), ('waiting', False)):
+            game.is_running = is_running
+            times = []
+            for frame in (lambda: tree_walk(sm), lambda: main.ticker.update(dt)):
+                times.append(best(frame, 20))
+            print('{:<16} {:<10} {:>11.3f} ms {:>11.3f} ms {:>7.0f} kB'.format('{0}x{0}, {1} mates'.format(cols, mates),
+                    state, times[0] * 1e3, times[1] * 1e3, memory / 2**10))
+
+if __name__ == '__main__':
+    app = main.magicmatesApp()
+    def run(*args):
+        try:
+            benchmark(app)
+        finally:
+            app.stop()
+    Clock.schedule_once(run, 0)
+    app.run()
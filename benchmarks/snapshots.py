@@ -0,0 +1,50 @@
+''' snapshot benchmark: the cost of Match.clone and Match.snapshot and the memory of many snapshots
+
+    python benchmarks/snapshots.py
+
+Matches are played by random_ai, snapshots are taken at the start of every turn and kept.
+'''
+import math
+import os
+import sys
+import tracemalloc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import engine
+from common import best
+
+retained = 10000
+
+def create_match(turns=150, seed=1):
+    ''' a standard Match played for some turns '''
+    match = engine.Match('standard', seed=seed)
+    match.controllers = {1: engine.random_ai, 2: engine.random_ai}
+    while match.winner is None and match.turn < turns:
+        match.update(math.inf)
+    return match
+
+def retain_snapshots(count):
+    ''' snapshots of the turns of seeded matches, until count are kept '''
+    snapshots = []
+    seed = 0
+    while len(snapshots) < count:
+        match = engine.Match('standard', seed=seed)
+        match.controllers = {1: engine.random_ai, 2: engine.random_ai}
+        while match.winner is None and match.turn < 1000 and len(snapshots) < count:
+            match.update(math.inf)
+            snapshots.append(match.snapshot())
+        seed += 1
+    return snapshots
+
+if __name__ == '__main__':
+    match = create_match()
+    for name in ('clone', 'snapshot'):
+        seconds = best(getattr(match, name), 2000)
+        print('{:<10} {:>8.1f} us'.format(name, seconds * 1e6))
+    tracemalloc.start()
+    snapshots = retain_snapshots(retained)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{} snapshots: {:.1f} MB peak, {:.1f} kB each'.format(retained, peak / 2**20, current / retained / 2**10))
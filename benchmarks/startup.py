@@ -0,0 +1,117 @@
+''' startup benchmark: loading the game data, creating Mates/Abilities, the time to the first frame
+and the number of textures uploaded for the images
+
+    python benchmarks/startup.py
+
+The "pandas" rows repeat what the game did before the compiled data registry (read_csv and
+DataFrame.loc lookups) and are skipped if pandas is not installed.
+'''
+import gc
+import os
+import subprocess
+import sys
+import tracemalloc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import gamedata
+import engine
+from common import best, get_offscreen_environ
+
+# started in a fresh interpreter with get_offscreen_environ, prints the seconds from start to
+# the first frame and the number of textures the images of the board were uploaded as
+first_frame_script = '''
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+from kivy.clock import Clock
+app = main.magicmatesApp()
+def first_frame(dt):
+    print(time.perf_counter() - start, len(main.atlas.page_textures))
+    app.stop()
+Clock.schedule_once(first_frame, 0)
+app.run()
+'''
+
+def report(name, seconds):
+    print('{:<40}{:>12.1f} us'.format(name, seconds * 1e6))
+
+def bench_registry():
+    report('compile csv tables', best(gamedata.compile_tables, 20))
+    gamedata.load_tables()
+    report('load cached tables', best(gamedata.load_tables, 20))
+    match = engine.Match('sandbox')
+    report('Ability()', best(lambda: engine.Ability('heal'), 2000))
+    report('Mate()', best(lambda: engine.Mate(match, 1, ['heal', 'burn', 'stun'], 'axe'), 500))
+
+def bench_summons():
+    ''' summoning and killing a zombie again and again, as summons do in a match '''
+    match = engine.Match('sandbox')
+    ability = engine.Ability('summon zombie')
+    index = match.cells.index(None)
+    def summon():
+        match.create_summon(1, index, ability).die()
+    report('summon and kill a Mate', best(summon, 500))
+    # dead Mates are in reference cycles, only what survives a collection is kept
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(1000):
+        summon()
+    gc.collect()
+    allocated = (tracemalloc.get_traced_memory()[0] - before) / 1000
+    tracemalloc.stop()
+    print('{:<40}{:>12.0f} B'.format('memory kept per summoned Mate', allocated))
+
+def bench_pandas():
+    try:
+        import pandas as pd
+    except ImportError:
+        print('pandas not installed, skipping the pandas baseline')
+        return
+    def interpreter(code):
+        return best(lambda: subprocess.run([sys.executable, '-c', code]), 1, repeat=3)
+    report('pandas import', interpreter('import pandas') - interpreter('pass'))
+    path = os.path.join(root, 'data')
+    def read_tables():
+        return [pd.read_csv(os.path.join(path, name), sep='\t', index_col=0)
+                for name in ('abilities.csv', 'status_effects.csv', 'weapons.csv', 'tutorial.csv')]
+    report('pandas read_csv tables', best(read_tables, 5))
+    ability_data, status_effect_data, weapon_data, tutorial_data = read_tables()
+    def create_ability(name='heal'):
+        return (int(ability_data.loc[name]['manacost']), ability_data.loc[name]['target type'], ability_data.loc[name]['reach'],
+                ability_data.loc[name]['time usage'], ability_data.loc[name]['info'])
+    def create_weapon(weapon='axe'):
+        return (float(weapon_data.loc[weapon]['damage']), float(weapon_data.loc[weapon]['damage reduction front']),
+                float(weapon_data.loc[weapon]['damage reduction side']), float(weapon_data.loc[weapon]['starting armor']),
+                float(weapon_data.loc[weapon]['max armor']), float(weapon_data.loc[weapon]['max t']))
+    def create_mate():
+        # move, attack, pass and three more abilities
+        for i in range(6):
+            create_ability()
+        create_weapon()
+    report('pandas Ability() lookups', best(create_ability, 200))
+    report('pandas Mate() lookups', best(create_mate, 50))
+
+def bench_first_frame():
+    script = first_frame_script.format(root=root)
+    times = []
+    for i in range(3):
+        output = subprocess.run([sys.executable, '-c', script], env=get_offscreen_environ(),
+                capture_output=True, text=True, timeout=120).stdout
+        try:
+            seconds, textures = output.split()[-2:]
+            times.append(float(seconds))
+        except ValueError:
+            print('no first frame, is there a window available?')
+            return
+    report('time to first frame', min(times))
+    print('{:<40}{:>12}'.format('textures of the images', textures))
+
+if __name__ == '__main__':
+    bench_registry()
+    bench_summons()
+    bench_pandas()
+    bench_first_frame()
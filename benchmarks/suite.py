@@ -0,0 +1,172 @@
+''' benchmark suite: reach queries, damage, status effects, creation, startup and whole matches
+
+    python benchmarks/suite.py --json before.json
+    ... change something ...
+    python benchmarks/suite.py --compare before.json
+
+Runs headless and reports the best time of a single call of every benchmark. --json saves the
+results, --compare flags the benchmarks that got slower than a saved run by more than the
+threshold (10% by default) and exits with status 1 if there are any. --only runs some of the
+groups: reach, damage, status_effects, creation, startup and matches.
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import engine
+import tick
+from common import best, create_empty_match, get_offscreen_environ
+
+pieces = ('sword', 'axe', 'spear', 'knight', 'bishop', 'rook', 'queen')
+
+def create_board(mates=0, weapon='axe', cols=engine.cols, rows=None):
+    ''' a sandbox Match with a Mate of team 1 in the center and more Mates of both teams on
+    random cells, all cells taken for mates=-1; returns the Match and the Mate '''
+    match = create_empty_match(cols, rows)
+    center = match.cell(match.rows // 2, cols // 2)
+    mate = match.create_mate(1, [], weapon, center)
+    cells = [k for k in range(len(match.cells)) if k != center]
+    random.Random(0).shuffle(cells)
+    for k, cell in enumerate(cells[:mates] if mates >= 0 else cells):
+        match.create_mate(1 + k%2, [], 'axe', cell)
+    return match, mate
+
+def bench_reach(results):
+    boards = (('empty', 'move', create_board()), ('crowded', 'enemy', create_board(-1)),
+            ('32x32 256 mates', 'enemy', create_board(256, cols=32)))
+    for board, target_type, (match, mate) in boards:
+        for piece in pieces:
+            query = getattr(match, 'get_{}_index'.format(piece))
+            results['reach {} {}'.format(piece, board)] = best(lambda: query(mate, target_type), 2000)
+
+def bench_damage(results):
+    ''' change_health of a Mate with a shield hit from every direction, with and without armor,
+    its shield raised or broken, pierced or not '''
+    match, defender = create_board(weapon='sword and shield')
+    attackers = {}
+    for index in range(match.cols**2):
+        if match.cells[index] is None:
+            attacker = match.create_mate(2, [], 'axe', index)
+            direction = ('front', 'side', 'back')[engine.get_direction(defender, attacker)]
+            if direction in attackers:
+                attacker.die()
+            else:
+                attackers[direction] = attacker
+    for shield in ('plain', 'shield raise', 'shield breaker'):
+        if shield != 'plain':
+            defender.create_status_effect(engine.Ability(shield), defender)
+        for direction, attacker in attackers.items():
+            for armor in (50., 0.):
+                for pierce in (False, True):
+                    def hit():
+                        defender.health = 100.
+                        defender.armor = armor
+                        defender.change_health(10., 0., attacker, pierce)
+                    name = 'change_health {} {} {}{}'.format(shield, direction,
+                            'armor' if armor else 'no armor', ' pierce' if pierce else '')
+                    results[name] = best(hit, 2000)
+        for status_effect in list(defender.status_effects):
+            defender.remove_status_effect(status_effect)
+    results['change_health heal'] = best(lambda: defender.change_health(0., 1.), 2000)
+
+def bench_status_effects(results):
+    ''' a tick of the timer, every Mate poisoned or regenerating (see tick.py) '''
+    for cols, mates in tick.boards[:2]:
+        match = tick.create_match(cols, mates)
+        results['tick {}x{} {} mates'.format(cols, cols, mates)] = best(match.tick, 200)
+
+def bench_creation(results):
+    match = engine.Match('sandbox', seed=0)
+    results['Ability()'] = best(lambda: engine.Ability('heal'), 2000)
+    results['Mate()'] = best(lambda: engine.Mate(match, 1, ['heal', 'burn', 'stun'], 'axe'), 500)
+
+def bench_startup(results):
+    ''' the import of main.py in a fresh interpreter, kivy and its window included '''
+    env = get_offscreen_environ()
+    def interpreter(code):
+        return best(lambda: subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                capture_output=True, check=True), 1, repeat=3)
+    try:
+        results['import main'] = interpreter('import main') - interpreter('pass')
+    except subprocess.CalledProcessError:
+        print('main.py could not be imported, skipping the startup benchmark')
+
+def play_skirmish(seed, turns=100):
+    ''' the first turns of a match of 120 Mates per team on a 32x24 board played by random_ai '''
+    team = [('axe', ('heal', 'stun', 'burn')), ('spear', ('poison', 'regenerate', 'stab back')),
+            ('bow', ('multishot', 'pierce attack', 'freeze'))] * 40
+    match = engine.Match('standard', cols=32, rows=24, seed=seed, teams={1: team, 2: team})
+    match.controllers = {1: engine.random_ai, 2: engine.random_ai}
+    while match.winner is None and match.turn < turns:
+        match.update(math.inf)
+
+def bench_matches(results):
+    ''' whole standard matches played by random_ai and the start of a large skirmish, the seeds fixed '''
+    seeds = iter(range(10**6))
+    results['simulate standard'] = best(lambda: engine.simulate('standard', seed=next(seeds)), 10, repeat=3)
+    results['skirmish 32x24 240 mates 100 turns'] = best(lambda: play_skirmish(next(seeds)), 1, repeat=3)
+
+groups = {'reach': bench_reach, 'damage': bench_damage, 'status_effects': bench_status_effects,
+        'creation': bench_creation, 'startup': bench_startup, 'matches': bench_matches}
+
+def run(names=None):
+    ''' the results of the groups of benchmarks (all by default), name -> seconds per call '''
+    results = {}
+    for name in names or groups:
+        groups[name](results)
+    return results
+
+def print_results(results):
+    for name, seconds in results.items():
+        print('{:<48}{:>12.2f} us'.format(name, seconds * 1e6))
+    if 'simulate standard' in results:
+        print('{:<48}{:>12.1f}'.format('standard matches per second', 1 / results['simulate standard']))
+
+def compare(results, baseline, threshold):
+    ''' print the change against the baseline, returns the names of the regressions '''
+    regressions = []
+    print('{:<48}{:>12} {:>12} {:>8}'.format('benchmark', 'before', 'after', 'change'))
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ''
+        if change > threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = 'faster'
+        print('{:<48}{:>9.2f} us {:>9.2f} us {:>+7.1%} {}'.format(name, baseline[name] * 1e6, seconds * 1e6, change, flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='headless benchmarks of the engine and the startup')
+    parser.add_argument('--json', help='save the results to this file')
+    parser.add_argument('--compare', help='compare to the results saved in this file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown flagged as regression')
+    parser.add_argument('--only', nargs='+', choices=list(groups), help='only these groups of benchmarks')
+    args = parser.parse_args()
+    results = run(args.only)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('{} regressions beyond {:.0%}'.format(len(regressions), args.threshold))
+            sys.exit(1)
+    else:
+        print_results(results)
+
+if __name__ == '__main__':
+    main()
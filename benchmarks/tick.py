@@ -0,0 +1,39 @@
+''' tick benchmark: the time of a single Match.tick for boards with more and more Mates
+
+    python benchmarks/tick.py
+
+Every Mate carries a few StatusEffects and never gets ready, so only the timer runs.
+'''
+import os
+import random
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import engine
+from common import best, create_empty_match
+
+# (cols, number of mates)
+boards = ((7, 8), (16, 64), (24, 256), (32, 512))
+
+def create_match(cols, mates):
+    ''' a Match on a cols x cols board with Mates on random cells, all of them poisoned or regenerating '''
+    rng = random.Random(0)
+    match = create_empty_match(cols)
+    cells = list(range(len(match.cells)))
+    rng.shuffle(cells)
+    for k in range(mates):
+        mate = match.create_mate(1 + k%2, [], 'axe', cells[k])
+        if k%2:
+            mate.create_status_effect(engine.Ability('poison'), mate)
+        if k%3 == 0:
+            mate.create_status_effect(engine.Ability('regenerate'), mate)
+        mate.t = -1e9
+    return match
+
+if __name__ == '__main__':
+    for cols, mates in boards:
+        match = create_match(cols, mates)
+        seconds = best(match.tick, 200)
+        print('{:>3}x{:<3} {:>4} mates {:>10.1f} us/tick'.format(cols, cols, mates, seconds * 1e6))
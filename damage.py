@@ -0,0 +1,48 @@
+''' the damage of hits: from which direction a Mate is hit and how much its shield and armor block
+
+Both work on floats as well as on numpy arrays, so many hits can be evaluated at once;
+resolve_hit does the same for a single hit without the overhead of numpy.
+'''
+import functools
+
+import numpy as np
+
+# the directions a Mate can be hit from
+FRONT = 0
+SIDE = 1
+BACK = 2
+
+@functools.lru_cache(maxsize=None)
+def get_direction_table(rows):
+    ''' the direction a defender is hit from, table[higher, defender row, attacker row]
+    with higher = 1 if the team of the defender is higher than the team of the attacker
+
+    Mates face the rows of the other team, so hits from the same row come from the side.
+    '''
+    defender = np.arange(rows)[:, None]
+    attacker = np.arange(rows)[None, :]
+    table = np.empty((2, rows, rows), dtype=np.int8)
+    table[0] = np.where(defender == attacker, SIDE, np.where(defender > attacker, BACK, FRONT))
+    table[1] = np.where(defender == attacker, SIDE, np.where(defender > attacker, FRONT, BACK))
+    table.flags.writeable = False
+    return table
+
+def resolve_damage(damage, armor, reduction, armor_block):
+    ''' resolve a hit: the shield takes the share reduction of the damage, then armor blocks
+    the share armor_block of the rest as long as it lasts
+
+    returns (health damage, armor left, armor damage), the armor broke if armor damage > armor
+    '''
+    damage = (1-reduction) * damage
+    armor_damage = armor_block * damage
+    damage = (1-armor_block) * damage
+    damage = damage + np.maximum(armor_damage - armor, 0.)
+    return damage, np.maximum(armor - armor_damage, 0.), armor_damage
+
+def resolve_hit(damage, armor, reduction, armor_block):
+    ''' resolve_damage for a single hit given as floats '''
+    damage = (1-reduction) * damage
+    armor_damage = armor_block * damage
+    damage = (1-armor_block) * damage
+    damage = damage + max(armor_damage - armor, 0.)
+    return damage, max(armor - armor_damage, 0.), armor_damage
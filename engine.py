@@ -0,0 +1,1338 @@
+''' the rules of magic mates without any kivy: board, mates, abilities, status effects and the turn timer
+
+The widgets in main.py only observe a Match, so a match can also run headless:
+
+    match = simulate('standard')
+    print(match.winner, match.turn)
+'''
+import math
+import random
+from types import MappingProxyType
+from typing import NamedTuple
+
+import numpy as np
+
+import gamedata
+import profiler
+from damage import BACK, FRONT, SIDE, get_direction_table, resolve_damage, resolve_hit
+from roster import Roster, column_property, effect_property, float_columns
+from reach import get_indices, get_ray_tables, get_reach_tables, get_sliding_mask
+from scheduler import Scheduler
+from search import SearchAI
+
+# the number of cols (and by default also rows) of the board
+cols = 7
+# the smallest board the setups of all game modes fit on, in rows and in cols
+min_size = 4
+
+ability_data = gamedata.abilities
+status_effect_data = gamedata.status_effects
+weapon_data = gamedata.weapons
+summon_data = gamedata.summons
+
+# a dictionary with the available upgrades for an Ability
+ability_upgrades_dict = {'freeze': ['stunning freeze', 'everlasting freeze', 'freeze blade'],
+        'burn': ['stacking burn', 'everlasting burn', 'burn blade'],
+        'quick attack': ['remove manacost', 'damage increase'],
+        'heal': ['heal all', 'cleanse', 'stronger heal'],
+        'cleanse': ['cleanse all', 'cleanse debuffs', 'quicken'],
+        'purge': ['purge all', 'purge buffs', 'quicken'],
+        'shield raise': ['raise all', 'counter attack', 'cleanse'],
+        'double attack': ['triple attack', 'increase damage', 'reduce manacost'],
+        'morale raise': ['cleanse', 'quicken'],
+        'novices thunder': ['purge', 'reduce manacost', 'quicken', 'increase damage', 'add strike', 'add random target'],
+        'manaburn': ['mana steal', 'strong manaburn', 'manaburn blade']}
+
+def shallow_copy(obj):
+    ''' like copy.copy for the plain classes of the engine, but a lot faster '''
+    new = obj.__class__.__new__(obj.__class__)
+    new.__dict__.update(obj.__dict__)
+    return new
+
+def copy_rng(rng):
+    ''' an independent random.Random in the same state '''
+    copy = random.Random()
+    copy.setstate(rng.getstate())
+    return copy
+
+def get_direction(mate1, mate2):
+    ''' get the direction (FRONT, SIDE or BACK) mate1 is hit from by mate2, used for shields damage reduction '''
+    match = mate1.match
+    return match.directions.item(int(mate1.team > mate2.team), match.index(mate1) // match.cols, match.index(mate2) // match.cols)
+
+class AbilityDefinition(NamedTuple):
+    ''' the data of an Ability shared by all Mates using it '''
+    base: str
+    manacost: float
+    target_type: str
+    reach: str
+    time_usage: str
+    info: str
+    # the flags an Ability starts with, just its name
+    upgrades: frozenset
+    possible_upgrades: tuple
+    level_up_experience: float
+    effect: object
+
+# the AbilityDefinitions by name, created on first use
+ability_definitions = {}
+
+def get_ability_definition(name):
+    ''' the shared definition of the named Ability '''
+    definition = ability_definitions.get(name)
+    if definition is None:
+        data = ability_data[name]
+        definition = AbilityDefinition(name, data.manacost, data.target_type, data.reach, data.time_usage, data.info,
+                frozenset((name,)), tuple(ability_upgrades_dict.get(name, ())),
+                5 if name in ability_upgrades_dict else math.inf, None)
+        definition = definition._replace(effect=get_ability_effect(definition))
+        ability_definitions[name] = definition
+    return definition
+
+class Ability():
+    ''' the progress of a Mate with an Ability: experience, level, upgrades and the manacost
+    they lead to; the rest is read from its shared AbilityDefinition
+
+    Clones of a Match share the Abilities of their Mates, a Mate changing one of them
+    (experience, upgrades) gets its own copy first, see Mate.own_ability. All fields hold
+    immutable values, so copies share them as well.
+    slot is the position of the Ability in mate.abilities, None for one a Mate does not own.
+    '''
+    __slots__ = ('definition', 'manacost', 'experience', 'level', 'upgrades', 'possible_upgrades',
+            'level_up_experience', 'slot', 'generation')
+
+    def __init__(self, name):
+        definition = get_ability_definition(name)
+        self.definition = definition
+        self.manacost = definition.manacost
+        self.experience = 0
+        self.level = 1
+        # a set of flags, so upgrade checks do not scan
+        self.upgrades = definition.upgrades
+        self.possible_upgrades = definition.possible_upgrades
+        self.level_up_experience = definition.level_up_experience
+        self.slot = None
+        # the generation of the Match allowed to change the Ability in place
+        self.generation = None
+
+    def copy(self, generation):
+        ''' a copy to change in the Match of the generation '''
+        ability = Ability.__new__(Ability)
+        ability.definition = self.definition
+        ability.manacost = self.manacost
+        ability.experience = self.experience
+        ability.level = self.level
+        ability.upgrades = self.upgrades
+        ability.possible_upgrades = self.possible_upgrades
+        ability.level_up_experience = self.level_up_experience
+        ability.slot = self.slot
+        ability.generation = generation
+        return ability
+
+    def level_up(self, upgrade):
+        if upgrade == 'remove manacost':
+            self.manacost = 0.
+        if upgrade == 'reduce manacost':
+            self.manacost = 0.5 * self.manacost
+        if upgrade in self.possible_upgrades:
+            k = self.possible_upgrades.index(upgrade)
+            self.possible_upgrades = self.possible_upgrades[:k] + self.possible_upgrades[k+1:]
+            if not self.possible_upgrades:
+                self.level_up_experience = math.inf
+            self.upgrades = self.upgrades | {upgrade}
+
+def definition_property(name):
+    ''' a read only property viewing the field name of the AbilityDefinition '''
+    def get(self):
+        return getattr(self.definition, name)
+    return property(get)
+
+for name in ('base', 'target_type', 'reach', 'time_usage', 'info', 'effect'):
+    setattr(Ability, name, definition_property(name))
+
+# the modes of all StatusEffects, in the order of data/status_effects.csv
+status_effect_modes = tuple(dict.fromkeys(record.mode for record in status_effect_data.values()))
+mode_slots = {mode: slot for slot, mode in enumerate(status_effect_modes)}
+empty_slots = (None,) * len(status_effect_modes)
+
+class StatusEffects():
+    ''' the StatusEffects of a Mate, held in one slot per mode
+
+    mask has the bit of the slot set for every active mode, so checking for a mode is a
+    bit test, effect_active in the Roster row of the Mate mirrors it for Match.tick.
+    Iterating goes over a snapshot in slot order, so StatusEffects can be removed meanwhile.
+    Without any StatusEffect slots is the shared empty_slots, a list is made on the first add.
+    '''
+    __slots__ = ('roster', 'row', 'slots', 'mask')
+
+    def __init__(self, mate):
+        self.roster = mate.roster
+        self.row = mate.row
+        self.slots = empty_slots
+        self.mask = 0
+
+    def copy(self, mate):
+        ''' a copy for the copied Mate of a cloned Match '''
+        status_effects = StatusEffects.__new__(StatusEffects)
+        status_effects.roster = mate.roster
+        status_effects.row = self.row
+        status_effects.mask = self.mask
+        if self.mask:
+            status_effects.slots = [None if status_effect is None else status_effect.copy(mate) for status_effect in self.slots]
+        else:
+            status_effects.slots = empty_slots
+        return status_effects
+
+    def __iter__(self):
+        if not self.mask:
+            return iter(())
+        return iter([status_effect for status_effect in self.slots if status_effect is not None])
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __contains__(self, status_effect):
+        slot = mode_slots.get(status_effect.mode)
+        return slot is not None and self.slots[slot] is status_effect
+
+    def has(self, mode):
+        ''' whether a StatusEffect of the mode is active '''
+        slot = mode_slots.get(mode)
+        return slot is not None and self.mask >> slot & 1 == 1
+
+    def get(self, mode):
+        ''' the StatusEffect of the mode, None if not active '''
+        slot = mode_slots.get(mode)
+        if slot is None:
+            return None
+        return self.slots[slot]
+
+    def add(self, status_effect):
+        slot = mode_slots[status_effect.mode]
+        if self.slots is empty_slots:
+            self.slots = list(empty_slots)
+        self.slots[slot] = status_effect
+        self.mask |= 1 << slot
+        self.roster.effect_active[self.row, slot] = True
+
+    def remove(self, status_effect):
+        slot = mode_slots[status_effect.mode]
+        if self.slots[slot] is status_effect:
+            self.slots[slot] = None
+            self.mask &= ~(1 << slot)
+            self.roster.effect_active[self.row, slot] = False
+
+class StatusEffect():
+    ''' a permanent or temporary change (buff/debuff) on a Mate
+
+    The behaviour of each mode is looked up once in the handler tables below the classes.
+    t and stacks are views of the slot of the mode in the Roster row of the Mate.
+    '''
+    __slots__ = ('ability', 'mate', 'mode', 'sign', 'roster', 'row', 'slot', 'active', 'health_change', 'remove_effect')
+
+    t = effect_property('effect_t')
+    stacks = effect_property('effect_stacks')
+
+    def __init__(self, ability, source, target):
+        self.ability = ability
+        self.mate = target
+        data = status_effect_data[ability.base]
+        self.mode = data.mode
+        self.sign = data.sign
+        self.roster = target.roster
+        self.row = target.row
+        self.slot = mode_slots[self.mode]
+        self.t = 0.
+        self.stacks = 0
+        self.active = True
+        self.health_change = health_change_handlers.get(self.mode)
+        self.remove_effect = remove_handlers.get(self.mode)
+
+    def copy(self, mate):
+        ''' a copy for the copied Mate of a cloned Match, sharing the Ability '''
+        status_effect = StatusEffect.__new__(StatusEffect)
+        status_effect.ability = self.ability
+        status_effect.mate = mate
+        status_effect.mode = self.mode
+        status_effect.sign = self.sign
+        status_effect.roster = mate.roster
+        status_effect.row = self.row
+        status_effect.slot = self.slot
+        status_effect.active = self.active
+        status_effect.health_change = self.health_change
+        status_effect.remove_effect = self.remove_effect
+        return status_effect
+
+    def apply_status_effect(self, ability, source, target):
+        self.stacks += 1
+        self.t += 200.
+        apply_effect = apply_handlers.get(ability.base)
+        if apply_effect is not None:
+            apply_effect(self, ability, source, target)
+
+    def remove_status_effect(self):
+        if not self.active:
+            return
+        self.active = False
+        mate = self.mate
+        if self.remove_effect is not None:
+            self.remove_effect(self)
+        if self in mate.status_effects:
+            mate.status_effects.remove(self)
+        mate.match.emit('status_effect_removed', mate, self)
+
+    def get_health_change(self):
+        ''' the health gained (or lost) by the Mate each tick, None for StatusEffects not changing health '''
+        if self.health_change is None:
+            return None
+        return self.health_change(self)
+
+# the numbers a new Mate starts with, before its weapon is applied
+mate_defaults = {'max_t': 100., 't': 0.,
+        'max_health': 100., 'health': 100., 'health_regen': 0.02,
+        'max_armor': 100., 'armor': 1., 'armor_regen': 0.,
+        'max_mana': 100., 'mana': 100., 'mana_regen': 0.1,
+        'base_damage': 0., 'damage_reduction_front': 0., 'damage_reduction_side': 0.}
+
+# the Roster columns of new Mates, by weapon and by summoning ability, created on first use
+weapon_prototypes = {}
+summon_prototypes = {}
+
+def get_weapon_prototype(weapon):
+    ''' the numbers of a new Mate with the weapon, all but t '''
+    prototype = weapon_prototypes.get(weapon)
+    if prototype is None:
+        data = weapon_data[weapon]
+        prototype = dict(mate_defaults)
+        del prototype['t']
+        prototype.update(base_damage=data.damage, damage_reduction_front=data.damage_reduction_front,
+                damage_reduction_side=data.damage_reduction_side, armor=data.starting_armor,
+                max_armor=data.max_armor, max_t=data.max_t)
+        prototype = weapon_prototypes[weapon] = MappingProxyType(prototype)
+    return prototype
+
+def get_summon_prototype(name):
+    ''' the numbers of a Mate summoned by the named ability, see data/summons.csv,
+    summons carry the shield of their armament and start their turn soon '''
+    prototype = summon_prototypes.get(name)
+    if prototype is None:
+        data = summon_data[name]
+        prototype = dict(get_weapon_prototype(data.armament))
+        prototype.update(max_health=data.max_health, health=data.health, max_armor=data.max_armor, armor=data.armor,
+                max_mana=data.max_mana, mana=data.mana, max_t=data.max_t, base_damage=data.damage,
+                health_regen=data.health_regen, t=1.)
+        prototype = summon_prototypes[name] = MappingProxyType(prototype)
+    return prototype
+
+class Mate():
+    ''' the rules side of a character, the mages moving on the board
+
+    The numbers of a Mate (health, mana, t, team, ...) are views of its row in the Roster
+    of the Match.
+    '''
+    __slots__ = ('match', 'roster', 'row', 'abilities', 'status_effects', 'weapon')
+
+    armor_block_front = 0.66
+    armor_block_side = 0.33
+
+    def __init__(self, match, team, abilities, weapon, prototype=None):
+        ''' a Mate with the numbers of the prototype, by default the one of the weapon with a random t '''
+        self.match = match
+        self.roster = match.roster
+        self.row = self.roster.add(self)
+        match.scheduler.add(self)
+        if prototype is None:
+            prototype = get_weapon_prototype(weapon)
+        roster = self.roster
+        row = self.row
+        for name, value in prototype.items():
+            getattr(roster, name)[row] = value
+        self.alive = True
+        self.team = team
+        self.abilities = [Ability('move'), Ability('attack')]
+        for abil in abilities:
+            self.abilities.append(Ability(abil))
+        self.abilities.append(Ability('pass'))
+        for slot, ability in enumerate(self.abilities):
+            ability.slot = slot
+            ability.generation = match.generation
+        self.status_effects = StatusEffects(self)
+        self.weapon = weapon
+        if 't' not in prototype:
+            self.t = match.rng.random() * self.max_t
+
+    def change_health(self, damage, heal, source = None, pierce = False):
+        if not self.alive:
+            return
+        if source:
+            direction = get_direction(self, source)
+            if direction == BACK:
+                self.match.emit('hit_from_back', self, source)
+            shield = self.get_shield_factor()
+            reduction = (shield * self.damage_reduction_front, shield * self.damage_reduction_side, 0.)[direction]
+            if pierce:
+                armor_block = 0.
+            else:
+                armor_block = (self.armor_block_front, self.armor_block_side, 0.)[direction]
+            armor = self.armor
+            damage, self.armor, armor_damage = resolve_hit(damage, armor, reduction, armor_block)
+            if armor_damage > armor:
+                self.match.emit('armor_broken', self, source)
+        # one read and one write of the Roster row instead of going through the properties each time
+        roster = self.roster
+        row = self.row
+        health = roster.health.item(row) - damage + heal
+        max_health = roster.max_health.item(row)
+        if health > max_health:
+            health = max_health
+        roster.health[row] = health
+        if health < 0.:
+            self.die()
+
+    def copy(self, match):
+        ''' a copy of the Mate for the cloned Match, its numbers are copied with the Roster,
+        its Abilities and their list are shared until changed '''
+        mate = Mate.__new__(Mate)
+        mate.match = match
+        mate.roster = match.roster
+        mate.row = self.row
+        mate.abilities = self.abilities
+        mate.weapon = self.weapon
+        mate.status_effects = self.status_effects.copy(mate)
+        return mate
+
+    def detach(self, roster):
+        ''' move the Mate, dead, to row 0 of a Roster of its own, its row went to a new Mate '''
+        self.roster = roster
+        self.row = 0
+        status_effects = self.status_effects
+        status_effects.roster = roster
+        status_effects.row = 0
+        for status_effect in status_effects:
+            status_effect.roster = roster
+            status_effect.row = 0
+
+    def own_ability(self, ability):
+        ''' the Ability of the Mate to change in place: the one in its slot, copied first if it is
+        shared with clones of the Match; abilities the Mate does not own are returned as they are '''
+        slot = ability.slot
+        if slot is None:
+            return ability
+        ability = self.abilities[slot]
+        generation = self.match.generation
+        if ability.generation is generation:
+            return ability
+        copy = ability.copy(generation)
+        abilities = list(self.abilities)
+        abilities[slot] = copy
+        self.abilities = abilities
+        # StatusEffects created with the Ability keep following it
+        for mate in self.roster.mates:
+            for status_effect in mate.status_effects:
+                if status_effect.ability is ability:
+                    status_effect.ability = copy
+        return copy
+
+    def get_shield_factor(self):
+        ''' the factor of the shields damage reduction, raised and broken shields block more or less '''
+        if self.status_effects.has('shield raised'):
+            return 1.5
+        if self.status_effects.has('shield broken'):
+            return 0.5
+        return 1.
+
+    def change_mana(self, manacost, managain):
+        roster = self.roster
+        row = self.row
+        mana = roster.mana.item(row) - manacost + managain
+        if mana < 0:
+            mana = 0
+        max_mana = roster.max_mana.item(row)
+        if mana > max_mana:
+            mana = max_mana
+        roster.mana[row] = mana
+
+    def attack(self, target, damage, pierce = False):
+        ''' attacking a target Mate '''
+        if not self.alive or not target.alive:
+            return
+        invigorated = self.status_effects.get('invigorated')
+        if invigorated is not None:
+            damage = (invigorated.stacks+1) * damage
+            self.remove_status_effect(invigorated)
+        for mode in ('freeze blade', 'burn blade', 'manaburn blade'):
+            blade = self.status_effects.get(mode)
+            if blade is not None:
+                target.create_status_effect(blade.ability, self)
+        shield = target.status_effects.get('shield raise')
+        if shield is not None:
+            if 'counter attack' in shield.ability.upgrades:
+                self.change_health(target.base_damage, 0, source = target)
+                # bug: counter attack has infinite reach, does not apply ability blades and also triggers from backside
+        target.change_health(damage, 0, source = self, pierce = pierce)
+
+    def create_status_effect(self, ability, source):
+        ''' add a new status_effect to the Mate, or stack it onto an existing one '''
+        status_effect = self.status_effects.get(status_effect_data[ability.base].mode)
+        if status_effect is not None:
+            status_effect.apply_status_effect(ability, source, self)
+            return
+        status_effect = StatusEffect(ability, source, self)
+        self.status_effects.add(status_effect)
+        status_effect.apply_status_effect(ability, source, self)
+
+    def remove_status_effect(self, status_effect):
+        ''' remove a StatusEffect by reference '''
+        status_effect.remove_status_effect()
+
+    def remove_random_status_effect(self, sign=True):
+        ''' remove a single StatusEffect from the Mate, can be discriminated by sign '''
+        status_effects = self.get_status_effects(sign)
+        if status_effects:
+            self.remove_status_effect(self.match.rng.choice(status_effects))
+
+    def remove_status_effects(self, sign=True):
+        ''' remove all StatusEffects from the Mate, or discriminate by sign '''
+        for status_effect in self.get_status_effects(sign):
+            self.remove_status_effect(status_effect)
+
+    def get_status_effects(self, sign=True):
+        ''' get a list of all StatusEffects applied, or only the buffs/debuffs '''
+        if sign is True:
+            return list(self.status_effects)
+        return [status_effect for status_effect in self.status_effects if status_effect.sign == sign]
+
+    def push_back(self, target):
+        ''' push an enemy Mate one cell further away, unless the cell is taken or off the board '''
+        if not target.alive:
+            return
+        match = self.match
+        target_index = match.index(target)
+        self_row, self_col = divmod(match.index(self), match.cols)
+        target_row, target_col = divmod(target_index, match.cols)
+        # one step in the direction from self to the target, straight or diagonal
+        row = target_row + (target_row > self_row) - (target_row < self_row)
+        col = target_col + (target_col > self_col) - (target_col < self_col)
+        if 0 <= row < match.rows and 0 <= col < match.cols:
+            push_index = match.cell(row, col)
+            if match.cells[push_index] is None:
+                match.switch_positions(target_index, push_index)
+
+    def end_ability(self, ability, index):
+        ''' perform the ability on the cell index (None for abilities without a target) and end the turn '''
+        match = self.match
+        if match.recorder is not None:
+            match.recorder.record_action(self, ability, index)
+        ability = self.own_ability(ability)
+        target = match.cells[index] if index is not None else None
+        self.change_mana(ability.manacost, 0)
+        ability.experience += 1
+        if ability.experience >= ability.level_up_experience:
+            ability.level += 1
+            ability.experience = 0
+            match.level_up(self, ability)
+        ability.effect(self, ability, target, index)
+        self.end_turn(ability)
+
+    def end_turn(self, ability):
+        ''' end the turn by resetting t '''
+        if ability.time_usage == 'full':
+            self.t = 0.
+        elif ability.time_usage == 'half' or 'quicken' in ability.upgrades:
+            self.t = 0.5 * self.max_t
+        else:
+            raise Exception('time usage invalid')
+        self.match.end_turn(self, ability)
+
+    def die(self):
+        ''' called when the mate dies '''
+        if self.alive:
+            self.alive = False
+            self.match.remove_mate(self)
+
+for name in float_columns + ('team', 'alive'):
+    setattr(Mate, name, column_property(name))
+
+# the effects of abilities, (mate, ability, target, index) -> None, keyed by the ability name;
+# abilities not listed here apply the StatusEffect of the same name (see get_ability_effect)
+ability_effects = {}
+
+def ability_effect(*names):
+    ''' register the decorated function as the effect of the named abilities '''
+    def register(effect):
+        for name in names:
+            ability_effects[name] = effect
+        return effect
+    return register
+
+def get_ability_effect(ability):
+    ''' find the effect of an Ability, done once for its AbilityDefinition '''
+    if ability.target_type == 'move':
+        return use_move
+    if ability.base in ability_effects:
+        return ability_effects[ability.base]
+    if 'summon' in ability.base:
+        return use_summon
+    return use_status_effect
+
+def use_move(mate, ability, target, index):
+    match = mate.match
+    match.switch_positions(match.index(mate), index)
+
+def use_summon(mate, ability, target, index):
+    mate.match.create_summon(mate.team, index, ability)
+
+def use_status_effect(mate, ability, target, index):
+    target.create_status_effect(ability, mate)
+
+@ability_effect('shield bash', 'stab back', 'powershot')
+def use_push_attack(mate, ability, target, index):
+    mate.attack(target, 0.5*mate.base_damage)
+    mate.push_back(target)
+
+@ability_effect('multishot')
+def use_multishot(mate, ability, target, index):
+    match = mate.match
+    targets = [match.cells[i] for i in match.get_queen_index(mate, ability.target_type)]
+    for target in targets:
+        mate.attack(target, mate.base_damage)
+
+@ability_effect('swirl')
+def use_swirl(mate, ability, target, index):
+    match = mate.match
+    targets = [match.cells[i] for i in match.get_axe_index(mate, ability.target_type)]
+    for target in targets:
+        mate.attack(target, mate.base_damage)
+
+@ability_effect('pass')
+def use_pass(mate, ability, target, index):
+    mate.change_mana(0, 10)
+
+@ability_effect('heal')
+def use_heal(mate, ability, target, index):
+    healing = 30
+    if 'stronger heal' in ability.upgrades:
+        healing = 50
+    if 'heal all' in ability.upgrades:
+        for ally in mate.match.get_mates(mate.team):
+            ally.change_health(0, healing)
+    else:
+        target.change_health(0, healing)
+
+@ability_effect('health gift')
+def use_health_gift(mate, ability, target, index):
+    target.change_health(0, 30)
+    mate.change_health(30, 0)
+
+@ability_effect('mana gift')
+def use_mana_gift(mate, ability, target, index):
+    target.change_mana(0, 30)
+
+@ability_effect('morale raise')
+def use_morale_raise(mate, ability, target, index):
+    target.t += 0.5 * (target.max_t - target.t)
+    if 'cleanse' in ability.upgrades:
+        target.remove_random_status_effect(sign='debuff')
+
+@ability_effect('novices thunder')
+def use_novices_thunder(mate, ability, target, index):
+    match = mate.match
+    damage = 5
+    if 'increase damage' in ability.upgrades:
+        damage = 10
+    possible_targets = [enemy for enemy in match.get_mates() if mate.team != enemy.team]
+    targets = [target]
+    if 'add random target' in ability.upgrades:
+        targets.append(match.rng.choice(possible_targets))
+    for target in targets:
+        target.change_health(damage, 0, source = mate)
+        if 'purge' in ability.upgrades:
+            target.remove_random_status_effect(sign='buff')
+
+@ability_effect('cleanse')
+def use_cleanse(mate, ability, target, index):
+    sign = True
+    if 'cleanse debuffs' in ability.upgrades:
+        sign = 'debuff'
+    if 'cleanse all' in ability.upgrades:
+        target.remove_status_effects(sign=sign)
+    else:
+        target.remove_random_status_effect(sign=sign)
+
+@ability_effect('purge')
+def use_purge(mate, ability, target, index):
+    sign = True
+    if 'purge buffs' in ability.upgrades:
+        sign = 'buff'
+    if 'steal' in ability.upgrades:
+        raise Exception('Implementation pending')
+    if 'purge all' in ability.upgrades:
+        target.remove_status_effects(sign=sign)
+    else:
+        target.remove_random_status_effect(sign=sign)
+
+@ability_effect('attack', 'knights attack')
+def use_attack(mate, ability, target, index):
+    mate.attack(target, mate.base_damage)
+
+@ability_effect('vampiric bite')
+def use_vampiric_bite(mate, ability, target, index):
+    mate.attack(target, mate.base_damage)
+    mate.change_health(0, mate.base_damage)
+
+@ability_effect('sacrificial attack')
+def use_sacrificial_attack(mate, ability, target, index):
+    mate.attack(target, 1.5*mate.base_damage)
+    mate.change_health(mate.base_damage, 0, pierce = True)
+
+@ability_effect('pierce attack')
+def use_pierce_attack(mate, ability, target, index):
+    mate.attack(target, mate.base_damage, pierce = True)
+
+@ability_effect('axe pull')
+def use_axe_pull(mate, ability, target, index):
+    match = mate.match
+    match.switch_positions(match.index(mate), index)
+    mate.attack(target, mate.base_damage)
+
+@ability_effect('mana strike')
+def use_mana_strike(mate, ability, target, index):
+    damage = (1. + 0.02 * mate.mana) * mate.base_damage
+    mate.attack(target, damage)
+    mate.mana = 0.0
+
+@ability_effect('quick attack')
+def use_quick_attack(mate, ability, target, index):
+    modifier = 0.5
+    if 'increase damage' in ability.upgrades:
+        modifier = 0.75
+    mate.attack(target, modifier*mate.base_damage)
+
+@ability_effect('double attack')
+def use_double_attack(mate, ability, target, index):
+    modifier = 0.6
+    if 'increase damage' in ability.upgrades:
+        modifier = 0.8
+    mate.attack(target, modifier * mate.base_damage)
+    mate.attack(target, modifier * mate.base_damage)
+    if 'triple attack' in ability.upgrades:
+        mate.attack(target, modifier * mate.base_damage)
+
+@ability_effect('electrocute')
+def use_electrocute(mate, ability, target, index):
+    mate.attack(target, 2.*mate.base_damage)
+    target.t += 0.5 * (target.max_t - target.t)
+
+# the extra effects of applying a StatusEffect, (status_effect, ability, source, target) -> None,
+# keyed by the ability name
+def apply_freeze(status_effect, ability, source, target):
+    if 'stunning freeze' in ability.upgrades:
+        target.create_status_effect(Ability('stun'), status_effect)
+    else:
+        target.t = 0.5 * target.t
+    if 'everlasting freeze' in ability.upgrades:
+        status_effect.t = math.inf
+    target.max_t += 10
+
+def apply_shield_breaker(status_effect, ability, source, target):
+    # a broken shield cancels a raised one and vanishes
+    other = target.status_effects.get('shield raised')
+    if other is not None:
+        other.remove_status_effect()
+        status_effect.remove_status_effect()
+
+def apply_shield_raise(status_effect, ability, source, target):
+    other = target.status_effects.get('shield broken')
+    if other is not None:
+        other.remove_status_effect()
+        status_effect.remove_status_effect()
+
+def apply_burn(status_effect, ability, source, target):
+    if 'everlasting burn' in ability.upgrades:
+        status_effect.t = math.inf
+
+def apply_manaburn(status_effect, ability, source, target):
+    manacost = 30
+    if 'strong manaburn' in ability.upgrades:
+        manacost = 60
+    if 'mana steal' in ability.upgrades:
+        source.change_mana(0, min(manacost, target.mana))
+    target.change_mana(manacost, 0)
+
+def apply_stun(status_effect, ability, source, target):
+    status_effect.t = math.inf
+
+apply_handlers = {'freeze': apply_freeze,
+        'shield breaker': apply_shield_breaker,
+        'shield raise': apply_shield_raise,
+        'burn': apply_burn,
+        'manaburn': apply_manaburn,
+        'stun': apply_stun}
+
+# the health change per tick of a StatusEffect, keyed by its mode
+def poisoned_health_change(status_effect):
+    return -2.*status_effect.mate.health_regen
+
+def regenerating_health_change(status_effect):
+    return status_effect.stacks*status_effect.mate.health_regen
+
+def burning_health_change(status_effect):
+    if 'stacking burn' in status_effect.ability.upgrades:
+        return -status_effect.stacks*0.2
+    return -0.2
+
+def manaburning_health_change(status_effect):
+    return -status_effect.stacks*status_effect.mate.mana_regen
+
+health_change_handlers = {'poisoned': poisoned_health_change,
+        'regenerating': regenerating_health_change,
+        'burning': burning_health_change,
+        'manaburning': manaburning_health_change}
+
+# the extra effects of a StatusEffect when it is removed, keyed by its mode
+def remove_frozen(status_effect):
+    mate = status_effect.mate
+    mem_t = mate.t / mate.max_t
+    mate.max_t -= status_effect.stacks * 10
+    mate.t = mem_t * mate.max_t
+
+remove_handlers = {'frozen': remove_frozen}
+
+# the tick of the StatusEffects of one mode for many Mates at once, used by Match.tick:
+# health changes (roster, rows, slot) -> array, equal to health_change_handlers bit for bit,
+# and extra effects (roster, rows, slot) -> the rows whose StatusEffect ends
+def poisoned_health_changes(roster, rows, slot):
+    return -2.*roster.health_regen[rows]
+
+def regenerating_health_changes(roster, rows, slot):
+    return roster.effect_stacks[rows, slot]*roster.health_regen[rows]
+
+def burning_health_changes(roster, rows, slot):
+    stacking = np.array(['stacking burn' in roster.mates[row].status_effects.slots[slot].ability.upgrades for row in rows], dtype=bool)
+    return np.where(stacking, -roster.effect_stacks[rows, slot]*0.2, -0.2)
+
+def manaburning_health_changes(roster, rows, slot):
+    return -roster.effect_stacks[rows, slot]*roster.mana_regen[rows]
+
+def tick_stunned(roster, rows, slot):
+    roster.t[rows] -= 2.
+    return rows[roster.t[rows] < 0]
+
+health_changes_handlers = {'poisoned': poisoned_health_changes,
+        'regenerating': regenerating_health_changes,
+        'burning': burning_health_changes,
+        'manaburning': manaburning_health_changes}
+tick_handlers = {'stunned': tick_stunned}
+
+# the compositions of the standard mode, (weapon, abilities) per Mate
+standard_teams = {
+    1: (('axe', ('rookie charge', 'axe pull', 'invigorate')),
+        ('sword and shield', ('shield raise', 'heal', 'cleanse')),
+        ('magic staff', ('summon zombie', 'summon ghost', 'freeze')),
+        ('bow', ('multishot', 'pierce attack', 'knights move'))),
+    2: (('longsword', ('pierce attack', 'sacrificial attack', 'bishop charge')),
+        ('spear', ('stab back', 'quick attack', 'double attack')),
+        ('axe and buckler', ('pierce attack', 'sacrificial attack', 'purge')),
+        ('wand and buckler', ('manaburn', 'burn', 'summon golem')))}
+
+def tutorial_ai(match, mate):
+    ''' the tutorials opponent, hitting enemies randomly while being unable to move '''
+    game_mode = match.game_mode
+    if game_mode == 'tutorial shields':
+        targets = match.get_axe_index(mate, 'enemy')
+        if targets:
+            return Ability('attack'), match.ai_rng.choice(targets)
+    elif game_mode == 'tutorial weapons':
+        # the targets of its own attack, abilities[1]
+        targets = match.get_action_targets(mate).get(mate.abilities[1])
+        if targets:
+            if mate.weapon == 'spear':
+                ability = 'stab back'
+            else:
+                ability = 'attack'
+            return Ability(ability), match.ai_rng.choice(targets)
+    return Ability('pass'), None
+
+def random_ai(match, mate):
+    ''' choose uniformly among all legal actions of the Mate '''
+    return match.ai_rng.choice(match.get_legal_actions(mate))
+
+class Match():
+    ''' a single game: the board with its mates and the turn timer
+
+    cells mirrors the children of the PlayingField, holding a Mate or None for an empty field.
+    Each tick every Mate (in cell order) regenerates, gains time and ticks its StatusEffects,
+    a Mate whose t reached max_t then starts its turn and the timer waits until it ended.
+    update advances the timer through the Scheduler, which skips the ticks between events.
+    occupied and team_masks are bitboards of the cells (bit index set for a Mate on cells[index]),
+    kept up to date by set_cell, so reach patterns and target types resolve with bit operations.
+    set_cell also maintains positions, mapping each Mate on the board to its cell index.
+    Teams listed in controllers are played by a callable (match, mate) -> (ability, index),
+    all other turns wait for use_ability, as done by the user interface.
+    '''
+    def __init__(self, game_mode='standard', cols=cols, rows=None, seed=None, listener=None, teams=None):
+        # the board has rows x cols cells, square by default
+        self.cols = cols
+        self.rows = cols if rows is None else rows
+        if self.rows < min_size or cols < min_size:
+            raise ValueError('the board needs at least {0} rows and {0} cols, not {1}x{2}'.format(min_size, self.rows, cols))
+        # all random numbers of the rules come from rng, the random choices of AIs from ai_rng,
+        # so the seed and the choices made (see replay.py) reproduce a match
+        self.seed = random.randrange(2**63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.ai_rng = random.Random('ai {}'.format(self.seed))
+        # set by replay.Recorder to log the choices made
+        self.recorder = None
+        self.reach = get_reach_tables(self.rows, cols)
+        self.directions = get_direction_table(self.rows)
+        self.rays = get_ray_tables(self.rows, cols)
+        self.board_mask = (1 << self.rows*cols) - 1
+        self.listener = listener
+        self.start_game(game_mode, teams)
+
+    def start_game(self, game_mode, teams=None):
+        ''' set up the board of the game mode, teams replaces the compositions of the standard mode '''
+        rows = self.rows
+        # the setups are centered on the middle column
+        mid = self.cols // 2
+        self.game_mode = game_mode
+        self.teams = teams
+        # Abilities of this generation are not shared with clones, see Mate.own_ability
+        self.generation = object()
+        self.cells = [None] * (rows*self.cols)
+        self.occupied = 0
+        self.team_masks = {1: 0, 2: 0}
+        self.positions = {}
+        self.roster = Roster(len(status_effect_modes))
+        self.controllers = {}
+        self.active = None
+        self.winner = None
+        self.t = 0
+        self.turn = 0
+        self.board_version = 0
+        # (key, targets) of the last get_action_targets
+        self.action_cache = None
+        self.scheduler = Scheduler(self)
+
+        if game_mode == 'tutorial basic movement':
+            mate = self.create_mate(1, ['rookie charge', 'bishop charge', 'knights move'], 'axe', self.cell(rows//2, mid))
+            mate.armor = mate.max_armor
+        elif game_mode == 'tutorial basic attacking':
+            self.create_mate(1, ['pierce attack', 'invigorate', 'sacrificial attack'], 'axe', self.cell(rows//2, mid))
+            mate = self.create_mate(2, [], 'axe', self.cell(rows//2 + 1, mid))
+            mate.health_regen = 0.4
+            mate.armor = mate.max_armor
+        elif game_mode == 'tutorial shields':
+            self.create_mate(1, ['shield raise', 'shield breaker'], 'axe and buckler', self.cell(rows//2 - 1, mid)).t = 90
+            self.create_mate(1, ['heal'], 'spear', self.cell(rows//2 - 2, mid)).t = 40
+            self.create_mate(2, [], 'sword and shield', self.cell(rows//2 + 1, mid)).t = 70
+        elif game_mode == 'tutorial weapons':
+            self.create_mate(1, ['axe pull'], 'axe', self.cell(0, mid - 1)).t = 10
+            self.create_mate(1, ['bishop charge'], 'bow', self.cell(0, mid)).t = 70
+            self.create_mate(1, ['heal'], 'longsword', self.cell(0, mid + 1)).t = 80
+            self.create_mate(2, [], 'magic staff', self.cell(rows - 1, mid))
+            self.create_mate(2, ['stab back'], 'spear', self.cell(rows - 2, mid))
+            self.create_mate(2, [], 'sword and shield', self.cell(rows - 3, mid))
+        elif game_mode == 'tutorial abilities':
+            self.create_mate(1, ['axe pull'], 'axe', self.cell(0, mid))
+        elif game_mode in ('standard', 'versus ai'):
+            if teams is None:
+                teams = standard_teams
+            for team in (1, 2):
+                self.create_team(team, teams[team])
+        elif game_mode == 'sandbox':
+            self.create_mate(1, ['stab back', 'rookie charge'], 'axe', 1)
+            self.create_mate(2, ['stab back', 'rookie charge'], 'axe', 2)
+
+        if 'tutorial' in game_mode:
+            self.controllers[2] = tutorial_ai
+        elif game_mode == 'versus ai':
+            self.controllers[2] = SearchAI()
+
+    def clone(self, rng=None):
+        ''' a copy of the match to look ahead with, without listener and recorder,
+        optionally drawing the random numbers of the rules and AIs from rng
+
+        Mates and StatusEffects are copied, as they point to their Match and Roster, but they
+        are small slotted objects and their numbers come with the Roster arrays, cut down to
+        the rows in use. The Abilities are shared copy-on-write: both matches get a new
+        generation, so each copies an Ability before its first change.
+        '''
+        match = shallow_copy(self)
+        match.listener = None
+        match.recorder = None
+        if rng is not None:
+            match.rng = rng
+            match.ai_rng = rng
+        self.generation = object()
+        match.generation = object()
+        match.roster = self.roster.copy()
+        mates = {None: None}
+        for mate in self.roster.mates:
+            copy = mate.copy(match)
+            mates[mate] = copy
+            match.roster.mates.append(copy)
+        match.cells = [mates[mate] for mate in self.cells]
+        match.positions = {mates[mate]: index for mate, index in self.positions.items()}
+        match.team_masks = dict(self.team_masks)
+        match.controllers = dict(self.controllers)
+        match.active = mates[self.active]
+        match.action_cache = None
+        match.scheduler = Scheduler(match)
+        return match
+
+    def snapshot(self):
+        ''' a clone with copies of both random number generators, so it goes on exactly like
+        this match would, e.g. for undo '''
+        match = self.clone()
+        match.rng = copy_rng(self.rng)
+        match.ai_rng = copy_rng(self.ai_rng)
+        return match
+
+    def emit(self, event, *args):
+        ''' forward an event (e.g. 'turn_started', 'level_up', 'armor_broken') to the listener '''
+        if self.listener is not None:
+            self.listener(event, *args)
+
+    def index(self, mate):
+        ''' the cell index of a Mate on the board '''
+        return self.positions[mate]
+
+    def cell(self, row, col):
+        ''' the cell index of a row and col of the board '''
+        return row*self.cols + col
+
+    def get_mates(self, team=None):
+        ''' get all Mates in cell order, optionally only the ones of a team '''
+        return [mate for mate in self.cells if mate is not None and (team is None or mate.team == team)]
+
+    def set_cell(self, index, mate):
+        ''' put a Mate (or None) on the cell index, updating the bitboards and positions '''
+        bit = 1 << index
+        old = self.cells[index]
+        if old is not None:
+            self.occupied &= ~bit
+            self.team_masks[old.team] &= ~bit
+            if self.positions.get(old) == index:
+                del self.positions[old]
+                self.roster.cell[old.row] = -1
+        if mate is not None:
+            self.occupied |= bit
+            self.team_masks[mate.team] = self.team_masks.get(mate.team, 0) | bit
+            self.positions[mate] = index
+            self.roster.cell[mate.row] = index
+        self.cells[index] = mate
+
+    def switch_positions(self, index1, index2):
+        ''' switch positions of two cells '''
+        mate1 = self.cells[index1]
+        self.set_cell(index1, self.cells[index2])
+        self.set_cell(index2, mate1)
+        self.board_version += 1
+
+    def create_mate(self, team, abilities, weapon, index):
+        ''' create a new Mate on the empty cell index '''
+        mate = Mate(self, team, abilities, weapon)
+        self.set_cell(index, mate)
+        self.board_version += 1
+        return mate
+
+    def create_team(self, team, composition):
+        ''' create the Mates of a composition, a list of (weapon, abilities), on the first rows
+        of team 1 or the last rows of team 2, skipping the outer and the middle columns;
+        each team fills at most half of the rows, raises ValueError if the Mates do not fit '''
+        cols = self.cols
+        cells = [self.cell(row, col) for row in range(self.rows // 2)
+                for col in range(1, cols-1) if col != cols // 2]
+        if not composition:
+            raise ValueError('team {} has no Mates'.format(team))
+        if len(composition) > len(cells):
+            raise ValueError('team {} has {} Mates, only {} fit on a {}x{} board'.format(
+                    team, len(composition), len(cells), self.rows, cols))
+        for (weapon, abilities), cell in zip(composition, cells):
+            if team == 2:
+                cell = len(self.cells) - 1 - cell
+            self.create_mate(team, list(abilities), weapon, cell)
+
+    def create_summon(self, team, index, ability):
+        ''' create a new Mate from the prototype of the summoning Ability '''
+        try:
+            data = summon_data[ability.base]
+        except KeyError:
+            raise Exception('Implementation pending')
+        summon = Mate(self, team, data.abilities, data.weapon, get_summon_prototype(ability.base))
+        self.set_cell(index, summon)
+        self.board_version += 1
+        return summon
+
+    def remove_mate(self, mate):
+        ''' remove a Mate from the board, the last Mate of a team standing wins the match '''
+        self.set_cell(self.index(mate), None)
+        self.board_version += 1
+        if self.active is mate:
+            self.active = None
+        self.emit('mate_died', mate)
+        self.scheduler.remove(mate)
+        self.roster.release(mate.row)
+        if self.winner is None and not self.get_mates(mate.team):
+            self.winner = 2 if mate.team == 1 else 1
+
+    def adjust_target_type(self, mate, mask, target_type):
+        ''' get the cell indices of the bitboard mask the Mate can target with the target type '''
+        if target_type == 'move' or target_type == 'summon':
+            return get_indices(mask & ~self.occupied)
+        mask &= self.occupied
+        if 'enemy' in target_type:
+            mask &= ~self.team_masks[mate.team]
+        if 'ally' in target_type:
+            mask &= self.team_masks[mate.team]
+        index_list = get_indices(mask)
+        if 'self' in target_type:
+            index_list.append(self.index(mate))
+        return index_list
+
+    def get_ability_index(self, mate, ability):
+        ''' get the cell indices the Mate can target with the Ability '''
+        if 'weapon' in ability.reach:
+            reach = mate.weapon
+        else:
+            reach = ability.reach
+        if 'sword' in reach:
+            return self.get_sword_index(mate, ability.target_type)
+        elif 'axe' in reach:
+            return self.get_axe_index(mate, ability.target_type)
+        elif 'spear' in reach:
+            return self.get_spear_index(mate, ability.target_type)
+        elif 'bow' in reach:
+            return self.get_queen_index(mate, ability.target_type)
+        elif 'rook' in reach:
+            return self.get_rook_index(mate, ability.target_type)
+        elif 'bishop' in reach:
+            return self.get_bishop_index(mate, ability.target_type)
+        elif 'knight' in reach:
+            return self.get_knight_index(mate, ability.target_type)
+        elif 'wand' in reach or 'staff' in reach or 'infinite' in reach:
+            return self.adjust_target_type(mate, self.board_mask, ability.target_type)
+        elif 'self' in reach:
+            return [self.index(mate)]
+        else:
+            raise Exception('ability reach invalid')
+
+    def get_sword_index(self, mate, target_type):
+        return self.adjust_target_type(mate, self.reach['sword'][self.index(mate)], target_type)
+
+    def get_axe_index(self, mate, target_type):
+        return self.adjust_target_type(mate, self.reach['axe'][self.index(mate)], target_type)
+
+    def get_spear_index(self, mate, target_type):
+        return self.adjust_target_type(mate, self.reach['spear'][self.index(mate)], target_type)
+
+    def get_knight_index(self, mate, target_type):
+        return self.adjust_target_type(mate, self.reach['knight'][self.index(mate)], target_type)
+
+    def get_bishop_index(self, mate, target_type):
+        ''' diagonal rays up to the border or the first Mate in the way '''
+        mask = get_sliding_mask(self.rays['bishop'], self.index(mate), self.occupied)
+        return self.adjust_target_type(mate, mask, target_type)
+
+    def get_rook_index(self, mate, target_type):
+        ''' straight rays up to the border or the first Mate in the way '''
+        mask = get_sliding_mask(self.rays['rook'], self.index(mate), self.occupied)
+        return self.adjust_target_type(mate, mask, target_type)
+
+    def get_queen_index(self, mate, target_type):
+        index = self.index(mate)
+        mask = get_sliding_mask(self.rays['rook'], index, self.occupied) | get_sliding_mask(self.rays['bishop'], index, self.occupied)
+        return self.adjust_target_type(mate, mask, target_type)
+
+    def get_hit_damage(self, attacker, targets, damage, pierce = False):
+        ''' the health damage a hit of the attacker would deal to each of the targets right now,
+        as an array, without changing anything (buffs of the attacker are not included) '''
+        roster = self.roster
+        rows = np.array([target.row for target in targets], dtype=np.int64)
+        higher = (roster.team[rows] > attacker.team).astype(np.int64)
+        direction = self.directions[higher, roster.cell[rows] // self.cols, self.index(attacker) // self.cols]
+        active = roster.effect_active[rows]
+        shield = np.where(active[:, mode_slots['shield raised']], 1.5, np.where(active[:, mode_slots['shield broken']], 0.5, 1.))
+        reduction = np.where(direction == FRONT, shield * roster.damage_reduction_front[rows],
+                np.where(direction == SIDE, shield * roster.damage_reduction_side[rows], 0.))
+        if pierce:
+            armor_block = np.zeros(len(rows))
+        else:
+            armor_block = np.where(direction == FRONT, Mate.armor_block_front, np.where(direction == SIDE, Mate.armor_block_side, 0.))
+        health_damage, armor, armor_damage = resolve_damage(damage, roster.armor[rows], reduction, armor_block)
+        return health_damage
+
+    def get_action_targets(self, mate):
+        ''' get the cell indices each Ability of the Mate can target right now as {ability: index list},
+        leaving out abilities it lacks the mana or a target for
+
+        The result is computed in a single pass and cached until the board, the mana of the Mate,
+        its Abilities (e.g. replaced by own_ability) or their manacost change, or a turn ends.
+        '''
+        abilities = tuple(mate.abilities)
+        mana = mate.mana
+        key = (mate, self.board_version, mana, abilities, [ability.manacost for ability in abilities])
+        if self.action_cache is not None and self.action_cache[0] == key:
+            return self.action_cache[1]
+        targets = {}
+        for ability in abilities:
+            if mana < ability.manacost:
+                continue
+            index_list = self.get_ability_index(mate, ability)
+            if index_list:
+                targets[ability] = index_list
+        self.action_cache = (key, targets)
+        return targets
+
+    def get_legal_actions(self, mate):
+        ''' get all (ability, index) pairs the Mate can use right now, index is None for untargeted abilities '''
+        actions = []
+        for ability, index_list in self.get_action_targets(mate).items():
+            if ability.target_type in ('self', 'all enemies', 'all allies'):
+                actions.append((ability, None))
+            elif ability.reach == 'self':
+                actions.append((ability, self.index(mate)))
+            else:
+                actions.extend((ability, index) for index in index_list)
+        return actions
+
+    def level_up(self, mate, ability):
+        ''' let the player choose an upgrade, controlled teams pick one at random '''
+        if mate.team in self.controllers:
+            if ability.possible_upgrades:
+                self.upgrade(mate, ability, self.ai_rng.choice(ability.possible_upgrades), True)
+        else:
+            self.emit('level_up', mate, ability)
+
+    def upgrade(self, mate, ability, upgrade, immediate=False):
+        ''' apply the upgrade chosen for an Ability of the Mate, immediate if it was chosen
+        while the Ability leveled up rather than later on by the player '''
+        if self.recorder is not None:
+            self.recorder.record_upgrade(mate, ability, upgrade, immediate)
+        mate.own_ability(ability).level_up(upgrade)
+
+    def get_ready_mate(self):
+        ''' get the first Mate (in cell order) whose t reached max_t '''
+        roster = self.roster
+        size = roster.size
+        ready = roster.t[:size] >= roster.max_t[:size]
+        # most of the time nobody is ready
+        if not np.count_nonzero(ready):
+            return None
+        cell = roster.cell[:size]
+        rows = (ready & roster.alive[:size] & (cell >= 0)).nonzero()[0]
+        if len(rows) == 0:
+            return None
+        if len(rows) == 1:
+            return roster.mates[rows[0]]
+        return roster.mates[rows[np.argmin(cell[rows])]]
+
+    def change_health_rows(self, rows, heal):
+        ''' change_health(0, heal) for the Mates of many Roster rows, returns the rows of Mates dying '''
+        roster = self.roster
+        health = roster.health[rows] + heal
+        dying = rows[health < 0.]
+        roster.health[rows] = np.minimum(health, roster.max_health[rows])
+        return dying
+
+    def tick(self):
+        ''' advance the turn timer of all Mates by a single tick
+
+        Each Mate regenerates health and mana, gains time and ticks its StatusEffects in slot
+        order, done here one mode at a time over all Mates. Mates do not affect each other
+        during a tick, so this ends up with the same numbers as ticking Mate by Mate. Mates
+        dying stop ticking right away and leave the board in cell order at the end. A tick
+        always advances every Mate, the first ready Mate takes its turn after the tick; the
+        widget loop this replaced stopped ticking the Mates after it for the rest of the frame.
+        '''
+        self.t += 1
+        roster = self.roster
+        rows = roster.get_board_rows()
+        dying = list(self.change_health_rows(rows, roster.health_regen[rows]))
+        mana = roster.mana[rows] + roster.mana_regen[rows]
+        mana = np.where(mana < 0, 0., mana)
+        roster.mana[rows] = np.where(mana > roster.max_mana[rows], roster.max_mana[rows], mana)
+        roster.t[rows] += 1.
+        ticking = roster.alive.copy()
+        ticking[dying] = False
+        for slot in roster.effect_active[rows].any(axis=0).nonzero()[0]:
+            mode = status_effect_modes[slot]
+            slot_rows = rows[roster.effect_active[rows, slot] & ticking[rows]]
+            if len(slot_rows) == 0:
+                continue
+            roster.effect_t[slot_rows, slot] -= 1
+            health_changes = health_changes_handlers.get(mode)
+            if health_changes is not None:
+                died = self.change_health_rows(slot_rows, health_changes(roster, slot_rows, slot))
+                ticking[died] = False
+                dying.extend(died)
+            ended = []
+            tick_effect = tick_handlers.get(mode)
+            if tick_effect is not None:
+                ended.extend(tick_effect(roster, slot_rows, slot))
+            ended.extend(slot_rows[roster.effect_t[slot_rows, slot] < 0.])
+            for row in ended:
+                status_effect = roster.mates[row].status_effects.slots[slot]
+                if status_effect is not None:
+                    status_effect.remove_status_effect()
+        for row in sorted(dying, key=lambda row: roster.cell[row]):
+            roster.mates[row].die()
+
+    def start_turn(self, mate):
+        ''' start the turn of the Mate, returns True if it waits for use_ability '''
+        self.turn += 1
+        self.scheduler.start_turn()
+        controller = self.controllers.get(mate.team)
+        if controller is None:
+            self.active = mate
+            self.emit('turn_started', mate)
+            return True
+        ability, index = controller(self, mate)
+        mate.end_ability(ability, index)
+        return False
+
+    def use_ability(self, mate, ability, index):
+        ''' perform the ability chosen for the active Mate '''
+        mate.end_ability(ability, index)
+
+    def end_turn(self, mate, ability):
+        if self.active is mate:
+            self.active = None
+        self.action_cache = None
+        # burning also ticks by the upgrades of the Ability of its caster, which may have
+        # leveled up without changing the numbers of the burning Mates
+        roster = self.roster
+        burning = roster.effect_active[:roster.size, mode_slots['burning']].nonzero()[0]
+        self.scheduler.end_turn([mate] + [roster.mates[row] for row in burning])
+        self.emit('ability_used', mate, ability)
+
+    def update(self, max_ticks=1):
+        ''' advance the timer by up to max_ticks ticks (math.inf to run until the next turn)
+        and play the turns of controlled teams, returns the Mate waiting for use_ability '''
+        if self.active is not None or self.winner is not None:
+            return self.active
+        mate = self.get_ready_mate()
+        if mate is None:
+            self.scheduler.advance(max_ticks)
+            mate = self.get_ready_mate()
+        while mate is not None and self.winner is None:
+            if self.start_turn(mate):
+                return mate
+            mate = self.get_ready_mate()
+        return None
+
+# the hot paths timed while profiling
+for name in ('get_sword_index', 'get_axe_index', 'get_spear_index', 'get_knight_index',
+        'get_bishop_index', 'get_rook_index', 'get_queen_index', 'change_health_rows'):
+    profiler.instrument(Match, name)
+profiler.instrument(Mate, 'change_health')
+profiler.instrument(Mate, 'end_ability', label=lambda mate, ability, index: ability.base)
+
+def simulate(game_mode='standard', controller=random_ai, max_turns=1000, seed=None):
+    ''' play a whole match headless with both teams controlled, returns the finished Match '''
+    match = Match(game_mode, seed=seed)
+    match.controllers = {1: controller, 2: controller}
+    while match.winner is None and match.turn < max_turns:
+        match.update(math.inf)
+    return match
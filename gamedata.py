@@ -0,0 +1,120 @@
+''' the game data of data/*.csv, compiled into immutable records
+
+The tab separated tables are parsed with the csv module into named tuples, e.g.
+
+    abilities['heal'].manacost
+    weapons['axe'].max_t
+    summons['summon golem'].abilities
+
+The compiled tables are pickled to data/compiled.pickle and reused as long as none of
+the csv files changed, otherwise they are compiled again.
+'''
+import csv
+import os
+import pickle
+from types import MappingProxyType
+from typing import NamedTuple
+
+data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+cache_path = os.path.join(data_path, 'compiled.pickle')
+table_names = ('abilities.csv', 'status_effects.csv', 'weapons.csv', 'summons.csv', 'tutorial.csv')
+# bump when the records change, so outdated caches get compiled again
+cache_format = 2
+
+class AbilityRecord(NamedTuple):
+    name: str
+    manacost: int
+    target_type: str
+    reach: str
+    time_usage: str
+    info: str
+
+class StatusEffectRecord(NamedTuple):
+    name: str
+    mode: str
+    sign: str
+
+class WeaponRecord(NamedTuple):
+    name: str
+    damage: float
+    damage_reduction_front: float
+    damage_reduction_side: float
+    starting_armor: float
+    max_armor: float
+    max_t: float
+
+class SummonRecord(NamedTuple):
+    name: str
+    abilities: tuple
+    weapon: str
+    # the weapon whose shield (damage reductions) the summon carries
+    armament: str
+    max_health: float
+    health: float
+    max_armor: float
+    armor: float
+    max_mana: float
+    mana: float
+    max_t: float
+    damage: float
+    health_regen: float
+
+def read_table(name):
+    ''' read one of the tab separated tables into a dict of row dicts, keyed by the first column '''
+    with open(os.path.join(data_path, name), newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)[1:]
+        return {row[0]: dict(zip(header, row[1:])) for row in reader if row}
+
+def compile_tables():
+    ''' parse all csv files into dicts of records '''
+    abilities = {name: AbilityRecord(name, int(row['manacost']), row['target type'], row['reach'], row['time usage'], row['info'])
+            for name, row in read_table('abilities.csv').items()}
+    status_effects = {name: StatusEffectRecord(name, row['mode'], row['sign'])
+            for name, row in read_table('status_effects.csv').items()}
+    weapons = {name: WeaponRecord(name, float(row['damage']), float(row['damage reduction front']), float(row['damage reduction side']),
+                float(row['starting armor']), float(row['max armor']), float(row['max t']))
+            for name, row in read_table('weapons.csv').items()}
+    summons = {name: SummonRecord(name, tuple(ability.strip() for ability in row['abilities'].split(',')), row['weapon'], row['armament'],
+                float(row['max health']), float(row['health']), float(row['max armor']), float(row['armor']),
+                float(row['max mana']), float(row['mana']), float(row['max t']), float(row['damage']), float(row['health regen']))
+            for name, row in read_table('summons.csv').items()}
+    # the popup texts of each tutorial in order, empty for unused columns
+    tutorials = {name: tuple(row.values()) for name, row in read_table('tutorial.csv').items()}
+    return {'abilities': abilities, 'status_effects': status_effects, 'weapons': weapons, 'summons': summons, 'tutorials': tutorials}
+
+def get_stamp():
+    ''' identifies the current version of the csv files '''
+    stamp = [cache_format]
+    for name in table_names:
+        stat = os.stat(os.path.join(data_path, name))
+        stamp.append((name, stat.st_mtime_ns, stat.st_size))
+    return stamp
+
+def load_tables(use_cache=True):
+    ''' the compiled tables, read from the cache if it is up to date '''
+    stamp = get_stamp()
+    if use_cache:
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_stamp, tables = pickle.load(f)
+            if cached_stamp == stamp:
+                return tables
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            pass
+    tables = compile_tables()
+    if use_cache:
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump((stamp, tables), f, pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            # e.g. a read only install, compiling again next time is fine
+            pass
+    return tables
+
+_tables = load_tables()
+abilities = MappingProxyType(_tables['abilities'])
+status_effects = MappingProxyType(_tables['status_effects'])
+weapons = MappingProxyType(_tables['weapons'])
+summons = MappingProxyType(_tables['summons'])
+tutorials = MappingProxyType(_tables['tutorials'])
@@ -3,607 +3,120 @@ from kivy.uix.widget import Widget
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.relativelayout import RelativeLayout
-from kivy.uix.floatlayout import FloatLayout
 from kivy.clock import Clock
+from kivy.base import EventLoop
 from kivy.uix.popup import Popup
-from kivy.properties import ObjectProperty, NumericProperty, BoundedNumericProperty, StringProperty
+from kivy.properties import ObjectProperty, NumericProperty, BoundedNumericProperty, StringProperty, BooleanProperty
 from kivy.uix.screenmanager import ScreenManager, Screen
+from kivy.graphics import Color, InstructionGroup, Mesh
 
-import random
-import numpy as np
-import pandas as pd
-
-# the number of cols (and also rows) of the PlayingField
-cols = 7
-
-tutorial_data = pd.read_csv('data/tutorial.csv', sep='\t', index_col=0)
-ability_data = pd.read_csv('data/abilities.csv', sep='\t', index_col=0)
-status_effect_data = pd.read_csv('data/status_effects.csv', sep='\t', index_col=0)
-weapon_data = pd.read_csv('data/weapons.csv', sep='\t', index_col=0)
-
-# a dictionary with the available upgrades for an Ability
-ability_upgrades_dict = {'freeze': ['stunning freeze', 'everlasting freeze', 'freeze blade'],
-        'burn': ['stacking burn', 'everlasting burn', 'burn blade'],
-        'quick attack': ['remove manacost', 'damage increase'],
-        'heal': ['heal all', 'cleanse', 'stronger heal'],
-        'cleanse': ['cleanse all', 'cleanse debuffs', 'quicken'],
-        'purge': ['purge all', 'purge buffs', 'quicken'],
-        'shield raise': ['raise all', 'counter attack', 'cleanse'],
-        'double attack': ['triple attack', 'increase damage', 'reduce manacost'],
-        'morale raise': ['cleanse', 'quicken'],
-        'novices thunder': ['purge', 'reduce manacost', 'quicken', 'increase damage', 'add strike', 'add random target'],
-        'manaburn': ['mana steal', 'strong manaburn', 'manaburn blade']}
-
-def get_direction(mate1, mate2):
-    ''' get the direction between two mates, used for shields damage reduction '''
-    mate1_index = mate1.parent.children[:].index(mate1)
-    mate2_index = mate2.parent.children[:].index(mate2)
-
-    mate1_col = mate1_index%cols
-    mate1_row = (mate1_index-mate1_col)/cols
-
-    mate2_col = mate2_index%cols
-    mate2_row = (mate2_index-mate2_col)/cols
-
-    if mate1_row == mate2_row:
-        return 'side'
-    if mate1_row > mate2_row:
-        if mate1.team > mate2.team:
-            return 'front'
-        else: return 'back'
-    if mate1_row < mate2_row:
-        if mate1.team > mate2.team:
-            return 'back'
-        else: return 'front'
-
-class Ability():
-    def __init__(self, name):
-        self.base = name
-        self.upgrades = [name]
-        try:
-            self.possible_upgrades = ability_upgrades_dict[name]
-            self.level_up_experience = 5
-        except KeyError:
-            self.level_up_experience = np.infty
-        self.manacost = int(ability_data.loc[name]['manacost'])
-        self.target_type = ability_data.loc[name]['target type']
-        self.reach = ability_data.loc[name]['reach']
-        self.time_usage = ability_data.loc[name]['time usage']
-        self.info = ability_data.loc[name]['info']
-        self.experience = 0
-        self.level = 1
-    def level_up(self, upgrade):
-        if upgrade == 'remove manacost':
-            self.manacost = 0.
-        if upgrade == 'reduce manacost':
-            self.manacost = 0.5 * self.manacost
-        try:
-            self.possible_upgrades.pop(self.possible_upgrades.index(upgrade))
-            if not self.possible_upgrades:
-                self.level_up_experience = np.infty
-            self.upgrades.append(upgrade)
-        except ValueError:
-            pass
-
-class Mate(FloatLayout):
-    ''' the base class for characters, the mages moving on the PlayingField '''
-    # you have to declare the properties at class level, not at init, in order to get expected behaviour
-    max_t = 100
-    t = NumericProperty(0)
-
-    max_health = 100.0
-    health = NumericProperty(1.0)
-    health_regen = 0.02
-
-    max_armor = 100.0
-    armor = NumericProperty(1.0)
-    armor_regen = 0.0
-
-    max_mana = 100.0
-    mana = NumericProperty(1.0)
-    mana_regen = 0.1
-
-    team = NumericProperty(0)
-    weapon = StringProperty()
-    base_damage = 0
-    damage_reduction_front = 0.
-    damage_reduction_side = 0.
-
-    armor_block_front = 0.66
-    armor_block_side = 0.33
-
-    button_normal_path = StringProperty()
-
-    def __init__(self, team, abilities, weapon, **kwargs):
-        super().__init__(**kwargs)
-        self.health = self.max_health
-        self.mana = self.max_mana
-        self.team = team
-        self.abilities = [Ability('move'), Ability('attack')]
-        for abil in abilities:
-            self.abilities.append(Ability(abil))
-        self.abilities.append(Ability('pass'))
-        self.weapon = weapon
-        self.base_damage = float(weapon_data.loc[weapon]['damage'])
-        self.damage_reduction_front = float(weapon_data.loc[weapon]['damage reduction front'])
-        self.damage_reduction_side = float(weapon_data.loc[weapon]['damage reduction side'])
-        self.armor = float(weapon_data.loc[weapon]['starting armor'])
-        self.max_armor = float(weapon_data.loc[weapon]['max armor'])
-        self.max_t = float(weapon_data.loc[weapon]['max t'])
-        self.t = random.random() * self.max_t
-        self.button_normal_path = 'gfx/mates/' + str(self.team) + '_' + self.weapon.replace(' ', '_') + '.png'
-        
-    def change_health(self, damage, heal, source = None, pierce = False):
-        if pierce:
-            armor_block_front = 0.
-            armor_block_side = 0.
-        else:
-            armor_block_front = self.armor_block_front
-            armor_block_side = self.armor_block_side
-
-        status_effects = self.get_status_effects()
-
-        if 'shield raised' in [status_effect.mode for status_effect in status_effects]:
-            damage_reduction_front = 1.5 * self.damage_reduction_front
-            damage_reduction_side = 1.5 * self.damage_reduction_side
-        elif 'shield broken' in [status_effect.mode for status_effect in status_effects]:
-            damage_reduction_front = 0.5 * self.damage_reduction_front
-            damage_reduction_side = 0.5 * self.damage_reduction_side
-        else:
-            damage_reduction_front = self.damage_reduction_front
-            damage_reduction_side = self.damage_reduction_side
-
-        if source:
-            if get_direction(self, source) == 'front':
-                damage = (1-damage_reduction_front) * damage
-                armor_damage = armor_block_front * damage
-                damage = (1-armor_block_front) * damage
-            elif get_direction(self, source) == 'side':
-                damage = (1-damage_reduction_side) * damage
-                armor_damage = armor_block_side * damage
-                damage = (1-armor_block_side) * damage
-            else:
-                armor_damage = 0
-                playing_field = App.get_running_app().root.screens_dict['board'].ids['game'].ids['playing_field']
-                if playing_field.game_mode == 'tutorial basic attacking' and playing_field.tutorial_count == 3:
-                    playing_field.create_tutorial_popup()
-        else:
-            armor_damage = 0
-        if armor_damage > self.armor:
-            damage += armor_damage - self.armor
-            self.armor = 0
-            playing_field = App.get_running_app().root.screens_dict['board'].ids['game'].ids['playing_field']
-            if playing_field.game_mode == 'tutorial basic attacking' and playing_field.tutorial_count == 4:
-                playing_field.create_tutorial_popup()
-        else:
-            self.armor -= armor_damage
-        self.health = self.health - damage + heal
-        if self.health < 0.:
-            self.die()
-        if self.health > self.max_health:
-            self.health = self.max_health
-
-    def change_mana(self, manacost, managain):
-        self.mana = self.mana - manacost + managain
-        if self.mana < 0:
-            self.mana = 0
-        if self.mana > self.max_mana:
-            self.mana = self.max_mana
-
-    def attack(self, target, damage, pierce = False):
-        ''' attacking a target Mate '''
-        self_status_effects = [child for child in self.children if type(child) == StatusEffect]
-        target_status_effects = [child for child in target.children if type(child) == StatusEffect]
-        for status_effect in self_status_effects:
-            mode = status_effect.mode
-            if mode == 'invigorated':
-                damage = (status_effect.stacks+1) * damage
-                self.remove_status_effect(status_effect)
-            if mode == 'freeze blade' or mode == 'burn blade' or mode == 'manaburn blade':
-                target.create_status_effect(status_effect.ability, self)
-        for status_effect in target_status_effects:
-            mode = status_effect.mode
-            if mode == 'shield raise':
-                if 'counter attack' in status_effect.ability.upgrades:
-                    self.change_health(target.base_damage, 0, source = target)
-                    # bug: counter attack has infinite reach, does not apply ability blades and also triggers from backside
-        target.change_health(damage, 0, source = self, pierce = pierce)
-
-    def ma_on_release(self):
-        self.show_details_popup()
-
-    def show_details_popup(self):
-        ''' open an MateInfoPopup that shows all the details about the character '''
-        popup = MateInfoPopup(self)
-        popup.open()
-
-    def create_status_effect(self, ability, source):
-        ''' add a new status_effect to the Mate '''
-        status_effect_found = False
-        for child in self.children:
-            if type(child) is StatusEffect:
-                if child.mode == status_effect_data.loc[ability.base]['mode']:
-                    child.apply_status_effect(ability, source, self)
-                    status_effect_found = True
-        if status_effect_found == False:
-            self.add_widget(StatusEffect(ability, source, self))
-
-    def remove_status_effect(self, status_effect):
-        ''' remove a StatusEffect by reference '''
-        status_effect.remove_status_effect()
-
-    def remove_random_status_effect(self, sign=True):
-        ''' remove a single StatusEffect from the Mate, can be discriminated by sign '''
-        status_effects = self.get_status_effects()
-        if not sign:
-            status_effects = [status_effect for status_effect in status_effects if status_effect.sign == sign]
-        if status_effects:
-            self.remove_widget(random.choice(status_effects))
-
-    def remove_status_effects(self, sign=True):
-        ''' remove all StatusEffects from the Mate, or discriminate by sign '''
-        status_effects = self.get_status_effects()
-        if not sign:
-            status_effects = [status_effect for status_effect in status_effects if status_effect.sign == sign]
-        for status_effect in status_effects:
-            self.remove_status_effect(status_effect)
-
-    def get_status_effects(self):
-        ''' get a list of all StatusEffects applied '''
-        return [child for child in self.children if type(child) is StatusEffect]
-
-    def create_select_button(self, source, ability):
-        ''' create a SelectButton on this Mate, so that it can be selected as a target by other Mates '''
-        self.add_widget(SelectButton(source, ability))
-
-    def push_back(self, target):
-        ''' push an enemy Mate back '''
-        # bug: pushes over borders
-        self_index = self.parent.children[:].index(self)
-        target_index = self.parent.children[:].index(target)
-
-        self_row = self_index%cols
-        self_col = (self_index-self_row)/cols
-
-        target_row = target_index%cols
-        target_col = (target_index-target_row)/cols
-
-        if self_row == target_row:
-            if self_col < target_col:
-                push = cols
-                if target_col == cols-1:
-                    push = 0
-                    print('push error upper boundary')
-            else:
-                push = -cols
-                if target_col == 0:
-                    push = 0
-                    print('push error lower boundary')
-        elif self_col == target_col:
-            if self_row < target_row:
-                push = 1
-                if target_row%cols == cols-1:
-                    push = 0
-                    print('push error left boundary')
-            else:
-                push = -1
-                if target_row%cols == 0:
-                    push = 0
-                    print('push error right boundary')
-        elif self_row < target_row:
-            if self_col < target_col:
-                push = cols+1
-                if target_col == cols-1 or target_row%cols == cols-1:
-                    push = 0
-            else:
-                push = -cols+1
-                if target_col == 0 or target_row%cols == cols-1:
-                    push = 0
-        elif self_row > target_row:
-            if self_col > target_col:
-                push = -cols-1
-                if target_col == 0 or target_row%cols == 0:
-                    push = 0
-            else:
-                push = cols-1
-                if target_col == cols-1 or target_row%cols == 0:
-                    push = 0
-
-        push_index = target_index + push
-
-        if type(self.parent.children[:][push_index]) is EmptyField:
-            self.parent.switch_positions(target_index, push_index)
-
-    def create_select_buttons(self, ability):
-        ''' create select buttons based on the ability used '''
-        self.parent.remove_all_select_buttons()
-        index = self.parent.children[:].index(self)
-        if ability.reach == 'weapon':
-            reach = self.weapon
-        else:
-            reach = ability.reach
-
-        if 'sword' in reach:
-            index_list = self.parent.get_sword_index(self, ability.target_type)
-        elif 'axe' in reach:
-            index_list = self.parent.get_axe_index(self, ability.target_type)
-        elif 'spear' in reach:
-            index_list = self.parent.get_spear_index(self, ability.target_type)
-        elif 'bow' in reach:
-            index_list = self.parent.get_queen_index(self, ability.target_type)
-        elif 'knight' in reach:
-            index_list = self.parent.get_knight_index(self, ability.target_type)
-        elif reach == 'rook':
-            index_list = self.parent.get_rook_index(self, ability.target_type)
-        elif reach == 'bishop':
-            index_list = self.parent.get_bishop_index(self, ability.target_type)
-        elif reach == 'infinite' or reach == 'magic staff' or reach == 'wand and buckler':
-            index_list = list(range(0, cols**2))
-        elif reach == 'self':
-            self.end_ability(ability, self)
-            index_list = []
-
-        # create SelectButtons based on weather the abilities targeting type is move, enemy, ally or all mates
-        for i in index_list:
-            child = self.parent.children[i]
-            if ability.target_type == 'move' or 'summon' in ability.target_type:
-                if type(child) is EmptyField:
-                    child.create_select_button(self, ability)
-            if ability.target_type == 'enemy':
-                if type(child) is Mate:
-                    if self.team != child.team:
-                        child.create_select_button(self, ability)
-            if ability.target_type == 'ally':
-                if type(child) is Mate:
-                    if self.team == child.team:
-                        child.create_select_button(self, ability)
-            if ability.target_type == 'all':
-                if type(child) is Mate:
-                    child.create_select_button(self, ability)
-
-    def start_ability(self, ability):
-        ''' initiate the target selection '''
-        if ability.target_type == 'self' or ability.target_type == 'all enemies' or ability.target_type == 'all allies':
-            self.end_ability(ability, None)
-        else:
-            self.create_select_buttons(ability)
-
-    def end_ability(self, ability, target):
-        ''' end the ability selection, performing the ability here '''
-        self.change_mana(ability.manacost, 0)
-        ability.experience += 1
-        if ability.experience >= ability.level_up_experience:
-            ability.level += 1
-            ability.experience = 0
-            popup = LevelUpPopup(ability)
-            popup.open()
-        if ability.target_type == 'move':
-            self.parent.switch_positions_by_ref(self, target)
-        elif ability.base == 'shield bash':
-            self.attack(target, 0.5*self.base_damage)
-            self.push_back(target)
-        elif ability.base == 'stab back':
-            self.attack(target, 0.5*self.base_damage)
-            self.push_back(target)
-        elif ability.base == 'powershot':
-            self.attack(target, 0.5*self.base_damage)
-            self.push_back(target)
-        elif ability.base == 'multishot':
-            target_indices = self.parent.get_queen_index(self, ability.target_type)
-            targets = [self.parent.children[i] for i in target_indices]
-            for target in targets:
-                self.attack(target, self.base_damage)
-        elif ability.base == 'swirl':
-            targets = self.parent.get_axe_index(self, ability.target_type)
-            for target in targets:
-                self.attack(target, self.base_damage)
-        elif ability.base == 'rookie charge' or ability.base == 'bishop charge':
-            self.parent.switch_positions_by_ref(self, target)
-        elif ability.base == 'pass':
-            self.change_mana(0, 10)
-        elif ability.base == 'heal':
-            healing = 30
-            if 'stronger heal' in ability.upgrades:
-                healing = 50
-            if 'heal all' in ability.upgrades:
-                for child in self.parent.children[:]:
-                    if type(child) is Mate and child.team == self.team:
-                        target.change_health(0, healing)
-            else:
-                target.change_health(0, healing)
-        elif ability.base == 'health gift':
-            target.change_health(0, 30)
-            self.change_health(30, 0)
-        elif ability.base == 'mana gift':
-            target.change_mana(0, 30)
-        elif ability.base == 'morale raise':
-            target.t += 0.5 * (target.max_t - target.t)
-            if 'cleanse' in ability.upgrades:
-                target.remove_random_status_effect(sign='debuff')
-        elif ability.base == 'novices thunder':
-            damage = 5
-            if 'increase damage' in ability.upgrades:
-                damage = 10
-            possible_targets = self.parent.children[:]
-            possible_targets = [target for target in possible_targets if type(target) == Mate and self.team != target.team]
-            targets = [target]
-            if 'add random target' in ability.upgrades:
-                targets.append(random.choice(possible_targets))
-            for target in targets:
-                target.change_health(damage, 0, source = self)
-                if 'purge' in ability.upgrades:
-                    target.remove_random_status_effect(sign='buff')
-        elif ability.base == 'cleanse':
-            sign = True
-            if 'cleanse debuffs' in ability.upgrades:
-                sign = 'debuff'
-            if 'cleanse all' in ability.upgrades:
-                target.remove_status_effects(sign=sign)
-            else:
-                target.remove_random_status_effect(sign=sign)
-        elif ability.base == 'purge':
-            sign = True
-            if 'purge buffs' in ability.upgrades:
-                sign = 'buff'
-            if 'steal' in ability.upgrades:
-                raise Exception('Implementation pending')
-            if 'purge all' in ability.upgrades:
-                target.remove_status_effects(sign=sign)
-            else:
-                target.remove_random_status_effect(sign=sign)
-        elif 'summon' in ability.base:
-            self.parent.create_summon(self.team, target, ability)
-        elif ability.base == 'attack' or ability == 'knights attack':
-            self.attack(target, self.base_damage)
-        elif ability.base == 'vampiric bite':
-            self.attack(target, self.base_damage)
-            self.change_health(0, self.base_damage)
-        elif ability.base == 'sacrificial attack':
-            self.attack(target, 1.5*self.base_damage)
-            self.change_health(self.base_damage, 0, pierce = True)
-        elif ability.base == 'pierce attack':
-            self.attack(target, self.base_damage, pierce = True)
-        elif ability.base == 'axe pull':
-            self.parent.switch_positions_by_ref(self, target)
-            self.attack(target, self.base_damage)
-        elif ability.base == 'mana strike':
-            damage = (1. + 0.02 * self.mana) * self.base_damage
-            self.attack(target, damage)
-            self.mana = 0.0
-        elif ability.base == 'quick attack':
-            modifier = 0.5
-            if 'increase damage' in ability.upgrades:
-                modifier = 0.75
-            self.attack(target, modifier*self.base_damage)
-        elif ability.base == 'double attack':
-            modifier = 0.6
-            if 'increase damage' in ability.upgrades:
-                modifier = 0.8
-            self.attack(target, modifier * self.base_damage)
-            self.attack(target, modifier * self.base_damage)
-            if 'triple attack' in ability.upgrades:
-                self.attack(target, modifier * self.base_damage)
-        elif ability.base == 'electrocute':
-            self.attack(target, 2.*self.base_damage)
-            target.t += 0.5 * (target.max_t - target.t)
-        else:
-            target.create_status_effect(ability, self)
-        self.end_turn(ability)
-
-    def start_turn(self):
-        ''' start the turn by adding ability prompts '''
-        game = App.get_running_app().root.screens_dict['board'].ids['game']
-        menu = game.ids['ability_menu']
-        game_mode = game.ids['playing_field'].game_mode
-        if 'tutorial' in game_mode and self.team == 2:
-            if 'basic' in game_mode:
-                self.end_ability(Ability('pass'), None)
-            elif game_mode == 'tutorial shields':
-                targets = self.parent.get_axe_index(self, 'enemy')
-                if targets:
-                    target = random.choice(targets)
-                    self.end_ability(Ability('attack'), self.parent.children[target])
-                else:
-                    self.end_ability(Ability('pass'), None)
-            elif game_mode == 'tutorial weapons':
-                targets = self.parent.get_ability_index(self, Ability('attack'))
-                if targets:
-                    if self.weapon == 'spear':
-                        ability = 'stab back'
-                    else:
-                        ability = 'attack'
-                    self.end_ability(Ability(ability), self.parent.children[random.choice(targets)])
-                else:
-                    self.end_ability(Ability('pass'), None)
-        else:
-            for ability in self.abilities:
-                menu.create_ability_prompt(self, ability)
-
-    def end_turn(self, ability):
-        ''' end the turn by resetting t and game.is_running, and removing all AbilityPrompts '''
-        if ability.time_usage == 'full':
-            self.t = 0.
-        elif ability.time_usage == 'half' or 'quicken' in ability.upgrades:
-            self.t = 0.5 * self.max_t
-        else:
-            raise Exception('time usage invalid')
-        game = App.get_running_app().root.screens_dict['board'].ids['game']
-        game.is_running = True
-        menu = game.ids['ability_menu']
-        for child in menu.children[:]:
-            if type(child) is AbilityPrompt:
-                menu.remove_widget(child)
-        playing_field = game.ids['playing_field']
-        playing_field.remove_all_select_buttons()
-        if playing_field.game_mode == 'tutorial basic movement':
-            if ability.base == 'move' and playing_field.tutorial_count == 1:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'rookie charge' and playing_field.tutorial_count == 2:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'bishop charge' and playing_field.tutorial_count == 3:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'knights move' and playing_field.tutorial_count == 4:
-                playing_field.create_tutorial_popup()
-        if playing_field.game_mode == 'tutorial basic attacking':
-            if ability.base == 'attack' and playing_field.tutorial_count == 1:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'pierce attack' and playing_field.tutorial_count == 2:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'invigorate' and playing_field.tutorial_count == 5:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'sacrificial attack' and playing_field.tutorial_count == 6:
-                playing_field.create_tutorial_popup()
-        if playing_field.game_mode == 'tutorial shields':
-            if ability.base == 'shield raise' and playing_field.tutorial_count == 1:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'attack' and playing_field.tutorial_count == 2:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'shield breaker' and playing_field.tutorial_count == 3:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'heal' and playing_field.tutorial_count == 5:
-                playing_field.create_tutorial_popup()
-        if playing_field.game_mode == 'tutorial weapons':
-            if ability.base == 'attack' and playing_field.tutorial_count == 1:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'move' and playing_field.tutorial_count == 2:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'stab back' and playing_field.tutorial_count == 3:
-                playing_field.create_tutorial_popup()
-            if ability.base == 'axe pull' and playing_field.tutorial_count == 4:
-                playing_field.create_tutorial_popup()
-        if playing_field.game_mode == 'tutorial abilities':
-            if ability.base == '' and playing_field.tutorial_count == 1:
-                playing_field.create_tutorial_popup()
+import math
+import os
 
+import numpy as np
 
-    def update(self, *args):
-        game = App.get_running_app().root.screens_dict['board'].ids['game']
-        if game.is_running:
-            self.change_health(0, self.health_regen)
-            self.change_mana(0, self.mana_regen)
-            self.t += 1.
-            if self.t >= self.max_t:
-                game.is_running = False
-                self.start_turn()
-        for child in self.children:
-            try:
-                child.update(*args)
-            except AttributeError:
-                pass
-
-    def die(self):
-        ''' called when the mate dies '''
-        game = App.get_running_app().root.screens_dict['board'].ids['game']
-        playing_field = game.ids['playing_field']
-        if playing_field.game_mode == 'tutorial weapons' and self.weapon == 'sword and shield' and playing_field.tutorial_count == 5:
-                playing_field.create_tutorial_popup()
-        if playing_field.game_mode == 'tutorial weapons' and self.weapon == 'spear' and playing_field.tutorial_count == 6:
-                playing_field.create_tutorial_popup()
-        if playing_field.game_mode == 'tutorial weapons' and self.weapon == 'magic staff' and playing_field.tutorial_count == 7:
-                playing_field.create_tutorial_popup()
-        self.parent.remove_mate(self)
+import atlas
+import gamedata
+import profiler
+from engine import cols as default_cols, status_effect_modes, Match
+from replay import Recorder
+
+root = os.path.dirname(os.path.abspath(__file__))
+# the replay of the last match played, e.g. for bug reports
+replay_path = os.path.join(root, 'replays', 'last.replay')
+
+# the icon of each status effect mode, more.png for modes without an own icon yet
+more_icon = 'gfx/status_effects/more.png'
+status_effect_icons = {}
+for mode in status_effect_modes:
+    path = 'gfx/status_effects/' + mode.replace(' ', '_') + '.png'
+    status_effect_icons[mode] = path if os.path.exists(path) else more_icon
+
+class Ticker():
+    ''' the objects updated every frame, registered explicitly instead of searched in the widget tree;
+    the clock only calls it while there are any, an idle game costs no frames '''
+    def __init__(self, interval=1/60.):
+        self.interval = interval
+        self.tickables = []
+        self.event = None
+
+    def add(self, tickable):
+        if tickable not in self.tickables:
+            self.tickables.append(tickable)
+        if self.event is None:
+            self.event = Clock.schedule_interval(self.update, self.interval)
+
+    def remove(self, tickable):
+        if tickable in self.tickables:
+            self.tickables.remove(tickable)
+        if not self.tickables and self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+    def update(self, dt):
+        profiling = profiler.enabled
+        if profiling:
+            start = profiler.clock()
+        # a copy, tickables may add or remove others
+        for tickable in self.tickables[:]:
+            tickable.update(dt)
+        if profiling:
+            profiler.record_frame(start)
+
+ticker = Ticker()
+
+# the icons shown for each combination of status effects (StatusEffects.mask), four at most
+mask_icons = {}
+
+def get_status_effect_icons(mate):
+    status_effects = mate.status_effects
+    icons = mask_icons.get(status_effects.mask)
+    if icons is None:
+        icons = [status_effect_icons[status_effect.mode] for status_effect in status_effects]
+        if len(icons) > 4:
+            icons = icons[:3] + [more_icon]
+        mask_icons[status_effects.mask] = icons
+    return icons
+
+class MeshLayer():
+    ''' rectangles of one color or texture, all drawn by a single Mesh '''
+    def __init__(self, group, rgba, texture=None):
+        self.texture = texture
+        self.tex_coords = texture.tex_coords if texture is not None else (0., 0., 1., 0., 1., 1., 0., 1.)
+        self.mesh = Mesh(mode='triangles', texture=texture)
+        group.add(Color(*rgba))
+        group.add(self.mesh)
+        self.vertices = []
+        self.indices = []
+
+    def clear(self):
+        self.vertices = []
+        self.indices = []
+
+    def add(self, x, y, w, h, tex_coords=None):
+        ''' a rectangle showing the texture, or the region at tex_coords of it '''
+        k = len(self.vertices) // 4
+        u0, v0, u1, v1, u2, v2, u3, v3 = tex_coords or self.tex_coords
+        self.vertices += (x, y, u0, v0, x + w, y, u1, v1, x + w, y + h, u2, v2, x, y + h, u3, v3)
+        self.indices += (k, k + 1, k + 2, k + 2, k + 3, k)
+
+    def flush(self):
+        ''' hand the vertex data to the Mesh '''
+        self.mesh.vertices = self.vertices
+        self.mesh.indices = self.indices
+
+    def set_rects(self, x, y, w, h):
+        ''' replace the vertex data by rectangles given as arrays x, y, w, h '''
+        u0, v0, u1, v1, u2, v2, u3, v3 = self.tex_coords
+        vertices = np.empty((len(x), 16))
+        vertices[:, 0::4] = np.column_stack((x, x + w, x + w, x))
+        vertices[:, 1::4] = np.column_stack((y, y, y + h, y + h))
+        vertices[:, 2::4] = (u0, u1, u2, u3)
+        vertices[:, 3::4] = (v0, v1, v2, v3)
+        self.vertices = vertices.ravel().tolist()
+        self.indices = (4 * np.arange(len(x))[:, None] + (0, 1, 2, 2, 3, 0)).ravel().tolist()
+        self.flush()
 
 class LevelUpButton(Button):
     ''' Button in LevelUpPopup '''
@@ -613,7 +126,8 @@ class LevelUpButton(Button):
         self.upgrade = upgrade
         self.popup = popup
     def lub_on_release(self):
-        self.popup.ability.level_up(self.upgrade)
+        popup = self.popup
+        popup.match.upgrade(popup.mate, popup.ability, self.upgrade)
         self.popup.dismiss()
 
 class LevelUpLayout(BoxLayout):
@@ -629,14 +143,18 @@ class TutorialPopup(Popup):
     def __init__(self, game_mode, tutorial_count, **kwargs):
         super().__init__(**kwargs)
         try:
-            self.info_text = tutorial_data.loc[game_mode][tutorial_count]
-        except:
+            self.info_text = gamedata.tutorials[game_mode][tutorial_count]
+        except (KeyError, IndexError):
+            pass
+        if not self.info_text:
             self.info_text = game_mode + str(tutorial_count)
 
 class LevelUpPopup(Popup):
     ''' a Popup used to level up an Ability '''
-    def __init__(self, ability, **kwargs):
+    def __init__(self, match, mate, ability, **kwargs):
         super().__init__(**kwargs)
+        self.match = match
+        self.mate = mate
         self.ability = ability
         self.add_widget(LevelUpLayout(ability, self))
 
@@ -673,495 +191,478 @@ class MateInfoPopup(Popup):
         for ability in mate.abilities:
             self.abilities_label += ability.base + ' ( lvl: ' + str(ability.level) + ' / exp: ' + str(ability.experience) + '/' + str(ability.level_up_experience) + ')' + '\n'
         self.status_effect_label = "active status_effects: \n"
-        for child in mate.children:
-            if type(child) is StatusEffect:
-                self.status_effect_label += child.mode + '(' + str(child.stacks) + ') remaining time: ' + str(child.t) + '\n'
-
-class StatusEffect(Widget):
-    ''' a widget used to save permanent and temporary changes (status_effects/destatus_effects) on a Mate '''
-    t = 0.
-    stacks = 0
-    def __init__(self, ability, source, target, **kwargs):
-        super().__init__(**kwargs)
-        self.ability = ability
-        self.mode = status_effect_data.loc[ability.base]['mode']
-        self.sign = status_effect_data.loc[ability.base]['sign']
-        self.apply_status_effect(ability, source, target)
-
-    def apply_status_effect(self, ability, source, target):
-        self.stacks += 1
-        self.t += 200.
-
-        if ability.base == 'freeze':
-            if 'stunning freeze' in ability.upgrades:
-                target.create_status_effect(Ability('stun'), self)
-            else:
-                target.t = 0.5 * target.t
-            if 'everlasting freeze' in ability.upgrades:
-                self.t = np.infty
-            target.max_t += 10
-
-        if ability.base == 'shield breaker':
-            for status_effect in target.get_status_effects():
-                if status_effect.mode == 'shield raised':
-                    status_effect.remove_status_effect()
-                    self.remove_status_effect()
-
-        if  ability.base == 'shield raise':
-            for status_effect in target.get_status_effects():
-                if status_effect.mode == 'shield broken':
-                    status_effect.remove_status_effect()
-                    self.remove_status_effect()
-
-        if ability.base == 'burn':
-            if 'everlasting burn' in ability.upgrades:
-                self.t = np.infty
-
-        if ability.base == 'manaburn':
-            manacost = 30
-            if 'strong manaburn' in ability.upgrades:
-                manacost = 60
-            if 'mana steal' in ability.upgrades:
-                source.change_mana(0, min(manacost, target.mana))
-            target.change_mana(manacost, 0)
-
-        if ability.base == 'stun':
-            self.t = np.infty
-
-    def remove_status_effect(self):
-        if self.mode == 'frozen':
-            mem_t = self.parent.t / self.parent.max_t
-            self.parent.max_t -= self.stacks * 10
-            self.parent.t = mem_t * self.parent.max_t
-        if self.mode == 'shield broken':
-            playing_field = App.get_running_app().root.screens_dict['board'].ids['game'].ids['playing_field']
-            if playing_field.game_mode == 'tutorial shields' and playing_field.tutorial_count == 4:
-                playing_field.create_tutorial_popup()
-        self.parent.remove_widget(self)
-
-    def update(self, *args):
-        game = App.get_running_app().root.screens_dict['board'].ids['game']
-        if game.is_running:
-            self.t -= 1
-            if self.mode == 'poisoned':
-                self.parent.change_health(0, -2.*self.parent.health_regen)
-            if self.mode == 'regenerating':
-                self.parent.change_health(0, self.stacks*self.parent.health_regen)
-            if self.mode == 'burning':
-                if 'stacking burn' in self.ability.upgrades:
-                    self.parent.change_health(self.stacks*0.2, 0)
-                else:
-                    self.parent.change_health(0.2, 0)
-            if self.mode == 'manaburning':
-                self.parent.change_health(0, -self.stacks*self.parent.mana_regen)
-            if self.mode == 'stunned':
-                self.parent.t -= 2.
-                if self.parent.t < 0:
-                    self.remove_status_effect()
-            if self.t < 0.:
-                self.remove_status_effect()
-
-class SelectButton(Button):
-    ''' a button to select a target, either an EmptyField or a Mate '''
-    def __init__(self, source, ability, **kwargs):
-        super().__init__(**kwargs)
-        self.source = source
-        self.ability = ability
-
-    def sb_on_release(self):
-        self.source.end_ability(self.ability, self.parent)
-
-class EmptyField(RelativeLayout):
-    ''' an empty field in the playing field '''
-    def ef_on_release(self):
-        print('EmptyField.ef_on_release called')
-
-    def create_select_button(self, source, ability):
-        self.add_widget(SelectButton(source, ability))
+        for status_effect in mate.status_effects:
+            self.status_effect_label += status_effect.mode + '(' + str(status_effect.stacks) + ') remaining time: ' + str(status_effect.t) + '\n'
 
 class BasicBoxLayout(BoxLayout):
-    def update(self, *args):
-        for child in self.children:
-            try:
-                child.update(*args)
-            except AttributeError:
-                pass
+    pass
 
 class AbilityMenu(BoxLayout):
-    def create_ability_prompt(self, source, ability):
-        button = AbilityPrompt(source, ability)
+    ''' the AbilityPrompts of the Mate whose turn it is. The prompts of the last turn are kept
+    and shown again for the next Mate instead of building new widgets every turn '''
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # the prompts shown, and those waiting to be shown again
+        self.prompts = []
+        self.spare_prompts = []
+
+    def create_ability_prompt(self, playing_field, mate, ability):
+        button = self.spare_prompts.pop() if self.spare_prompts else AbilityPrompt()
+        button.set_ability(playing_field, mate, ability)
+        button.disabled = ability not in playing_field.match.get_action_targets(mate)
+        self.prompts.append(button)
         self.add_widget(button)
-        if source.mana < ability.manacost:
-            button.disabled = True
-        if not source.parent.get_ability_index(source, ability) and not ability.reach == 'self':
-            button.disabled = True
+
+    def remove_ability_prompts(self):
+        for button in self.prompts:
+            self.remove_widget(button)
+        self.spare_prompts += self.prompts
+        self.prompts = []
 
 class AbilityPrompt(RelativeLayout):
     name = StringProperty()
     manacost_label = StringProperty()
-    info_label = StringProperty()
+    info_label = StringProperty('some info about the ability')
     ability_info_popup = None
     popup_event = None
-    def __init__(self, source, ability, **kwargs):
-        super().__init__(**kwargs)
+    def set_ability(self, playing_field, mate, ability):
         self.ability = ability
         self.name = ability.base.upper()
-        self.source = source
+        self.playing_field = playing_field
+        self.mate = mate
         self.manacost_label = 'manacost: ' + str(self.ability.manacost)
-        self.info_label = 'some info about the ability'
     def ap_on_press(self):
         self.ability_info_popup = AbilityInfoPopup(self.ability)
         self.popup_event = Clock.schedule_once(self.ability_info_popup.open, timeout = 0.5)
     def ap_on_release(self):
         self.popup_event.cancel()
         self.ability_info_popup.dismiss()
-        self.source.start_ability(self.ability)
-
-class PlayingField(GridLayout):
-    ''' the playing field where MagicMates move around '''
-    t = NumericProperty(0)
+        self.playing_field.start_ability(self.mate, self.ability)
+
+class PlayingField(Widget):
+    ''' the playing field where MagicMates move around, showing the cells of a Match
+
+    The whole board is drawn on the canvas of this widget, by a Mesh per color or texture
+    holding the rectangles of all cells, sprites, bars and icons, so changes of the board only
+    change vertex data. Touches are mapped to cells: touching a target cell while the player
+    picks one uses the Ability on it, touching a Mate shows its details.
+    '''
+    # the frames the timer ran, a plain number as nothing observes it
+    t = 0
     game_mode = StringProperty()
+    # the size of the board of the next match
+    cols = NumericProperty(default_cols)
+    rows = NumericProperty(default_cols)
     tutorial_count = 0
-    
+    match = None
+    dirty = False
+    # what draw_mates drew last, None to draw everything again
+    bar_state = None
+    icon_state = None
+    # ticks only while the board is shown and no popup is open
+    shown = False
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.cols = cols
+        # a set, Kivy dispatches on_dismiss again for a popup dismissed while it fades out
+        self.open_popups = set()
+        self.create_layers()
+        self.bind(pos=self.redraw, size=self.redraw)
         self.start_game('standard')
-        
+
+    def create_layers(self):
+        ''' the instructions of the canvas, from bottom to top '''
+        self.cell_layer = MeshLayer(self.canvas, (0.35, 0.35, 0.35, 1.))
+        # sprites and icons get a layer per atlas page when first shown
+        self.sprites = InstructionGroup()
+        self.canvas.add(self.sprites)
+        self.sprite_layers = {}
+        self.bar_layers = [MeshLayer(self.canvas, rgba) for rgba in
+                ((0.8, 0., 0., 1.), (0., 0.7, 0., 1.), (0., 0., 0.9, 1.), (1., 1., 1., 1.), (0.8, 0.8, 0., 1.))]
+        self.icons = InstructionGroup()
+        self.canvas.add(self.icons)
+        self.icon_layers = {}
+        self.target_layer = MeshLayer(self.canvas, (0.85, 0.85, 0.85, 0.9))
+
+    def add_image(self, group, layers, path, x, y, w, h):
+        ''' draw the image at path, the images on the same atlas page share a layer '''
+        page = atlas.get_page(path)
+        layer = layers.get(page)
+        if layer is None:
+            layer = layers[page] = MeshLayer(group, (1., 1., 1., 1.), atlas.page_textures[page])
+        layer.add(x, y, w, h, atlas.get_texture(path).tex_coords)
+
     def start_game(self, game_mode):
+        if self.match is not None:
+            self.save_replay()
         self.tutorial_count = 0
         self.game_mode = game_mode
-        self.clear_widgets()
-        for i in range(0, self.cols**2):
-            self.add_widget(EmptyField())
-
-        if game_mode == 'tutorial basic movement':
-            self.create_mate(1, ['rookie charge', 'bishop charge', 'knights move'], 'axe', 3*cols+3)
-            self.children[3*cols+3].armor = self.children[3*cols+3].max_armor
-        elif game_mode == 'tutorial basic attacking':
-            self.create_mate(1, ['pierce attack', 'invigorate', 'sacrificial attack'], 'axe', 3*cols+3)
-            self.create_mate(2, [], 'axe', 4*cols+3)
-            self.children[4*cols+3].health_regen = 0.4
-            self.children[4*cols+3].armor = self.children[4*cols+3].max_armor
-        elif game_mode == 'tutorial shields':
-            self.create_mate(1, ['shield raise', 'shield breaker'], 'axe and buckler', 2*cols+3)
-            self.children[2*cols+3].t = 90
-            self.create_mate(1, ['heal'], 'spear', cols+3)
-            self.children[cols+3].t = 40
-            self.create_mate(2, [], 'sword and shield', 4*cols+3)
-            self.children[4*cols+3].t = 70
-        elif game_mode == 'tutorial weapons':
-            self.create_mate(1, ['axe pull'], 'axe', 2)
-            self.children[2].t = 10
-            self.create_mate(1, ['bishop charge'], 'bow', 3)
-            self.children[3].t = 70
-            self.create_mate(1, ['heal'], 'longsword', 4)
-            self.children[4].t = 80
-            self.create_mate(2, [], 'magic staff', 6*cols+3)
-            self.create_mate(2, ['stab back'], 'spear', 5*cols+3)
-            self.create_mate(2, [], 'sword and shield', 4*cols+3)
-        elif game_mode == 'tutorial abilities':
-            self.create_mate(1, ['axe pull'], 'axe', 3)
-        elif game_mode == 'standard':
-            self.create_mate(1, ['rookie charge', 'axe pull', 'invigorate'], 'axe', 1)
-            self.create_mate(1, ['shield raise', 'heal', 'cleanse'], 'sword and shield', 2)
-            self.create_mate(1, ['summon zombie', 'summon ghost', 'freeze'], 'magic staff', 4)
-            self.create_mate(1, ['multishot', 'pierce attack', 'knights move'], 'bow', 5)
-
-            self.create_mate(2, ['pierce attack', 'sacrificial attack', 'bishop charge'], 'longsword', cols**2-2)
-            self.create_mate(2, ['stab back', 'quick attack', 'double attack'], 'spear', cols**2-3)
-            self.create_mate(2, ['pierce attack', 'sacrificial attack', 'purge'], 'axe and buckler', cols**2-5)
-            self.create_mate(2, ['manaburn', 'burn', 'summon golem'], 'wand and buckler', cols**2-6)
-        elif game_mode == 'sandbox':
-            self.create_mate(1, ['stab back', 'rookie charge'], 'axe', 1)
-            self.create_mate(2, ['stab back', 'rookie charge'], 'axe', 2)
-
-    def adjust_target_type(self, mate, index_list, target_type):
-        if target_type == 'move' or target_type == 'summon':
-            return [index for index in index_list if type(self.children[index]) == EmptyField]
+        self.clear_targets()
+        self.board_version = None
+        self.match = Match(game_mode, cols=self.cols, rows=self.rows, listener=self.on_match_event)
+        self.recorder = Recorder(self.match)
+        # snapshots (match, replay records) taken when the turns of the player started
+        self.undo_stack = []
+        self.redo_stack = []
+        self.sync_board()
+
+    def push_snapshot(self):
+        self.undo_stack.append((self.match.snapshot(), bytes(self.recorder.records)))
+
+    def undo(self):
+        ''' go back to the start of the current turn of the player, or the previous one if it just started '''
+        if not self.undo_stack:
+            return
+        if self.match.active is not None:
+            if len(self.undo_stack) < 2:
+                return
+            self.redo_stack.append(self.undo_stack.pop())
+        self.restore(self.undo_stack[-1])
+
+    def redo(self):
+        ''' go forward to the start of the turn left by undo '''
+        if not self.redo_stack:
+            return
+        self.undo_stack.append(self.redo_stack.pop())
+        self.restore(self.undo_stack[-1])
+
+    def restore(self, snapshot):
+        ''' continue from a snapshot, waiting for the player to choose an ability '''
+        match, records = snapshot
+        self.match = match.snapshot()
+        self.match.listener = self.on_match_event
+        self.recorder.match = self.match
+        self.recorder.records = bytearray(records)
+        self.match.recorder = self.recorder
+        self.clear_targets()
+        self.board_version = None
+        self.sync_board()
+        self.draw_mates()
+        game = self.parent
+        game.ids['ability_menu'].remove_ability_prompts()
+        game.is_running = False
+        self.start_turn(self.match.active)
+
+    def save_replay(self):
+        ''' keep the replay of the last match in replay_path, if any choice was made in it '''
+        if not self.recorder.records:
+            return
+        os.makedirs(os.path.dirname(replay_path), exist_ok=True)
+        self.recorder.save(replay_path)
+
+    def get_cell_rect(self, index):
+        ''' (x, y, width, height) of a cell: row 0 at the bottom, col 0 on the right '''
+        match = self.match
+        w = self.width / match.cols
+        h = self.height / match.rows
+        row, col = divmod(index, match.cols)
+        return self.x + (match.cols - 1 - col) * w, self.y + row * h, w, h
+
+    def get_cell_index(self, x, y):
+        ''' the index of the cell at the window coordinates x, y, None outside the board '''
+        match = self.match
+        col = match.cols - 1 - math.floor((x - self.x) * match.cols / self.width)
+        row = math.floor((y - self.y) * match.rows / self.height)
+        if 0 <= row < match.rows and 0 <= col < match.cols:
+            return match.cell(row, col)
+        return None
+
+    def sync_board(self):
+        ''' redraw the cells and sprites if the cells of the match changed, the bars with the next frame '''
+        self.dirty = True
+        if self.board_version == self.match.board_version:
+            return
+        self.board_version = self.match.board_version
+        self.draw_board()
+
+    def redraw(self, *args):
+        self.bar_state = None
+        self.icon_state = None
+        self.draw_board()
+        self.draw_mates()
+        self.draw_targets()
+
+    def draw_board(self):
+        ''' the vertex data of the empty cells and the sprites of the Mates '''
+        cell_layer = self.cell_layer
+        cell_layer.clear()
+        for layer in self.sprite_layers.values():
+            layer.clear()
+        for index, mate in enumerate(self.match.cells):
+            x, y, w, h = self.get_cell_rect(index)
+            if mate is None:
+                cell_layer.add(x + 1, y + 1, w - 2, h - 2)
+            else:
+                path = 'gfx/mates/' + str(mate.team) + '_' + mate.weapon.replace(' ', '_') + '.png'
+                self.add_image(self.sprites, self.sprite_layers, path, x + 0.2*w, y, 0.8*w, 0.8*h)
+        cell_layer.flush()
+        for layer in self.sprite_layers.values():
+            layer.flush()
+
+    def draw_mates(self):
+        ''' the bars and the status effect icons of the Mates. The bars are snapped to whole pixels
+        and a layer only gets new vertex data if one of its bars changed by a pixel or more '''
+        match = self.match
+        roster = match.roster
+        rows = roster.get_board_rows()
+        cells = roster.cell[rows]
+        w = self.width / match.cols
+        h = self.height / match.rows
+        x = self.x + (match.cols - 1 - cells % match.cols) * w
+        top = self.y + (cells // match.cols + 1) * h
+        bar = 0.05 * h
+        t = roster.t[rows]
+        max_t = roster.max_t[rows]
+        ready = t >= max_t
+        pixels = np.rint(w * np.column_stack((
+                np.clip(roster.health[rows] / roster.max_health[rows], 0., 1.),
+                np.minimum(roster.armor[rows] / roster.max_armor[rows], 1.),
+                np.minimum(roster.mana[rows] / roster.max_mana[rows], 1.),
+                np.where(ready, 1., np.maximum(t / max_t, 0.)))))
+        # the columns cell, health, armor, mana, t, ready of the drawn bars
+        state = np.column_stack((cells, pixels, ready))
+        if self.bar_state is not None and self.bar_state.shape == state.shape and (self.bar_state[:, 0] == cells).all():
+            changed = (self.bar_state != state).any(axis=0)
         else:
-            index_list = [index for index in index_list if type(self.children[index]) == Mate]
-            if 'enemy' in target_type:
-                index_list = [index for index in index_list if mate.team != self.children[index].team]
-            if 'ally' in target_type:
-                index_list = [index for index in index_list if mate.team == self.children[index].team]
-            if 'self' in target_type:
-                index_list.append(self.children[:].index(mate))
-            return index_list
-
-    def get_ability_index(self, mate, ability):
-        if 'weapon' in ability.reach:
-            reach = mate.weapon
+            changed = np.ones(state.shape[1], dtype=bool)
+        self.bar_state = state
+        health_layer, armor_layer, mana_layer, t_layer, ready_layer = self.bar_layers
+        for k, layer in enumerate((health_layer, armor_layer, mana_layer)):
+            if changed[1 + k]:
+                layer.set_rects(x, top - (k + 1)*bar, pixels[:, k], bar)
+        if changed[4] or changed[5]:
+            waiting = ~ready
+            t_layer.set_rects(x[waiting], top[waiting] - 4*bar, pixels[waiting, 3], bar)
+            ready_layer.set_rects(x[ready], top[ready] - 4*bar, pixels[ready, 3], bar)
+        # the icons of the Mates with status effects, (cell, mask) each
+        mates = [roster.mates[row] for row in rows[roster.effect_active[rows].any(axis=1)]]
+        icon_state = [(mate.roster.cell.item(mate.row), mate.status_effects.mask) for mate in mates]
+        if icon_state == self.icon_state:
+            return
+        self.icon_state = icon_state
+        for layer in self.icon_layers.values():
+            layer.clear()
+        for mate, (index, mask) in zip(mates, icon_state):
+            x, y, w, h = self.get_cell_rect(index)
+            for slot, path in enumerate(get_status_effect_icons(mate)):
+                self.add_image(self.icons, self.icon_layers, path, x, y + slot*0.2*h, 0.2*w, 0.2*h)
+        for layer in self.icon_layers.values():
+            layer.flush()
+
+    def draw_targets(self):
+        target_layer = self.target_layer
+        target_layer.clear()
+        for index in self.targets:
+            x, y, w, h = self.get_cell_rect(index)
+            target_layer.add(x + 0.25*w, y + 0.25*h, 0.5*w, 0.5*h)
+        target_layer.flush()
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        touch.grab(self)
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        index = self.get_cell_index(*touch.pos)
+        if index is not None:
+            self.select_cell(index)
+        return True
+
+    def select_cell(self, index):
+        ''' the cell touched: use the Ability on it if it is a target, else show the details of its Mate '''
+        if index in self.targets:
+            self.end_ability(self.target_mate, self.target_ability, index)
+        elif self.match.cells[index] is not None:
+            MateInfoPopup(self.match.cells[index]).open()
+
+    def start_turn(self, mate):
+        ''' let the player choose an Ability of the Mate '''
+        menu = self.parent.ids['ability_menu']
+        for ability in mate.abilities:
+            menu.create_ability_prompt(self, mate, ability)
+
+    def start_ability(self, mate, ability):
+        ''' initiate the target selection '''
+        if ability.target_type == 'self' or ability.target_type == 'all enemies' or ability.target_type == 'all allies':
+            self.end_ability(mate, ability, None)
         else:
-            reach = ability.reach
-        if 'sword' in reach:
-            return self.get_sword_index(mate, ability.target_type)
-        elif 'axe' in reach:
-            return self.get_axe_index(mate, ability.target_type)
-        elif 'spear' in reach:
-            return self.get_spear_index(mate, ability.target_type)
-        elif 'bow' in reach:
-            return self.get_queen_index(mate, ability.target_type)
-        elif 'rook' in reach:
-            return self.get_rook_index(mate, ability.target_type)
-        elif 'bishop' in reach:
-            return self.get_bishop_index(mate, ability.target_type)
-        elif 'knight' in reach:
-            return self.get_knight_index(mate, ability.target_type)
-        elif 'wand' in reach or 'staff' in reach or 'infinite' in reach:
-            return self.adjust_target_type(mate, range(0, cols**2-1), ability.target_type)
-        elif 'self' in reach:
-            return []
+            self.show_targets(mate, ability)
+
+    def show_targets(self, mate, ability):
+        ''' mark the cells the Ability can target, for the player to pick one '''
+        self.clear_targets()
+        if ability.reach == 'self':
+            self.end_ability(mate, ability, self.match.index(mate))
+            return
+        self.target_mate = mate
+        self.target_ability = ability
+        self.targets = set(self.match.get_action_targets(mate).get(ability, []))
+        self.draw_targets()
+
+    def clear_targets(self):
+        self.target_mate = None
+        self.target_ability = None
+        self.targets = set()
+        self.draw_targets()
+
+    def end_ability(self, mate, ability, index):
+        ''' end the ability selection, the engine performs the ability and ends the turn '''
+        game = self.parent
+        self.match.use_ability(mate, ability, index)
+        self.redo_stack.clear()
+        game.is_running = True
+        game.ids['ability_menu'].remove_ability_prompts()
+        self.clear_targets()
+        self.sync_board()
+
+    def update_ticking(self):
+        ''' tick while the timer of the match runs, not while waiting for the player or a popup '''
+        if self.shown and self.parent.is_running and not self.open_popups:
+            ticker.add(self)
         else:
-            raise Exception('ability reach invalid')
-
-    def get_sword_index(self, mate, target_type):
-        index = self.children[:].index(mate)
-        index_list = [index+1, index-1, index+cols, index-cols]
-        index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
-        if index%cols == 0:
-            index_list = [i for i in index_list if i%cols <= 2] # remove right border
-        if index%cols == cols-1:
-            index_list = [i for i in index_list if i%cols >= cols-3] # remove left border
-        return self.adjust_target_type(mate, index_list, target_type)
-
-    def get_axe_index(self, mate, target_type):
-        index = self.children[:].index(mate)
-        index_list = [index+1, index-1, index+cols, index-cols, index+1+cols, index-1+cols, index+1-cols, index-1-cols]
-        index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
-        if index%cols == 0:
-            index_list = [i for i in index_list if i%cols <= 2] # remove right border
-        if index%cols == cols-1:
-            index_list = [i for i in index_list if i%cols >= cols-3] # remove left border
-        return self.adjust_target_type(mate, index_list, target_type)
-
-    def get_spear_index(self, mate, target_type):
-        index = self.children[:].index(mate)
-        index_list = [index+1, index-1, index+2, index-2, index+cols, index-cols, index+2*cols, index-2*cols, index+1+cols, index-1+cols, index+1-cols, index-1-cols]
-        index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
-        if index%cols == 0 or index%cols == 1:
-            index_list = [i for i in index_list if i%cols <= 3] # remove right border
-        if index%cols == cols-1 or index%cols == cols-2:
-            index_list = [i for i in index_list if i%cols >= cols-4] # remove left border
-        return self.adjust_target_type(mate, index_list, target_type)
-
-    def get_knight_index(self, mate, target_type):
-        index = self.children[:].index(mate)
-        index_list = [index+cols+2, index+cols-2, index+2*cols+1, index+2*cols-1, index-cols+2, index-cols-2, index-2*cols+1, index-2*cols-1]
-        index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
-        if index%cols == 0 or index%cols == 1:
-            index_list = [i for i in index_list if i%cols <= 3] # remove right border
-        if index%cols == cols-1 or index%cols == cols-2:
-            index_list = [i for i in index_list if i%cols >= cols-4] # remove left border
-        return self.adjust_target_type(mate, index_list, target_type)
-
-    def get_bishop_index(self, mate, target_type):
-        index = self.children[:].index(mate)
-        col = index%cols
-        row = (index-col)/cols
-        index_list = []
-        top_left = True
-        top_right = True
-        bot_left = True
-        bot_right = True
-        if index%cols == cols-1:
-            top_left = False
-            bot_left = False
-        if index%cols == 0:
-            top_right = False
-            bot_right = False
-        if index < cols:
-            bot_left = False
-            bot_right = False
-        if index > cols**2-cols:
-            top_left = False
-            top_right = False
-        for i in range(1, cols+2):
-            if top_left:
-                new_index = index+i+i*cols
-                index_list.append(new_index)
-                if new_index%cols == cols-1 or new_index >= cols**2-cols or type(self.children[new_index]) == Mate:
-                    top_left = False
-            if top_right:
-                new_index = index-i+i*cols
-                index_list.append(new_index)
-                if new_index%cols == 0 or new_index >= cols**2-cols or type(self.children[new_index]) == Mate:
-                    top_right = False
-            if bot_left:
-                new_index = index+i-i*cols
-                index_list.append(new_index)
-                if new_index%cols == cols-1 or new_index <= cols or type(self.children[new_index]) == Mate:
-                    bot_left = False
-            if bot_right:
-                new_index = index-i-i*cols
-                index_list.append(new_index)
-                if new_index%cols == 0 or new_index <= cols or type(self.children[new_index]) == Mate:
-                    bot_right = False
-        return self.adjust_target_type(mate, index_list, target_type)
-
-    def get_rook_index(self, mate, target_type):
-        index = self.children[:].index(mate)
-        col = index%cols
-        row = (index-col)/cols
-        index_list = []
-        top = True
-        right = True
-        bot = True
-        left = True
-        if index%cols == cols-1:
-            left = False
-        if index%cols == 0:
-            right = False
-        if index < cols:
-            bot = False
-        if index > cols**2-cols:
-            top = False
-        for i in range(1, cols+2):
-            if top:
-                new_index = index+i*cols
-                index_list.append(new_index)
-                if new_index >= cols**2-cols or type(self.children[new_index]) == Mate:
-                    top = False
-            if bot:
-                new_index = index-i*cols
-                index_list.append(new_index)
-                if new_index < cols-1 or type(self.children[new_index]) == Mate:
-                    bot = False
-            if left:
-                new_index = index+i
-                index_list.append(new_index)
-                if new_index%cols == cols-1 or type(self.children[new_index]) == Mate:
-                    left = False
-            if right:
-                new_index = index-i
-                index_list.append(new_index)
-                if new_index%cols == 0 or type(self.children[new_index]) == Mate:
-                    right = False
-        index_list = [index for index in index_list if index >= 0 and index < cols**2]
-        return self.adjust_target_type(mate, index_list, target_type)
-
-    def get_queen_index(self, mate, target_type):
-        bishop_index = self.get_bishop_index(mate, target_type)
-        rook_index = self.get_rook_index(mate, target_type)
-        return list(set(rook_index + bishop_index))
-
-    def switch_positions(self, index1, index2):
-        ''' switch positions of two children '''
-        self.children[index1], self.children[index2] = self.children[index2], self.children[index1]
-
-    def switch_positions_by_ref(self, object1, object2):
-        ''' switch positions of two children without knowing the indices of the objects '''
-        self.switch_positions(self.children[:].index(object1), self.children[:].index(object2))
-
-    def create_mate(self, team, abilities, weapon, index):
-        ''' create a new Mate by adding it to the children list, swapping it with the according EmptyField, finally removing the EmptyField '''
-        self.add_widget(Mate(team, abilities, weapon))
-        self.switch_positions(index+1, 0)
-        self.remove_widget(self.children[0])
-
-    def create_summon(self, team, target, ability):
-        ''' create a new Mate with lower stats '''
-        if ability.base == 'summon zombie':
-            summon = Mate(team, ['poison'], 'axe')
-            summon.max_health = 50
-            summon.health = 50
-            summon.max_armor = 25
-            summon.armor = 0
-            summon.max_mana = 50
-            summon.mana = 0
-            summon.weapon = 'axe'
-            summon.base_damage = 25
-        elif ability.base == 'summon vampire':
-            summon = Mate(team, ['vampiric bite', 'sacrificial attack'], 'axe')
-            summon.max_health = 100
-            summon.health = 50
-            summon.max_armor = 50
-            summon.armor = 0
-            summon.max_mana = 100
-            summon.mana = 0
-            summon.weapon = 'axe'
-            summon.base_damage = 15
-        elif ability.base == 'summon ghost':
-            summon = Mate(team, ['health gift', 'mana gift'], 'magic staff')
-            summon.max_health = 20
-            summon.health = 20
-            summon.max_armor = 10
-            summon.armor = 0
-            summon.max_mana = 50
-            summon.mana = 50
-            summon.weapon = 'magic staff'
-            summon.base_damage = 5
-        elif ability.base == 'summon golem':
-            summon = Mate(team, ['shield raise'], 'sword and shield')
-            summon.max_health = 100
-            summon.health = 100
-            summon.max_armor = 100
-            summon.armor = 100
-            summon.max_mana = 100
-            summon.mana = 0
-            summon.max_t = 150
-            summon.weapon = 'magic staff'
-            summon.base_damage = 15
-
-        summon.health_regen = 0
-        summon.t = 1.
-
-        self.add_widget(summon)
-        index = self.children[:].index(target)
-        self.switch_positions(index, 0)
-        self.remove_widget(self.children[0])
-
-    def remove_mate(self, mate):
-        ''' remove a Mate by adding an EmptyField, switching it in, and removing the Mate '''
-        empty_field = EmptyField()
-        self.add_widget(empty_field)
-        self.switch_positions_by_ref(empty_field, mate)
-        self.remove_widget(mate)
-
-    def remove_all_select_buttons(self):
-        for child in self.children[:]:
-            for grandchild in child.children[:]:
-                if type(grandchild) is SelectButton:
-                    child.remove_widget(grandchild)
+            ticker.remove(self)
 
-    def create_tutorial_popup(self):
-        popup = TutorialPopup(self.game_mode, self.tutorial_count)
+    def open_popup(self, popup):
+        ''' open a popup, the match waits until it is dismissed '''
+        popup.bind(on_pre_open=self.on_popup_open, on_dismiss=self.on_popup_dismiss)
         popup.open()
+
+    def on_popup_open(self, popup):
+        self.open_popups.add(popup)
+        self.update_ticking()
+
+    def on_popup_dismiss(self, popup):
+        self.open_popups.discard(popup)
+        self.update_ticking()
+
+    def create_tutorial_popup(self):
+        self.open_popup(TutorialPopup(self.game_mode, self.tutorial_count))
         self.tutorial_count += 1
 
+    def on_match_event(self, event, *args):
+        ''' react to the events of the match, mainly advancing the tutorials '''
+        if event == 'level_up':
+            mate, ability = args
+            self.open_popup(LevelUpPopup(self.match, mate, ability))
+        elif event == 'hit_from_back':
+            if self.game_mode == 'tutorial basic attacking' and self.tutorial_count == 3:
+                self.create_tutorial_popup()
+        elif event == 'armor_broken':
+            if self.game_mode == 'tutorial basic attacking' and self.tutorial_count == 4:
+                self.create_tutorial_popup()
+        elif event == 'status_effect_removed':
+            mate, status_effect = args
+            if status_effect.mode == 'shield broken':
+                if self.game_mode == 'tutorial shields' and self.tutorial_count == 4:
+                    self.create_tutorial_popup()
+        elif event == 'mate_died':
+            mate, = args
+            if self.game_mode == 'tutorial weapons' and mate.weapon == 'sword and shield' and self.tutorial_count == 5:
+                    self.create_tutorial_popup()
+            if self.game_mode == 'tutorial weapons' and mate.weapon == 'spear' and self.tutorial_count == 6:
+                    self.create_tutorial_popup()
+            if self.game_mode == 'tutorial weapons' and mate.weapon == 'magic staff' and self.tutorial_count == 7:
+                    self.create_tutorial_popup()
+        elif event == 'ability_used':
+            mate, ability = args
+            self.advance_tutorial(ability)
+
+    def advance_tutorial(self, ability):
+        ''' show the next tutorial popup once the expected ability was used '''
+        if self.game_mode == 'tutorial basic movement':
+            if ability.base == 'move' and self.tutorial_count == 1:
+                self.create_tutorial_popup()
+            if ability.base == 'rookie charge' and self.tutorial_count == 2:
+                self.create_tutorial_popup()
+            if ability.base == 'bishop charge' and self.tutorial_count == 3:
+                self.create_tutorial_popup()
+            if ability.base == 'knights move' and self.tutorial_count == 4:
+                self.create_tutorial_popup()
+        if self.game_mode == 'tutorial basic attacking':
+            if ability.base == 'attack' and self.tutorial_count == 1:
+                self.create_tutorial_popup()
+            if ability.base == 'pierce attack' and self.tutorial_count == 2:
+                self.create_tutorial_popup()
+            if ability.base == 'invigorate' and self.tutorial_count == 5:
+                self.create_tutorial_popup()
+            if ability.base == 'sacrificial attack' and self.tutorial_count == 6:
+                self.create_tutorial_popup()
+        if self.game_mode == 'tutorial shields':
+            if ability.base == 'shield raise' and self.tutorial_count == 1:
+                self.create_tutorial_popup()
+            if ability.base == 'attack' and self.tutorial_count == 2:
+                self.create_tutorial_popup()
+            if ability.base == 'shield breaker' and self.tutorial_count == 3:
+                self.create_tutorial_popup()
+            if ability.base == 'heal' and self.tutorial_count == 5:
+                self.create_tutorial_popup()
+        if self.game_mode == 'tutorial weapons':
+            if ability.base == 'attack' and self.tutorial_count == 1:
+                self.create_tutorial_popup()
+            if ability.base == 'move' and self.tutorial_count == 2:
+                self.create_tutorial_popup()
+            if ability.base == 'stab back' and self.tutorial_count == 3:
+                self.create_tutorial_popup()
+            if ability.base == 'axe pull' and self.tutorial_count == 4:
+                self.create_tutorial_popup()
+        if self.game_mode == 'tutorial abilities':
+            if ability.base == '' and self.tutorial_count == 1:
+                self.create_tutorial_popup()
+
     def update(self, *args):
-        game = App.get_running_app().root.screens_dict['board'].ids['game']
+        game = self.parent
         if game.is_running:
             self.t += 1
             if 'tutorial' in self.game_mode and self.tutorial_count == 0:
                 self.create_tutorial_popup()
-
-        for child in self.children:
-            try:
-                child.update(*args)
-            except AttributeError:
-                pass
+            mate = self.match.update(math.inf if game.fast_forward else 1)
+            self.sync_board()
+            if mate is not None:
+                game.is_running = False
+                self.push_snapshot()
+                self.start_turn(mate)
+            elif self.match.winner is not None:
+                # nothing happens after the end of the match
+                game.is_running = False
+        # the bars only change when the match moved on or an ability was used
+        if self.dirty:
+            self.dirty = False
+            self.draw_mates()
 
 class MagicMatesGame(BoxLayout):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.is_running = True
+    # skip straight to the next turn instead of one tick per frame
+    fast_forward = False
+    # the timer of the match runs, False while waiting for the player to choose an ability
+    is_running = BooleanProperty(True)
+    def on_is_running(self, instance, value):
+        self.ids['playing_field'].update_ticking()
     def start_game(self, game_mode):
         self.is_running = True
-        self.ids['ability_menu'].clear_widgets()
+        self.ids['ability_menu'].remove_ability_prompts()
         self.ids['playing_field'].start_game(game_mode)
-    def update(self, *args):
-        for child in self.children:
-            try:
-                child.update(*args)
-            except AttributeError:
-                pass
+
+# timed while profiling, the frames are timed by the Ticker
+profiler.instrument(PlayingField, 'update', 'PlayingField.update')
+profiler.instrument(PlayingField, 'show_targets')
+profiler.instrument(AbilityMenu, 'create_ability_prompt')
 
 class MenuScreen(Screen):
     def start_game(self, game_mode):
         sm = App.get_running_app().root
         sm.current = 'board'
         sm.screens_dict['board'].start_game(game_mode)
+    def set_profiling(self, on):
+        ''' switch the instrumentation on, or off writing the trace to profiles/trace.json '''
+        if on:
+            profiler.enable()
+        else:
+            profiler.disable()
+            save_trace()
+        App.get_running_app().schedule_profile_overlay()
 
 class TutorialSelectScreen(Screen):
     def start_tutorial(self, game_mode):
@@ -1172,34 +673,58 @@ class TutorialSelectScreen(Screen):
 class BoardScreen(Screen):
     def start_game(self, game_mode):
         self.ids['game'].start_game(game_mode)
-    def update(self, *args):
-        for child in self.children:
-            try:
-                child.update(*args)
-            except AttributeError:
-                pass
+    # the board is only ticked while it is shown
+    def on_pre_enter(self, *args):
+        playing_field = self.ids['game'].ids['playing_field']
+        playing_field.shown = True
+        playing_field.update_ticking()
+    def on_pre_leave(self, *args):
+        playing_field = self.ids['game'].ids['playing_field']
+        playing_field.shown = False
+        playing_field.update_ticking()
 
 class UpdatingScreenManager(ScreenManager):
     screens_dict = {}
     def quit_game(self):
         App.get_running_app().stop()
-    def update(self, *args):
-        for child in self.children:
-            try:
-                child.update(*args)
-            except AttributeError:
-                pass
+
+def save_trace():
+    os.makedirs('profiles', exist_ok=True)
+    profiler.dump(os.path.join('profiles', 'trace.json'))
 
 class magicmatesApp(App):
+    profile_event = None
     def build(self):
+        # the textures need the gl context of the window
+        EventLoop.ensure_window()
+        atlas.preload()
         sm = UpdatingScreenManager()
-        Clock.schedule_interval(sm.update, 1/60.)
-
         sm.screens_dict = {'menu': MenuScreen(name='menu'), 'board': BoardScreen(name='board'), 'tutorial_select': TutorialSelectScreen(name='tutorial_select')}
         for key, screen in sm.screens_dict.items():
             sm.add_widget(screen)
+        sm.screens_dict['menu'].ids['profiling'].state = 'down' if profiler.enabled else 'normal'
+        self.schedule_profile_overlay()
         return sm
 
+    def schedule_profile_overlay(self):
+        ''' refresh the frame times shown on the board twice a second while profiling '''
+        if profiler.enabled and self.profile_event is None:
+            self.profile_event = Clock.schedule_interval(self.update_profile_overlay, 0.5)
+        elif not profiler.enabled and self.profile_event is not None:
+            self.profile_event.cancel()
+            self.profile_event = None
+            self.root.screens_dict['board'].ids['profile_overlay'].text = ''
+
+    def update_profile_overlay(self, *args):
+        stats = profiler.frame_stats()
+        if stats is not None:
+            self.root.screens_dict['board'].ids['profile_overlay'].text = 'frame p50 {:.2f} ms\np99 {:.2f} ms'.format(*stats)
+
+    def on_stop(self):
+        self.root.screens_dict['board'].ids['game'].ids['playing_field'].save_replay()
+        if profiler.enabled:
+            save_trace()
+
 if __name__ == "__main__":
     magicmatesApp().run()
 
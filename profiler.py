@@ -0,0 +1,103 @@
+''' optional instrumentation of the frame time and the hot paths of the game
+
+    MAGICMATES_PROFILE=1 python main.py
+
+or the Profiling button of the menu. While enabled the functions registered with instrument
+are wrapped and record a span (name, start, duration) per call into a ring buffer, the Ticker
+records the frames. The board shows the p50/p99 frame time of the recent frames, and dump
+writes the spans as a Chrome trace (chrome://tracing or ui.perfetto.dev). While disabled
+nothing is wrapped and the game runs the plain functions.
+'''
+import collections
+import functools
+import json
+import os
+import time
+
+clock = time.perf_counter_ns
+
+# (name, start, duration) in ns, the most recent ones
+spans = collections.deque(maxlen=200000)
+# the durations of the most recent frames in ns
+frames = collections.deque(maxlen=600)
+
+enabled = False
+# (owner, attribute, name, label) of the instrumented functions
+targets = []
+# (owner, attribute) -> the function replaced while enabled
+originals = {}
+
+def wrap(function, name, label):
+    ''' function recording a span per call, named after label(*args) if given '''
+    if label is None:
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                spans.append((name, start, clock() - start))
+    else:
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                spans.append((name + ' ' + label(*args), start, clock() - start))
+    return timed
+
+def instrument(owner, attribute, name=None, label=None):
+    ''' time owner.attribute (a function of a class or module) while enabled '''
+    target = (owner, attribute, name or attribute, label)
+    targets.append(target)
+    if enabled:
+        patch(*target)
+
+def patch(owner, attribute, name, label):
+    function = getattr(owner, attribute)
+    originals[(owner, attribute)] = function
+    setattr(owner, attribute, wrap(function, name, label))
+
+def enable():
+    global enabled
+    if enabled:
+        return
+    enabled = True
+    for target in targets:
+        patch(*target)
+
+def disable():
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    for (owner, attribute), function in originals.items():
+        setattr(owner, attribute, function)
+    originals.clear()
+
+def record_frame(start):
+    duration = clock() - start
+    frames.append(duration)
+    spans.append(('frame', start, duration))
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+def frame_stats():
+    ''' (p50, p99) of the recent frame times in ms, None before the first frame '''
+    if not frames:
+        return None
+    return percentile(frames, 0.5) / 1e6, percentile(frames, 0.99) / 1e6
+
+def dump(path):
+    ''' write the recorded spans as Chrome trace events '''
+    pid = os.getpid()
+    events = [{'name': name, 'ph': 'X', 'ts': start / 1e3, 'dur': duration / 1e3, 'pid': pid, 'tid': 0}
+            for name, start, duration in spans]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+if os.environ.get('MAGICMATES_PROFILE'):
+    enable()
@@ -0,0 +1,80 @@
+''' the reach patterns of weapons and moves, precomputed once per board size
+
+Cells are numbered like the children of the PlayingField, index = row*cols + col,
+boards have rows x cols cells.
+Sets of cells are bitboards: ints with bit index set for every cell in the set.
+'''
+import functools
+
+# (row, col) offsets of the fixed shaped reach patterns
+reach_offsets = {'sword': ((0, 1), (0, -1), (1, 0), (-1, 0)),
+        'axe': ((0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)),
+        'spear': ((0, 1), (0, -1), (0, 2), (0, -2), (1, 0), (-1, 0), (2, 0), (-2, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)),
+        'knight': ((1, 2), (1, -2), (2, 1), (2, -1), (-1, 2), (-1, -2), (-2, 1), (-2, -1))}
+
+# (row, col) steps of the sliding rays, rooks move straight and bishops diagonally
+ray_directions = {'rook': ((1, 0), (-1, 0), (0, 1), (0, -1)),
+        'bishop': ((1, 1), (1, -1), (-1, 1), (-1, -1))}
+
+def get_indices(mask):
+    ''' the cell indices of a bitboard, in increasing order '''
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+@functools.lru_cache(maxsize=None)
+def get_reach_table(pattern, rows, cols):
+    ''' a tuple holding, for every cell, the bitboard of cells within reach of the pattern '''
+    table = []
+    for index in range(rows*cols):
+        row, col = divmod(index, cols)
+        mask = 0
+        for d_row, d_col in reach_offsets[pattern]:
+            if 0 <= row+d_row < rows and 0 <= col+d_col < cols:
+                mask |= 1 << (row+d_row)*cols + col+d_col
+        table.append(mask)
+    return tuple(table)
+
+@functools.lru_cache(maxsize=None)
+def get_ray_table(d_row, d_col, rows, cols):
+    ''' a tuple holding, for every cell, the bitboard of the ray from that cell to the border '''
+    table = []
+    for index in range(rows*cols):
+        row, col = divmod(index, cols)
+        mask = 0
+        row += d_row
+        col += d_col
+        while 0 <= row < rows and 0 <= col < cols:
+            mask |= 1 << row*cols + col
+            row += d_row
+            col += d_col
+        table.append(mask)
+    return tuple(table)
+
+def get_reach_tables(rows, cols):
+    ''' a dict with the reach table of every fixed shaped pattern '''
+    return {pattern: get_reach_table(pattern, rows, cols) for pattern in reach_offsets}
+
+def get_ray_tables(rows, cols):
+    ''' a dict with (ray table, increasing) for the directions of rooks and bishops '''
+    return {name: tuple((get_ray_table(d_row, d_col, rows, cols), d_row*cols + d_col > 0) for d_row, d_col in directions)
+            for name, directions in ray_directions.items()}
+
+def get_sliding_mask(rays, index, occupied):
+    ''' the cells along the rays up to and including the first occupied cell of each ray '''
+    mask = 0
+    for table, increasing in rays:
+        ray = table[index]
+        blockers = ray & occupied
+        if blockers:
+            # cut the ray behind the nearest blocker
+            if increasing:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        mask |= ray
+    return mask
@@ -0,0 +1,186 @@
+''' reproducible matches: a compact binary log of the choices made in a Match and its playback
+
+A Match draws the random numbers of the rules from match.rng, seeded with match.seed, and
+the random choices of its AIs from match.ai_rng. The seed, the setup and the choices made
+by players and AIs therefore reproduce a match exactly, without running the AIs again.
+
+A replay starts with a header: magic, format version, seed, cols and rows, then the game mode and
+the team compositions (json, empty for the default ones), each prefixed by its length.
+Fixed width records follow, one per choice:
+
+    action:  ACTION, ability slot, ability id, mate row, target cell, turn
+    upgrade: UPGRADE or IMMEDIATE_UPGRADE, ability slot, upgrade position, mate row, 0, tick
+
+The ability slot is its position in mate.abilities, SLOT_NONE for an Ability the Mate does
+not own (as used by tutorial_ai), which is then created from its id, the position in the
+ability table. Target cell NO_TARGET stands for None. An IMMEDIATE_UPGRADE was chosen while
+the Ability leveled up (by an AI), an UPGRADE later on at the given tick (by the player).
+
+    recorder = Recorder(match)
+    ... play ...
+    recorder.save('bug.replay')
+    match = Replay.load('bug.replay').seek(120)
+
+Replay.seek returns the Match at the start of any turn. Playing forward it keeps a snapshot
+(keyframe) every keyframe_interval turns, so seeking back later on restarts at the closest
+keyframe instead of the start of the match.
+'''
+import json
+import math
+import struct
+
+import engine
+import gamedata
+
+magic = b'MMRP'
+version = 2
+header_format = struct.Struct('<4sBQBB')
+length_format = struct.Struct('<H')
+record_format = struct.Struct('<BBBHHI')
+
+# the kinds of records
+ACTION = 0
+UPGRADE = 1
+IMMEDIATE_UPGRADE = 2
+
+SLOT_NONE = 0xff
+NO_TARGET = 0xffff
+
+# the ability id is the position of its name in the ability table
+ability_names = list(gamedata.abilities)
+ability_ids = {name: k for k, name in enumerate(ability_names)}
+
+class ReplayError(Exception):
+    pass
+
+def pack_string(data):
+    return length_format.pack(len(data)) + data
+
+class Recorder():
+    ''' logs the choices made in a Match, attaching itself as match.recorder '''
+    def __init__(self, match):
+        self.match = match
+        teams = b'' if match.teams is None else json.dumps(match.teams).encode()
+        self.header = (header_format.pack(magic, version, match.seed, match.cols, match.rows)
+                + pack_string(match.game_mode.encode()) + pack_string(teams))
+        self.records = bytearray()
+        match.recorder = self
+
+    def record_action(self, mate, ability, index):
+        slot = SLOT_NONE if ability.slot is None else ability.slot
+        target = NO_TARGET if index is None else index
+        self.records += record_format.pack(ACTION, slot, ability_ids[ability.base], mate.row, target, self.match.turn)
+
+    def record_upgrade(self, mate, ability, upgrade, immediate):
+        slot = ability.slot
+        kind = IMMEDIATE_UPGRADE if immediate else UPGRADE
+        position = ability.possible_upgrades.index(upgrade)
+        self.records += record_format.pack(kind, slot, position, mate.row, 0, self.match.t)
+
+    def to_bytes(self):
+        return self.header + bytes(self.records)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+class Replay():
+    ''' the playback of a recorded match '''
+    def __init__(self, data, keyframe_interval=50):
+        magic_read, version_read, self.seed, self.cols, self.rows = header_format.unpack_from(data)
+        if magic_read != magic or version_read != version:
+            raise ReplayError('not a replay of version {}'.format(version))
+        offset = header_format.size
+        strings = []
+        for k in range(2):
+            length, = length_format.unpack_from(data, offset)
+            offset += length_format.size
+            strings.append(bytes(data[offset:offset+length]).decode())
+            offset += length
+        self.game_mode = strings[0]
+        self.teams = {int(team): composition for team, composition in json.loads(strings[1]).items()} if strings[1] else None
+        self.records = list(record_format.iter_unpack(data[offset:]))
+        self.turns = sum(1 for record in self.records if record[0] == ACTION)
+        self.keyframe_interval = keyframe_interval
+        # turn -> (snapshot of the match, position of its next record, turn)
+        self.keyframes = {}
+        self.match = None
+        self.position = 0
+        self.turn = 0
+
+    @classmethod
+    def load(cls, path, keyframe_interval=50):
+        with open(path, 'rb') as f:
+            return cls(f.read(), keyframe_interval)
+
+    def __len__(self):
+        ''' the number of turns recorded '''
+        return self.turns
+
+    def restore(self, match, position, turn):
+        ''' continue the playback from a copy of the match '''
+        self.match = match.snapshot()
+        self.match.controllers = {}
+        self.match.listener = self.on_match_event
+        self.position = position
+        self.turn = turn
+
+    def rewind(self):
+        match = engine.Match(self.game_mode, cols=self.cols, rows=self.rows, seed=self.seed, teams=self.teams)
+        self.restore(match, 0, 0)
+
+    def seek(self, turn):
+        ''' the Match when the turn starts, with its Mate active (0 for the first turn, len(self) for
+        the end of the match), owned by the Replay and changed by the next seek '''
+        if not 0 <= turn <= self.turns:
+            raise IndexError('turn {} out of range'.format(turn))
+        restart = self.match is None or turn < self.turn
+        start = max((k for k in self.keyframes if k <= turn), default=None)
+        if start is not None and (restart or start > self.turn):
+            self.restore(*self.keyframes[start])
+        elif restart:
+            self.rewind()
+        records = self.records
+        while self.turn < turn or (self.position < len(records) and records[self.position][0] != ACTION):
+            self.step()
+        # after the last record the timer ran on until the match ended or a turn started
+        match = self.match
+        while match.active is None and match.winner is None:
+            match.update(math.inf)
+        return match
+
+    def step(self):
+        ''' apply the next record '''
+        match = self.match
+        kind, slot, extra, row, target, time = self.records[self.position]
+        if kind == ACTION:
+            if self.turn % self.keyframe_interval == 0 and self.turn not in self.keyframes:
+                self.keyframes[self.turn] = (match.snapshot(), self.position, self.turn)
+            while match.active is None and match.winner is None:
+                match.update(math.inf)
+            mate = match.roster.mates[row]
+            if match.active is not mate or match.turn != time:
+                raise ReplayError('turn {} of the replay is out of sync'.format(self.turn))
+            ability = mate.abilities[slot] if slot != SLOT_NONE else engine.Ability(ability_names[extra])
+            self.position += 1
+            self.turn += 1
+            match.use_ability(mate, ability, None if target == NO_TARGET else target)
+        elif kind == UPGRADE:
+            while match.t < time and match.active is None and match.winner is None:
+                match.update(time - match.t)
+            self.position += 1
+            self.upgrade(match.roster.mates[row], slot, extra)
+        else:
+            raise ReplayError('upgrade {} of the replay is out of sync'.format(self.position))
+
+    def upgrade(self, mate, slot, position):
+        ability = mate.abilities[slot]
+        self.match.upgrade(mate, ability, ability.possible_upgrades[position])
+
+    def on_match_event(self, event, *args):
+        ''' apply the upgrades AIs chose right away when leveling up '''
+        if event == 'level_up' and self.position < len(self.records):
+            kind, slot, position, row, target, time = self.records[self.position]
+            if kind == IMMEDIATE_UPGRADE:
+                self.position += 1
+                self.upgrade(self.match.roster.mates[row], slot, position)
@@ -0,0 +1,122 @@
+''' the numbers of all Mates of a Match, kept in struct-of-arrays form
+
+Every Mate owns a row of the Roster and its health, mana, t, ... are views of that row
+(see column_property), so the turn timer can advance all Mates at once with a few array
+operations (see Match.tick). The StatusEffects of a Mate live in the same row, one column
+per mode. A Mate leaving the board stops being alive and its row goes to the next Mate
+added, so summons coming and going do not grow the Roster or the clones of the Match.
+'''
+import numpy as np
+
+# the float columns, one per number of a Mate
+float_columns = ('health', 'max_health', 'health_regen', 'armor', 'max_armor', 'armor_regen',
+        'mana', 'max_mana', 'mana_regen', 't', 'max_t', 'base_damage',
+        'damage_reduction_front', 'damage_reduction_side')
+
+class Roster():
+    ''' a table with one row per Mate of a Match '''
+    def __init__(self, modes, capacity=16):
+        self.modes = modes
+        self.size = 0
+        self.capacity = capacity
+        self.mates = []
+        # the rows of dead Mates, taken by add before the Roster grows
+        self.free = []
+        for name in float_columns:
+            setattr(self, name, np.zeros(capacity))
+        self.team = np.zeros(capacity, dtype=np.int64)
+        # the cell index of the Mate, -1 if it is not on the board
+        self.cell = np.full(capacity, -1, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.effect_t = np.zeros((capacity, modes))
+        self.effect_stacks = np.zeros((capacity, modes), dtype=np.int64)
+        self.effect_active = np.zeros((capacity, modes), dtype=bool)
+
+    def get_array_names(self):
+        return float_columns + ('team', 'cell', 'alive', 'effect_t', 'effect_stacks', 'effect_active')
+
+    def grow(self):
+        ''' double the capacity, copying all rows '''
+        capacity = 2 * self.capacity
+        for name in self.get_array_names():
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.cell[self.capacity:] = -1
+        self.capacity = capacity
+
+    def add(self, mate):
+        ''' give the Mate a row, a freed one if any, returns the row index
+
+        The dead Mate of a freed row gets a Roster of its own with its numbers (see detach),
+        so it can still be read by whoever holds on to it.
+        '''
+        if self.free:
+            row = self.free.pop()
+            self.mates[row].detach(self.copy_row(row))
+            self.clear(row)
+            self.mates[row] = mate
+            return row
+        if self.size == self.capacity:
+            self.grow()
+        row = self.size
+        self.size += 1
+        self.mates.append(mate)
+        return row
+
+    def release(self, row):
+        ''' free the row of a dead Mate for the next add '''
+        self.free.append(row)
+
+    def clear(self, row):
+        ''' reset the row to the numbers of a row never used '''
+        for name in self.get_array_names():
+            getattr(self, name)[row] = 0
+        self.cell[row] = -1
+
+    def copy_row(self, row):
+        ''' a Roster with just a copy of the row, as its row 0 '''
+        roster = Roster.__new__(Roster)
+        roster.modes = self.modes
+        roster.size = 1
+        roster.capacity = 1
+        roster.mates = [self.mates[row]]
+        roster.free = []
+        for name in self.get_array_names():
+            setattr(roster, name, getattr(self, name)[row:row+1].copy())
+        return roster
+
+    def copy(self):
+        ''' a copy with its own arrays of just the rows in use, mates has to be filled in by the caller '''
+        roster = Roster.__new__(Roster)
+        roster.modes = self.modes
+        roster.size = self.size
+        roster.capacity = max(self.size, 1)
+        roster.mates = []
+        roster.free = list(self.free)
+        for name in self.get_array_names():
+            setattr(roster, name, getattr(self, name)[:roster.capacity].copy())
+        return roster
+
+    def get_board_rows(self):
+        ''' the rows of the Mates alive on the board '''
+        size = self.size
+        # nonzero is a lot faster than np.flatnonzero on the 1d arrays of the Roster
+        return (self.alive[:size] & (self.cell[:size] >= 0)).nonzero()[0]
+
+def column_property(name):
+    ''' a property viewing the column name in the row of the Mate '''
+    def get(self):
+        return getattr(self.roster, name).item(self.row)
+    def set(self, value):
+        getattr(self.roster, name)[self.row] = value
+    return property(get, set)
+
+def effect_property(name):
+    ''' a property viewing the column name in the row and slot of the StatusEffect '''
+    def get(self):
+        return getattr(self.roster, name).item(self.row, self.slot)
+    def set(self, value):
+        getattr(self.roster, name)[self.row, self.slot] = value
+    return property(get, set)
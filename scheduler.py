@@ -0,0 +1,348 @@
+''' an event driven turn timer: jump straight to the next event instead of ticking
+
+Between two events every Mate changes by the same steps each tick: health passes through
+its regen and the health changes of its StatusEffects (clamped to max_health), mana
+regenerates, t moves by +1 (and -2 while stunned) and all StatusEffects count down.
+Events are a Mate starting its turn, a StatusEffect running out, a stun ending and a Mate
+dying from damage over time.
+
+The Scheduler keeps the next event of each Mate in a priority queue, jumps to the tick
+right before the earliest one and plays that tick with Match.tick, so events resolve
+exactly as in the tick loop. Turns starting are jumped to directly, as they only stop
+the timer, and events only a few ticks away are reached with Match.tick, which is cheaper
+than a jump for them. Event ticks are lower bounds, if an event did not happen yet the Mate
+is simply rescheduled. After a turn only the Mates whose numbers changed are rescheduled.
+Mates leave the schedule when they die, as their row may go to a Mate summoned later.
+Jumps reproduce the floating point results of the tick loop bit for bit (see
+repeat_steps), so a match plays out identically either way.
+'''
+import functools
+import heapq
+import itertools
+import math
+
+import numpy as np
+
+# a Match.tick costs about as much as jumping this many Mates, so the events closer than
+# (number of Mates) / tick_mates ticks are reached with Match.tick instead of a jump
+tick_mates = 12
+
+# the Roster columns the schedule of a Mate depends on
+schedule_columns = ('health', 'max_health', 'health_regen', 'mana', 'max_mana', 'mana_regen',
+        't', 'max_t', 'alive', 'effect_t', 'effect_stacks', 'effect_active')
+
+def get_schedule_state(roster):
+    ''' a copy of the schedule_columns of all rows, compare with get_changed_rows '''
+    size = roster.size
+    return [getattr(roster, name)[:size].copy() for name in schedule_columns]
+
+def get_changed_rows(roster, state):
+    ''' the rows of the state (see get_schedule_state) whose numbers changed since '''
+    size = len(state[0])
+    changed = np.zeros(size, dtype=bool)
+    for name, old in zip(schedule_columns, state):
+        differs = getattr(roster, name)[:size] != old
+        if differs.ndim > 1:
+            differs = differs.any(axis=1)
+        changed |= differs
+    return changed.nonzero()[0]
+
+def tick_steps(x, steps, lower=-math.inf, upper=math.inf):
+    ''' one tick of a value as done by change_health/change_mana: add each step, then clamp '''
+    for step in steps:
+        x = x + step
+        if x < lower:
+            x = lower
+        if x > upper:
+            x = upper
+    return x
+
+@functools.lru_cache(maxsize=4096)
+def get_binade_delta(steps, exponent):
+    ''' return (delta, min_prefix, max_prefix) for values in the binade [2**(exponent-1), 2**exponent),
+    None if a step leaves the binade right away or is a round half to even tie '''
+    ulp = math.ulp(math.ldexp(0.5, exponent))
+    delta = 0.
+    max_prefix = -math.inf
+    min_prefix = math.inf
+    for step in steps:
+        q = step / ulp
+        if abs(q) >= 2.**52 or q - math.floor(q) == 0.5:
+            return None
+        delta += math.floor(q + 0.5) * ulp
+        max_prefix = max(max_prefix, delta)
+        min_prefix = min(min_prefix, delta)
+    return delta, min_prefix, max_prefix
+
+def count_binade_ticks(x, steps, upper):
+    ''' return (k, delta): for the next k ticks every step stays inside the binade of x
+    without clamping, so each tick adds exactly delta '''
+    mantissa, exponent = math.frexp(x)
+    binade_delta = get_binade_delta(steps, exponent)
+    if binade_delta is None:
+        return 0, 0.
+    delta, min_prefix, max_prefix = binade_delta
+    ulp = math.ulp(x)
+    lo = math.ldexp(0.5, exponent) + ulp
+    hi = min(math.ldexp(1., exponent) - ulp, upper)
+    if x + min_prefix < lo or x + max_prefix > hi:
+        return 0, 0.
+    if delta > 0:
+        k = math.floor((hi - x - max_prefix) / delta) + 1
+        while k > 0 and x + (k-1)*delta + max_prefix > hi:
+            k -= 1
+    elif delta < 0:
+        k = math.floor((x + min_prefix - lo) / -delta) + 1
+        while k > 0 and x + (k-1)*delta + min_prefix < lo:
+            k -= 1
+    else:
+        k = math.inf
+    return k, delta
+
+def repeat_steps(x, steps, n, lower=-math.inf, upper=math.inf):
+    ''' the value after n ticks, bit for bit equal to calling tick_steps n times
+
+    Inside a binade all values are multiples of the same ulp, so adding a step always adds
+    the same rounded amount. Ticks are only played one by one when crossing into another
+    binade or clamping, and a tick leaving the value unchanged ends the loop early.
+    '''
+    if lower == -math.inf and upper == math.inf and float(x).is_integer() and all(float(step).is_integer() for step in steps) and abs(x) < 2.**52:
+        # whole numbers add up exactly, as t does after a turn
+        return x + n*sum(steps)
+    while n > 0:
+        y = tick_steps(x, steps, lower, upper)
+        n -= 1
+        if y == x:
+            return x
+        x = y
+        if n > 0 and x > 0 and x > lower:
+            k, delta = count_binade_ticks(x, steps, upper)
+            if k >= n:
+                return x + n*delta
+            x += k*delta
+            n -= k
+    return x
+
+def get_health_steps(mate):
+    ''' the health changes of one tick, in the order the tick loop applies them '''
+    steps = [mate.health_regen]
+    for status_effect in mate.status_effects:
+        change = status_effect.get_health_change()
+        if change is not None:
+            steps.append(change)
+    return tuple(steps)
+
+def get_time_steps(mate):
+    ''' the changes of t in one tick '''
+    if mate.status_effects.has('stunned'):
+        return (1., -2.)
+    return (1.,)
+
+def get_ready_ticks(mate, time_steps):
+    ''' the exact number of ticks until t reaches max_t, math.inf for stunned Mates '''
+    if sum(time_steps) <= 0:
+        return math.inf
+    t = mate.t
+    max_t = mate.max_t
+    ticks = max(1, math.ceil(max_t - t))
+    while ticks > 1 and repeat_steps(t, time_steps, ticks-1) >= max_t:
+        ticks -= 1
+    while repeat_steps(t, time_steps, ticks) < max_t:
+        ticks += 1
+    return ticks
+
+def get_event_ticks(mate, health_steps, time_steps):
+    ''' a lower bound for the number of ticks until the next event of the Mate that
+    has to be played by the tick loop: a StatusEffect running out, a stun ending or dying '''
+    ticks = math.inf
+    if sum(time_steps) <= 0:
+        ticks = math.floor(mate.t) + 1
+    for status_effect in mate.status_effects:
+        if status_effect.t < math.inf:
+            ticks = min(ticks, math.floor(status_effect.t) + 1)
+    # dying from damage over time: a tick maps health h to min(h + s, b) and never
+    # drops it below its start plus the negative steps
+    s = 0.
+    b = math.inf
+    negative = 0.
+    max_health = mate.max_health
+    for step in health_steps:
+        s += step
+        b = min(b + step, max_health)
+        negative += min(step, 0.)
+    if negative < 0:
+        health = mate.health
+        if s >= 0:
+            if min(health, b) + negative < 0:
+                ticks = 1
+        else:
+            lowest = min(health, b - s) + negative
+            if lowest < 0:
+                ticks = 1
+            else:
+                ticks = min(ticks, math.floor(lowest / -s) + 2)
+    # keep one tick of margin for floating point rounding
+    return max(1, ticks - 1)
+
+class Scheduler():
+    ''' advances the turn timer of a Match from event to event '''
+    def __init__(self, match):
+        self.match = match
+        self.queue = []
+        self.steps = {}
+        self.versions = {}
+        self.counter = itertools.count()
+        self.dirty = True
+        self.turn_state = None
+        # the Mates created during the turn
+        self.created = []
+
+    def invalidate(self):
+        ''' reschedule all Mates before the next jump, needed after changes outside the tick loop and turns '''
+        self.dirty = True
+
+    def start_turn(self):
+        ''' remember the numbers of all Mates, see end_turn '''
+        self.turn_state = None if self.dirty else get_schedule_state(self.match.roster)
+        self.created = []
+
+    def end_turn(self, mates=()):
+        ''' reschedule the given Mates and the ones whose numbers changed since start_turn '''
+        state = self.turn_state
+        self.turn_state = None
+        if state is None:
+            self.dirty = True
+            return
+        if self.dirty:
+            return
+        roster = self.match.roster
+        rows = set(get_changed_rows(roster, state).tolist())
+        # a Mate summoned into the freed row of a dead one may look unchanged
+        rows.update(mate.row for mate in self.created if mate.roster is roster)
+        self.created = []
+        rows.update(mate.row for mate in mates if mate.roster is roster)
+        for row in sorted(rows):
+            self.reschedule(roster.mates[row])
+
+    def add(self, mate):
+        ''' schedule a new Mate at the end of the turn, or with all Mates if outside a turn '''
+        if self.turn_state is None:
+            self.dirty = True
+        else:
+            self.created.append(mate)
+
+    def remove(self, mate):
+        ''' forget a Mate leaving the board, its queued events are dropped as outdated '''
+        self.versions.pop(mate, None)
+        self.steps.pop(mate, None)
+
+    def reschedule(self, mate):
+        if not mate.alive:
+            self.remove(mate)
+            return
+        version = self.versions.get(mate, 0) + 1
+        self.versions[mate] = version
+        health_steps = get_health_steps(mate)
+        time_steps = get_time_steps(mate)
+        # health only healing stays at max_health, jump skips it there
+        self.steps[mate] = (health_steps, time_steps, min(health_steps) >= 0)
+        event_ticks = get_event_ticks(mate, health_steps, time_steps)
+        ready_ticks = get_ready_ticks(mate, time_steps)
+        # a turn starting needs no special tick, the timer just stops right after it
+        if ready_ticks < event_ticks:
+            heapq.heappush(self.queue, (self.match.t + ready_ticks, next(self.counter), mate, version, False))
+        elif event_ticks < math.inf:
+            heapq.heappush(self.queue, (self.match.t + event_ticks, next(self.counter), mate, version, True))
+
+    def rebuild(self):
+        self.queue = []
+        self.steps = {}
+        self.versions = {}
+        for mate in self.match.get_mates():
+            self.reschedule(mate)
+        self.dirty = False
+
+    def pop_due(self, t):
+        ''' pop the Mates with an event at tick t or earlier, dropping outdated entries,
+        returns the Mates and whether one of the events has to be played by the tick loop '''
+        due = []
+        needs_tick = False
+        while self.queue and self.queue[0][0] <= t:
+            event_t, count, mate, version, tick = heapq.heappop(self.queue)
+            if self.versions.get(mate) == version:
+                due.append(mate)
+                needs_tick = needs_tick or tick
+        return due, needs_tick
+
+    def next_event(self):
+        ''' the tick of the next event, math.inf if nothing is scheduled '''
+        while self.queue:
+            event_t, count, mate, version, tick = self.queue[0]
+            if self.versions.get(mate) == version:
+                return event_t
+            heapq.heappop(self.queue)
+        return math.inf
+
+    def jump(self, n):
+        ''' advance all Mates by n ticks, there must be no event in between '''
+        roster = self.match.roster
+        # plain floats are a lot faster than the Roster for the mostly scalar replay
+        health = roster.health.tolist()
+        max_health = roster.max_health.tolist()
+        mana = roster.mana.tolist()
+        mana_regen = roster.mana_regen.tolist()
+        max_mana = roster.max_mana.tolist()
+        t = roster.t.tolist()
+        for mate, (health_steps, time_steps, healing) in self.steps.items():
+            row = mate.row
+            # full health and mana stay full, as repeat_steps would find after one tick
+            if not healing or health[row] != max_health[row]:
+                health[row] = repeat_steps(health[row], health_steps, n, upper=max_health[row])
+            if mana_regen[row] < 0 or mana[row] != max_mana[row]:
+                mana[row] = repeat_steps(mana[row], (mana_regen[row],), n, lower=0, upper=max_mana[row])
+            t[row] = repeat_steps(t[row], time_steps, n)
+        roster.health[:] = health
+        roster.mana[:] = mana
+        roster.t[:] = t
+        # the remaining time of StatusEffects is a whole number, so it counts down exactly
+        rows = roster.get_board_rows()
+        effect_t = roster.effect_t[rows]
+        roster.effect_t[rows] = np.where(roster.effect_active[rows], effect_t - n, effect_t)
+        self.match.t += n
+
+    def advance(self, max_ticks=math.inf):
+        ''' advance until a Mate is ready to start its turn or max_ticks passed, returns the ticks advanced '''
+        match = self.match
+        ticks = 0
+        while ticks < max_ticks and match.winner is None and match.get_ready_mate() is None:
+            if self.dirty:
+                self.rebuild()
+            event_t = self.next_event()
+            if event_t == math.inf and max_ticks == math.inf:
+                break
+            if min(event_t - match.t, max_ticks - ticks) <= 1 + len(self.steps) // tick_mates:
+                match.tick()
+                ticks += 1
+                due, needs_tick = self.pop_due(match.t)
+            elif event_t - match.t > max_ticks - ticks:
+                # no event before max_ticks, just jump
+                jump = max_ticks - ticks
+                self.jump(jump)
+                ticks += jump
+                break
+            else:
+                due, needs_tick = self.pop_due(event_t)
+                if needs_tick:
+                    if event_t - match.t > 1:
+                        jump = event_t - match.t - 1
+                        self.jump(jump)
+                        ticks += jump
+                    match.tick()
+                    ticks += 1
+                else:
+                    jump = event_t - match.t
+                    self.jump(jump)
+                    ticks += jump
+            for mate in due:
+                self.reschedule(mate)
+        return ticks
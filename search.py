@@ -0,0 +1,197 @@
+''' a search based opponent, usable as a controller of Match.controllers
+
+SearchAI looks ahead over the actions (ability, target cell) of the Mates in the order the
+turn timer gives them turns. Mates of its own team pick the best action, the others the worst
+one for it (alpha-beta). Random outcomes of abilities are decided by an rng seeded from the
+hash of the position, so each position has a single outcome and can be cached.
+Positions are hashed Zobrist style from the quantized numbers of all Mates and kept in a
+transposition table of bounded size, evicting the least recently used entries. Iterative
+deepening searches one ply deeper at a time until the time budget is used up and plays the
+best action of the deepest finished search, the first ply is always searched in full.
+'''
+import collections
+import math
+import random
+import time
+
+import numpy as np
+
+# values of won and lost matches, bigger than any evaluation
+win_value = 1e6
+
+# flags of the values in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+class Timeout(Exception):
+    pass
+
+class ZobristHasher():
+    ''' hashes a Match by XOR-ing a random 64 bit key per feature of each Mate
+
+    Health, armor and mana are quantized to steps of 5, t and the remaining time of
+    StatusEffects to steps of 10, so nearby positions share their hash. Keys are drawn when
+    a feature is seen the first time, there are only a few thousand of them.
+    '''
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.keys = {}
+
+    def get_key(self, feature):
+        key = self.keys.get(feature)
+        if key is None:
+            key = self.rng.getrandbits(64)
+            self.keys[feature] = key
+        return key
+
+    def hash(self, match, mate):
+        ''' the hash of the Match with mate to act next '''
+        get_key = self.get_key
+        roster = match.roster
+        h = get_key(('to act', match.index(mate)))
+        for row in roster.get_board_rows().tolist():
+            cell = roster.cell.item(row)
+            h ^= get_key(('mate', cell, roster.team.item(row), roster.mates[row].weapon))
+            h ^= get_key(('health', cell, int(roster.health.item(row) // 5)))
+            h ^= get_key(('armor', cell, int(roster.armor.item(row) // 5)))
+            h ^= get_key(('mana', cell, int(roster.mana.item(row) // 5)))
+            h ^= get_key(('t', cell, int(roster.t.item(row) // 10)))
+            for slot in roster.effect_active[row].nonzero()[0].tolist():
+                effect_t = roster.effect_t.item(row, slot)
+                h ^= get_key(('effect', cell, slot, roster.effect_stacks.item(row, slot), -1 if effect_t == math.inf else int(effect_t // 10)))
+        return h
+
+class TranspositionTable():
+    ''' the values of searched positions by hash, holding at most size entries '''
+    def __init__(self, size=100000):
+        self.size = size
+        self.entries = collections.OrderedDict()
+
+    def get(self, h):
+        ''' (depth, value, flag, action) or None '''
+        entry = self.entries.get(h)
+        if entry is not None:
+            self.entries.move_to_end(h)
+        return entry
+
+    def store(self, h, depth, value, flag, action):
+        self.entries[h] = (depth, value, flag, action)
+        self.entries.move_to_end(h)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+def evaluate(match, team):
+    ''' the value of the Match for team: the health, armor and mana of its Mates minus the
+    ones of the enemies, with a bonus per Mate alive '''
+    if match.winner is not None:
+        return win_value if match.winner == team else -win_value
+    roster = match.roster
+    rows = roster.get_board_rows()
+    values = 60. + roster.health[rows] + 0.4 * roster.armor[rows] + 0.1 * roster.mana[rows]
+    return float(np.sum(np.where(roster.team[rows] == team, values, -values)))
+
+def get_actions(match, mate):
+    ''' the legal actions of the Mate as (ability position, target cell) '''
+    positions = {id(ability): position for position, ability in enumerate(mate.abilities)}
+    return [(positions[id(ability)], index) for ability, index in match.get_legal_actions(mate)]
+
+class SearchAI():
+    ''' a controller searching the actions of its Mates for up to time_budget seconds per turn '''
+    def __init__(self, time_budget=0.2, max_depth=8, table_size=100000, seed=0):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.hasher = ZobristHasher(seed)
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0
+        self.depth = 0
+
+    def __call__(self, match, mate):
+        self.team = mate.team
+        start = time.perf_counter()
+        self.nodes = 0
+        self.depth = 0
+        actions = get_actions(match, mate)
+        best = actions[0]
+        if len(actions) > 1:
+            for depth in range(1, self.max_depth + 1):
+                # the first ply always finishes, so a short budget still plays the best
+                # action by evaluate instead of whichever comes first
+                self.deadline = math.inf if depth == 1 else start + self.time_budget
+                try:
+                    value, action = self.search(match, mate, depth, -math.inf, math.inf)
+                except Timeout:
+                    break
+                best = action
+                self.depth = depth
+                if abs(value) >= win_value:
+                    break
+        position, index = best
+        return mate.abilities[position], index
+
+    def play(self, match, mate, action, h):
+        ''' a clone of the Match after the Mate used the action and the timer ran to the next turn,
+        returns the clone and the Mate acting next (None if the match ended) '''
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise Timeout()
+        child = match.clone(random.Random(h ^ hash(action)))
+        child.controllers = {1: None, 2: None}
+        position, index = action
+        child_mate = child.cells[match.index(mate)]
+        child_mate.end_ability(child_mate.abilities[position], index)
+        if child.winner is not None:
+            return child, None
+        child_mate = child.get_ready_mate()
+        if child_mate is None:
+            child.scheduler.advance(math.inf)
+            child_mate = child.get_ready_mate()
+        return child, child_mate
+
+    def order(self, actions, best):
+        ''' search the best action of a previous search first '''
+        if best in actions:
+            actions.remove(best)
+            actions.insert(0, best)
+        return actions
+
+    def search(self, match, mate, depth, alpha, beta):
+        ''' alpha-beta search, returns (value for the team of the AI, best action) '''
+        h = self.hasher.hash(match, mate)
+        entry = self.table.get(h)
+        best = None
+        if entry is not None:
+            entry_depth, value, flag, best = entry
+            if entry_depth >= depth:
+                if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                    return value, best
+        actions = self.order(get_actions(match, mate), best)
+        maximize = mate.team == self.team
+        alpha0 = alpha
+        beta0 = beta
+        best_value = -math.inf if maximize else math.inf
+        best = actions[0]
+        for action in actions:
+            child, child_mate = self.play(match, mate, action, h)
+            if child_mate is None or depth == 1:
+                value = evaluate(child, self.team)
+            else:
+                value, _ = self.search(child, child_mate, depth - 1, alpha, beta)
+            if maximize:
+                if value > best_value:
+                    best_value, best = value, action
+                alpha = max(alpha, value)
+            else:
+                if value < best_value:
+                    best_value, best = value, action
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        if best_value <= alpha0:
+            flag = UPPER
+        elif best_value >= beta0:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(h, depth, best_value, flag, best)
+        return best_value, best
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import common
+
+# the widget tests import kivy, which reads its settings from the environment on import
+common.use_offscreen_window()
+
+@pytest.fixture
+def empty_match():
+    ''' the factory of sandbox Matches without Mates, (cols, rows) -> Match '''
+    return common.create_empty_match
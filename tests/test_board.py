@@ -0,0 +1,263 @@
+''' boards of any size: the default 7x7 board has to give the results of the loops over
+cells and of push_back the engine started with, copied below as they were '''
+import random
+
+import pytest
+
+import damage
+import engine
+import reach
+
+cols = engine.cols
+
+def original_direction(cols, index1, team1, index2, team2):
+    ''' get_direction before the direction table, mate1 is hit by mate2 '''
+    mate1_col = index1%cols
+    mate1_row = (index1-mate1_col)/cols
+    mate2_col = index2%cols
+    mate2_row = (index2-mate2_col)/cols
+    if mate1_row == mate2_row:
+        return 'side'
+    if mate1_row > mate2_row:
+        if team1 > team2:
+            return 'front'
+        else: return 'back'
+    if mate1_row < mate2_row:
+        if team1 > team2:
+            return 'back'
+        else: return 'front'
+
+def original_sword_index(cells, cols, index):
+    index_list = [index+1, index-1, index+cols, index-cols]
+    index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
+    if index%cols == 0:
+        index_list = [i for i in index_list if i%cols <= 2] # remove right border
+    if index%cols == cols-1:
+        index_list = [i for i in index_list if i%cols >= cols-3] # remove left border
+    return index_list
+
+def original_axe_index(cells, cols, index):
+    index_list = [index+1, index-1, index+cols, index-cols, index+1+cols, index-1+cols, index+1-cols, index-1-cols]
+    index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
+    if index%cols == 0:
+        index_list = [i for i in index_list if i%cols <= 2] # remove right border
+    if index%cols == cols-1:
+        index_list = [i for i in index_list if i%cols >= cols-3] # remove left border
+    return index_list
+
+def original_spear_index(cells, cols, index):
+    index_list = [index+1, index-1, index+2, index-2, index+cols, index-cols, index+2*cols, index-2*cols, index+1+cols, index-1+cols, index+1-cols, index-1-cols]
+    index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
+    if index%cols == 0 or index%cols == 1:
+        index_list = [i for i in index_list if i%cols <= 3] # remove right border
+    if index%cols == cols-1 or index%cols == cols-2:
+        index_list = [i for i in index_list if i%cols >= cols-4] # remove left border
+    return index_list
+
+def original_knight_index(cells, cols, index):
+    index_list = [index+cols+2, index+cols-2, index+2*cols+1, index+2*cols-1, index-cols+2, index-cols-2, index-2*cols+1, index-2*cols-1]
+    index_list = [i for i in index_list if i >= 0 and i < cols**2] # remove upper and lower borders
+    if index%cols == 0 or index%cols == 1:
+        index_list = [i for i in index_list if i%cols <= 3] # remove right border
+    if index%cols == cols-1 or index%cols == cols-2:
+        index_list = [i for i in index_list if i%cols >= cols-4] # remove left border
+    return index_list
+
+def original_bishop_index(cells, cols, index):
+    index_list = []
+    top_left = True
+    top_right = True
+    bot_left = True
+    bot_right = True
+    if index%cols == cols-1:
+        top_left = False
+        bot_left = False
+    if index%cols == 0:
+        top_right = False
+        bot_right = False
+    if index < cols:
+        bot_left = False
+        bot_right = False
+    if index > cols**2-cols:
+        top_left = False
+        top_right = False
+    for i in range(1, cols+2):
+        if top_left:
+            new_index = index+i+i*cols
+            index_list.append(new_index)
+            if new_index%cols == cols-1 or new_index >= cols**2-cols or cells[new_index] is not None:
+                top_left = False
+        if top_right:
+            new_index = index-i+i*cols
+            index_list.append(new_index)
+            if new_index%cols == 0 or new_index >= cols**2-cols or cells[new_index] is not None:
+                top_right = False
+        if bot_left:
+            new_index = index+i-i*cols
+            index_list.append(new_index)
+            if new_index%cols == cols-1 or new_index <= cols or cells[new_index] is not None:
+                bot_left = False
+        if bot_right:
+            new_index = index-i-i*cols
+            index_list.append(new_index)
+            if new_index%cols == 0 or new_index <= cols or cells[new_index] is not None:
+                bot_right = False
+    index_list = [index for index in index_list if index >= 0 and index < cols**2]
+    return index_list
+
+def original_rook_index(cells, cols, index):
+    index_list = []
+    top = True
+    right = True
+    bot = True
+    left = True
+    if index%cols == cols-1:
+        left = False
+    if index%cols == 0:
+        right = False
+    if index < cols:
+        bot = False
+    if index > cols**2-cols:
+        top = False
+    for i in range(1, cols+2):
+        if top:
+            new_index = index+i*cols
+            index_list.append(new_index)
+            if new_index >= cols**2-cols or cells[new_index] is not None:
+                top = False
+        if bot:
+            new_index = index-i*cols
+            index_list.append(new_index)
+            if new_index < cols-1 or cells[new_index] is not None:
+                bot = False
+        if left:
+            new_index = index+i
+            index_list.append(new_index)
+            if new_index%cols == cols-1 or cells[new_index] is not None:
+                left = False
+        if right:
+            new_index = index-i
+            index_list.append(new_index)
+            if new_index%cols == 0 or cells[new_index] is not None:
+                right = False
+    index_list = [index for index in index_list if index >= 0 and index < cols**2]
+    return index_list
+
+def original_adjust_target_type(cells, mate, index, index_list, target_type):
+    if target_type == 'move' or target_type == 'summon':
+        return [index for index in index_list if cells[index] is None]
+    else:
+        index_list = [index for index in index_list if cells[index] is not None]
+        if 'enemy' in target_type:
+            index_list = [index for index in index_list if mate.team != cells[index].team]
+        if 'ally' in target_type:
+            index_list = [index for index in index_list if mate.team == cells[index].team]
+        if 'self' in target_type:
+            index_list.append(index)
+        return index_list
+
+def original_targets(cells, cols, mate, index, reach_name, target_type):
+    ''' the targets of get_sword_index, ..., get_queen_index before bitboards '''
+    if reach_name == 'queen':
+        return list(set(original_targets(cells, cols, mate, index, 'rook', target_type)
+                + original_targets(cells, cols, mate, index, 'bishop', target_type)))
+    index_list = original_indices[reach_name](cells, cols, index)
+    return original_adjust_target_type(cells, mate, index, index_list, target_type)
+
+original_indices = {'sword': original_sword_index, 'axe': original_axe_index, 'spear': original_spear_index,
+        'knight': original_knight_index, 'bishop': original_bishop_index, 'rook': original_rook_index}
+
+target_types = ('move', 'summon', 'enemy', 'ally', 'self', 'all enemies')
+
+def original_push_index(self_index, target_index, cols):
+    ''' the cell push_back moved the target to, the target cell if it stayed '''
+    self_row = self_index%cols
+    self_col = (self_index-self_row)/cols
+    target_row = target_index%cols
+    target_col = (target_index-target_row)/cols
+    push = 0
+    if self_row == target_row:
+        if self_col < target_col:
+            push = cols
+            if target_col == cols-1:
+                push = 0
+        else:
+            push = -cols
+            if target_col == 0:
+                push = 0
+    elif self_col == target_col:
+        if self_row < target_row:
+            push = 1
+            if target_row%cols == cols-1:
+                push = 0
+        else:
+            push = -1
+            if target_row%cols == 0:
+                push = 0
+    elif self_row < target_row:
+        if self_col < target_col:
+            push = cols+1
+            if target_col == cols-1 or target_row%cols == cols-1:
+                push = 0
+        else:
+            push = -cols+1
+            if target_col == 0 or target_row%cols == cols-1:
+                push = 0
+    elif self_row > target_row:
+        if self_col > target_col:
+            push = -cols-1
+            if target_col == 0 or target_row%cols == 0:
+                push = 0
+        else:
+            push = cols-1
+            if target_col == cols-1 or target_row%cols == 0:
+                push = 0
+    return target_index + push
+
+def create_random_board(rng, empty_match):
+    ''' a board with up to 24 Mates of both teams on random cells '''
+    match = empty_match()
+    for index in rng.sample(range(cols**2), rng.randrange(1, 25)):
+        match.create_mate(rng.choice((1, 2)), [], 'axe', index)
+    return match
+
+def test_direction_table():
+    table = damage.get_direction_table(cols)
+    directions = {'front': damage.FRONT, 'side': damage.SIDE, 'back': damage.BACK}
+    for index1 in range(cols**2):
+        for index2 in range(cols**2):
+            for team1, team2 in ((1, 2), (2, 1), (1, 1)):
+                direction = table[int(team1 > team2), index1 // cols, index2 // cols]
+                assert direction == directions[original_direction(cols, index1, team1, index2, team2)]
+
+@pytest.mark.parametrize('pattern', list(reach.reach_offsets))
+def test_reach_table(pattern):
+    table = reach.get_reach_table(pattern, cols, cols)
+    cells = [None] * cols**2
+    for index in range(cols**2):
+        assert reach.get_indices(table[index]) == sorted(original_indices[pattern](cells, cols, index))
+
+@pytest.mark.parametrize('reach_name', ['sword', 'axe', 'spear', 'knight', 'bishop', 'rook', 'queen'])
+def test_targets_match_original_loops(reach_name, empty_match):
+    rng = random.Random(reach_name)
+    for board in range(300):
+        match = create_random_board(rng, empty_match)
+        get_index = getattr(match, 'get_{}_index'.format(reach_name))
+        for mate in match.get_mates():
+            index = match.index(mate)
+            for target_type in target_types:
+                expected = original_targets(match.cells, cols, mate, index, reach_name, target_type)
+                assert sorted(get_index(mate, target_type)) == sorted(expected), (board, index, target_type)
+
+def test_push_back(empty_match):
+    match = empty_match()
+    for self_index in range(cols**2):
+        for target_index in range(cols**2):
+            if target_index == self_index:
+                continue
+            mate = match.create_mate(1, [], 'axe', self_index)
+            target = match.create_mate(2, [], 'axe', target_index)
+            mate.push_back(target)
+            assert match.index(target) == original_push_index(self_index, target_index, cols), (self_index, target_index)
+            match.set_cell(match.index(mate), None)
+            match.set_cell(match.index(target), None)
@@ -0,0 +1,104 @@
+''' hits: get_hit_damage and change_health have to give the results of change_health before
+the direction table, copied below as it was '''
+import random
+
+import engine
+
+cols = engine.cols
+
+def original_direction(mate1, mate2):
+    ''' get the direction between two mates, used for shields damage reduction '''
+    cols = mate1.match.cols
+    mate1_index = mate1.match.index(mate1)
+    mate2_index = mate2.match.index(mate2)
+
+    mate1_col = mate1_index%cols
+    mate1_row = (mate1_index-mate1_col)/cols
+
+    mate2_col = mate2_index%cols
+    mate2_row = (mate2_index-mate2_col)/cols
+
+    if mate1_row == mate2_row:
+        return 'side'
+    if mate1_row > mate2_row:
+        if mate1.team > mate2.team:
+            return 'front'
+        else: return 'back'
+    if mate1_row < mate2_row:
+        if mate1.team > mate2.team:
+            return 'back'
+        else: return 'front'
+
+def original_hit(self, damage, source, pierce):
+    ''' change_health(damage, 0, source, pierce) as it was, without changing the Mate,
+    returns the health damage, the armor left and the events emitted '''
+    events = []
+    armor = self.armor
+    if pierce:
+        armor_block_front = 0.
+        armor_block_side = 0.
+    else:
+        armor_block_front = self.armor_block_front
+        armor_block_side = self.armor_block_side
+
+    if self.status_effects.has('shield raised'):
+        damage_reduction_front = 1.5 * self.damage_reduction_front
+        damage_reduction_side = 1.5 * self.damage_reduction_side
+    elif self.status_effects.has('shield broken'):
+        damage_reduction_front = 0.5 * self.damage_reduction_front
+        damage_reduction_side = 0.5 * self.damage_reduction_side
+    else:
+        damage_reduction_front = self.damage_reduction_front
+        damage_reduction_side = self.damage_reduction_side
+
+    direction = original_direction(self, source)
+    if direction == 'front':
+        damage = (1-damage_reduction_front) * damage
+        armor_damage = armor_block_front * damage
+        damage = (1-armor_block_front) * damage
+    elif direction == 'side':
+        damage = (1-damage_reduction_side) * damage
+        armor_damage = armor_block_side * damage
+        damage = (1-armor_block_side) * damage
+    else:
+        armor_damage = 0
+        events.append('hit_from_back')
+    if armor_damage > armor:
+        damage += armor_damage - armor
+        armor = 0
+        events.append('armor_broken')
+    else:
+        armor -= armor_damage
+    return damage, armor, events
+
+def create_random_board(rng, empty_match):
+    ''' a board with up to 16 Mates of random weapons, armor and shields on random cells '''
+    match = empty_match()
+    for index in rng.sample(range(cols**2), rng.randrange(2, 17)):
+        mate = match.create_mate(rng.choice((1, 2)), [], rng.choice(list(engine.weapon_data)), index)
+        mate.armor = rng.choice((0., rng.uniform(0., mate.max_armor)))
+        shield = rng.choice((None, 'shield raise', 'shield breaker'))
+        if shield is not None:
+            mate.create_status_effect(engine.Ability(shield), mate)
+    return match
+
+def test_hits_match_original_change_health(empty_match):
+    rng = random.Random(0)
+    for board in range(200):
+        match = create_random_board(rng, empty_match)
+        mates = match.get_mates()
+        attacker = rng.choice(mates)
+        targets = [mate for mate in mates if mate is not attacker]
+        damage = rng.uniform(0., 60.)
+        pierce = rng.random() < 0.3
+        expected = [original_hit(target, damage, attacker, pierce) for target in targets]
+        assert match.get_hit_damage(attacker, targets, damage, pierce).tolist() == [hit[0] for hit in expected], board
+        for target, (health_damage, armor, events) in zip(targets, expected):
+            clone = match.clone()
+            emitted = []
+            clone.listener = lambda event, *args: emitted.append(event)
+            clone_target = clone.cells[match.index(target)]
+            clone_target.change_health(damage, 0, source=clone.cells[match.index(attacker)], pierce=pierce)
+            assert clone_target.health == target.health - health_damage, board
+            assert clone_target.armor == armor, board
+            assert [event for event in emitted if event != 'mate_died'] == events, board
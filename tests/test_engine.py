@@ -0,0 +1,68 @@
+''' the tick loop of engine.Match '''
+import pytest
+
+import engine
+
+def test_tick_advances_all_mates_past_a_ready_one(empty_match):
+    # the widgets before the engine stopped ticking the Mates after the first one getting
+    # ready for the rest of the frame, now a tick always advances every Mate
+    match = empty_match()
+    first = match.create_mate(1, [], 'axe', 0)
+    second = match.create_mate(2, [], 'axe', 1)
+    first.t = first.max_t - 1
+    second.t = 0.
+    assert match.update(1) is first
+    assert first.t == first.max_t
+    assert second.t == 1.
+    assert match.turn == 1
+
+def test_action_targets_follow_owned_ability_copies(empty_match):
+    match = empty_match()
+    mate = match.create_mate(1, [], 'axe', match.cell(3, 3))
+    match.create_mate(2, [], 'axe', match.cell(3, 4))
+    attack = mate.abilities[1]
+    assert attack in match.get_action_targets(mate)
+    # a clone shares the Abilities, changing one gives the Mate its own copy in the same turn
+    clone = match.clone()
+    clone_mate = clone.cells[match.index(mate)]
+    assert attack in clone.get_action_targets(clone_mate)
+    copy = clone_mate.own_ability(attack)
+    assert copy is not attack
+    targets = clone.get_action_targets(clone_mate)
+    assert copy in targets
+    assert attack not in targets
+
+def test_teams_that_do_not_fit_are_rejected():
+    team = engine.standard_teams[2]
+    with pytest.raises(ValueError):
+        engine.Match('standard', seed=0, teams={1: team * 4, 2: team})
+    with pytest.raises(ValueError):
+        engine.Match('standard', seed=0, teams={1: [], 2: team})
+    with pytest.raises(ValueError):
+        engine.Match('standard', cols=3, seed=0)
+    with pytest.raises(ValueError):
+        engine.Match('standard', cols=7, rows=3, seed=0)
+
+def test_summons_reuse_the_rows_of_dead_mates(empty_match):
+    match = empty_match()
+    caster = match.create_mate(1, [], 'axe', 0)
+    ability = engine.Ability('summon zombie')
+    zombie = match.create_summon(1, 1, ability)
+    zombie.create_status_effect(engine.Ability('burn'), caster)
+    zombie.health = -5.
+    zombie.die()
+    row = zombie.row
+    size = match.roster.size
+    for i in range(10):
+        summon = match.create_summon(1, 1, ability)
+        assert summon.row == row
+        summon.die()
+    assert match.roster.size == size
+    # the dead Mate keeps its numbers and StatusEffects in a Roster of its own
+    assert not zombie.alive
+    assert zombie.health == -5.
+    assert zombie.status_effects.has('burning')
+    assert zombie.status_effects.get('burning').t == 200.
+    clone = match.clone()
+    assert clone.roster.size == size
+    assert clone.create_summon(1, 1, ability).row == row
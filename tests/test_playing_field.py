@@ -0,0 +1,59 @@
+''' the board widget, run headless with an offscreen window '''
+import math
+import os
+
+import pytest
+
+kivy = pytest.importorskip('kivy')
+from kivy.base import EventLoop
+from kivy.lang import Builder
+from kivy.uix.popup import Popup
+
+import main
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='module')
+def game():
+    EventLoop.ensure_window()
+    Builder.load_file(os.path.join(root, 'magicmates.kv'))
+    game = main.MagicMatesGame()
+    playing_field = game.ids['playing_field']
+    playing_field.shown = True
+    playing_field.update_ticking()
+    yield game
+    playing_field.shown = False
+    playing_field.update_ticking()
+
+def test_dismissing_a_popup_twice_resumes_ticking(game):
+    playing_field = game.ids['playing_field']
+    assert playing_field in main.ticker.tickables
+    popup = Popup()
+    playing_field.open_popup(popup)
+    assert playing_field not in main.ticker.tickables
+    # a double tap on the button of the popup dismisses it again while it fades out,
+    # Kivy then dispatches on_dismiss twice
+    popup.dismiss()
+    popup.dismiss()
+    assert not playing_field.open_popups
+    assert playing_field in main.ticker.tickables
+    # the next popup still stops the timer until it is gone
+    other = Popup()
+    playing_field.open_popup(other)
+    assert playing_field not in main.ticker.tickables
+    other.dismiss()
+    assert playing_field in main.ticker.tickables
+
+def test_replay_saved_only_for_played_matches(game, tmp_path, monkeypatch):
+    playing_field = game.ids['playing_field']
+    path = tmp_path / 'replays' / 'last.replay'
+    monkeypatch.setattr(main, 'replay_path', str(path))
+    playing_field.start_game('standard')
+    playing_field.start_game('standard')
+    assert not path.exists()
+    match = playing_field.match
+    while match.active is None:
+        match.update(math.inf)
+    match.use_ability(match.active, match.active.abilities[-1], None)
+    playing_field.start_game('standard')
+    assert path.exists()
@@ -0,0 +1,61 @@
+''' recording a match and playing it back with replay.Replay '''
+import math
+
+import pytest
+
+import engine
+import replay
+
+def get_state(match):
+    ''' everything a turn depends on, the Mates by their Roster row '''
+    roster = match.roster
+    mates = [(mate.alive, [(ability.base, ability.manacost, ability.experience, sorted(ability.upgrades))
+            for ability in mate.abilities]) for mate in roster.mates]
+    numbers = [getattr(roster, name)[:roster.size].tolist() for name in roster.get_array_names()]
+    return match.t, match.turn, match.winner, [cell and cell.row for cell in match.cells], mates, numbers
+
+def record(seed, turns=80):
+    ''' a random_ai match of both teams, returns the replay data and the state at each turn start '''
+    match = engine.Match('standard', seed=seed)
+    recorder = replay.Recorder(match)
+    states = []
+    def controller(match, mate):
+        states.append(get_state(match))
+        return engine.random_ai(match, mate)
+    match.controllers = {1: controller, 2: controller}
+    while match.winner is None and match.turn < turns:
+        match.update(math.inf)
+    return recorder.to_bytes(), states, get_state(match)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_replay_reproduces_the_match(seed):
+    data, states, end = record(seed)
+    playback = replay.Replay(data, keyframe_interval=10)
+    assert len(playback) == len(states)
+    # forward, then back across keyframes, then forward from a keyframe
+    turns = [0, 1, 25, len(states) - 1, 12, 3, 37, 20]
+    for turn in turns:
+        match = playback.seek(turn)
+        assert match.active is match.get_ready_mate()
+        assert get_state(match) == states[turn], turn
+    assert set(playback.keyframes) == set(range(0, len(states), 10))
+    if end[2] is not None:
+        assert get_state(playback.seek(len(playback))) == end
+
+def test_replay_survives_a_file(tmp_path):
+    match = engine.Match('standard', seed=5)
+    recorder = replay.Recorder(match)
+    match.controllers = {1: engine.random_ai, 2: engine.random_ai}
+    while match.winner is None and match.turn < 30:
+        match.update(math.inf)
+    path = tmp_path / 'match.replay'
+    recorder.save(path)
+    playback = replay.Replay.load(path)
+    assert get_state(playback.seek(len(playback) - 1)) == get_state(replay.Replay(recorder.to_bytes()).seek(len(playback) - 1))
+
+def test_bad_header_raises_replay_error():
+    data = replay.Recorder(engine.Match('standard', seed=0)).to_bytes()
+    with pytest.raises(replay.ReplayError):
+        replay.Replay(b'XXXX' + data[4:])
+    with pytest.raises(replay.ReplayError):
+        replay.Replay(data[:4] + bytes([replay.version + 1]) + data[5:])
@@ -0,0 +1,62 @@
+''' the Scheduler against the plain tick loop: seeded matches have to play out identically '''
+import math
+
+import pytest
+
+import engine
+
+class TickLoop():
+    ''' the timer the Scheduler replaced: Match.tick until a Mate is ready '''
+    def __init__(self, match):
+        self.match = match
+
+    def start_turn(self):
+        pass
+
+    def end_turn(self, mates=()):
+        pass
+
+    def add(self, mate):
+        pass
+
+    def remove(self, mate):
+        pass
+
+    def advance(self, max_ticks=math.inf):
+        match = self.match
+        ticks = 0
+        while ticks < max_ticks and match.winner is None and match.get_ready_mate() is None:
+            assert ticks < 10**6, 'no Mate gets ready'
+            match.tick()
+            ticks += 1
+        return ticks
+
+def play(tick_loop, seed, cols=engine.cols, rows=None, max_turns=400, max_ticks=math.inf):
+    ''' play a match between random_ai teams, returns the abilities used and the final numbers '''
+    used = []
+    def listener(event, *args):
+        if event == 'ability_used':
+            mate, ability = args
+            used.append((match.t, match.turn, mate.row, mate.team, ability.base))
+    match = engine.Match('standard', cols=cols, rows=rows, seed=seed, listener=listener)
+    if tick_loop:
+        match.scheduler = TickLoop(match)
+    match.controllers = {1: engine.random_ai, 2: engine.random_ai}
+    while match.winner is None and match.turn < max_turns:
+        match.update(max_ticks)
+    roster = match.roster
+    numbers = [getattr(roster, name)[:roster.size].tolist() for name in roster.get_array_names()]
+    return used, match.winner, numbers
+
+@pytest.mark.parametrize('seed', range(8))
+def test_scheduler_matches_tick_loop(seed):
+    assert play(False, seed) == play(True, seed)
+
+@pytest.mark.parametrize('seed', range(2))
+def test_scheduler_matches_tick_loop_on_rectangular_board(seed):
+    assert play(False, seed, cols=9, rows=6) == play(True, seed, cols=9, rows=6)
+
+@pytest.mark.parametrize('max_ticks', [1, 7])
+def test_scheduler_matches_tick_loop_frame_by_frame(max_ticks):
+    # the widgets advance the timer by a few ticks per frame
+    assert play(False, 0, max_ticks=max_ticks) == play(True, 0, max_ticks=max_ticks)
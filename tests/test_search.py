@@ -0,0 +1,25 @@
+''' the SearchAI controller '''
+import math
+
+import engine
+import search
+
+def test_search_ai_without_time_plays_best_first_ply_action():
+    match = engine.Match('standard', seed=3)
+    mate = match.get_ready_mate()
+    while mate is None:
+        match.scheduler.advance(math.inf)
+        mate = match.get_ready_mate()
+    ai = search.SearchAI(time_budget=0.)
+    ability, index = ai(match, mate)
+    assert ai.depth == 1
+    # the value of every action after one ply, as the search plays it out
+    h = ai.hasher.hash(match, mate)
+    ai.deadline = math.inf
+    values = {}
+    for action in search.get_actions(match, mate):
+        child, child_mate = ai.play(match, mate, action, h)
+        values[action] = search.evaluate(child, mate.team)
+    assert len(set(values.values())) > 1
+    position = [id(a) for a in mate.abilities].index(id(ability))
+    assert values[(position, index)] == max(values.values())
@@ -0,0 +1,144 @@
+''' self-play tournament for balance testing
+
+    python tournament.py --matches 1000
+    python tournament.py --compositions teams.json --matches 100000 --json report.json
+
+Plays seeded headless matches between every ordered pair of compositions on a process pool
+and reports win rates, match lengths and per-ability usage and damage. Mirror matches are
+played too, showing the advantage of the side. A composition is a
+list of (weapon, abilities) per Mate, as in engine.standard_teams; a compositions file is a
+json object mapping names to such lists. Without one the two standard teams play.
+Match k of a pairing uses the seed k, so runs are reproducible whatever the pool size.
+'''
+import argparse
+import collections
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import time
+
+import numpy as np
+
+import engine
+
+class Recorder():
+    ''' counts the uses of each ability and the health and armor its direct hits took from enemies '''
+    def __init__(self, controller):
+        self.controller = controller
+        self.uses = collections.Counter()
+        self.damage = collections.Counter()
+        self.enemy_total = 0.
+
+    def get_enemy_total(self, match, team):
+        roster = match.roster
+        size = roster.size
+        # dead rows may go to a summon of either team
+        enemies = (roster.team[:size] != team) & roster.alive[:size]
+        return float(np.sum(np.maximum(roster.health[:size][enemies], 0.) + roster.armor[:size][enemies]))
+
+    def __call__(self, match, mate):
+        self.enemy_total = self.get_enemy_total(match, mate.team)
+        return self.controller(match, mate)
+
+    def on_event(self, event, *args):
+        if event == 'ability_used':
+            mate, ability = args
+            self.uses[ability.base] += 1
+            self.damage[ability.base] += self.enemy_total - self.get_enemy_total(mate.match, mate.team)
+
+def get_controller(ai, time_budget):
+    if ai == 'search':
+        # imported here so the workers only build a SearchAI when asked to
+        from search import SearchAI
+        return SearchAI(time_budget=time_budget)
+    return engine.random_ai
+
+def play(job):
+    ''' play a single match, job is (name1, composition1, name2, composition2, seed, ai, time_budget, max_turns) '''
+    name1, composition1, name2, composition2, seed, ai, time_budget, max_turns = job
+    recorder = Recorder(get_controller(ai, time_budget))
+    match = engine.Match('standard', seed=seed, listener=recorder.on_event,
+            teams={1: composition1, 2: composition2})
+    match.controllers = {1: recorder, 2: recorder}
+    while match.winner is None and match.turn < max_turns:
+        match.update(math.inf)
+    return name1, name2, match.winner, match.turn, match.t, recorder.uses, recorder.damage
+
+def run(compositions, matches, processes=None, ai='random', time_budget=0.1, max_turns=1000):
+    ''' play matches matches per ordered pair of compositions, returns the report as a dict '''
+    for name, composition in compositions.items():
+        try:
+            engine.Match('standard', seed=0, teams={1: composition, 2: composition})
+        except ValueError as error:
+            raise ValueError('composition {}: {}'.format(name, error)) from None
+    jobs = [(name1, compositions[name1], name2, compositions[name2], seed, ai, time_budget, max_turns)
+            for name1 in compositions for name2 in compositions
+            for seed in range(matches)]
+    pairings = collections.defaultdict(lambda: {'matches': 0, 'wins 1': 0, 'wins 2': 0, 'draws': 0, 'turns': [], 'ticks': []})
+    uses = collections.Counter()
+    damage = collections.Counter()
+    start = time.perf_counter()
+    processes = processes or os.cpu_count()
+    # chunks big enough to keep the overhead of the pool low, small enough to balance the load
+    chunksize = max(1, min(64, len(jobs) // (8 * processes)))
+    with multiprocessing.Pool(processes) as pool:
+        for name1, name2, winner, turns, ticks, match_uses, match_damage in pool.imap_unordered(play, jobs, chunksize):
+            pairing = pairings[name1 + ' vs ' + name2]
+            pairing['matches'] += 1
+            if winner is None:
+                pairing['draws'] += 1
+            else:
+                pairing['wins {}'.format(winner)] += 1
+            pairing['turns'].append(turns)
+            pairing['ticks'].append(ticks)
+            uses.update(match_uses)
+            damage.update(match_damage)
+    seconds = time.perf_counter() - start
+    report = {'matches': len(jobs), 'seconds': seconds, 'pairings': {}, 'abilities': {}}
+    for name, pairing in sorted(pairings.items()):
+        n = pairing['matches']
+        report['pairings'][name] = {'matches': n,
+                'win rate 1': pairing['wins 1'] / n, 'win rate 2': pairing['wins 2'] / n, 'draw rate': pairing['draws'] / n,
+                'mean turns': statistics.mean(pairing['turns']), 'median turns': statistics.median(pairing['turns']),
+                'mean ticks': statistics.mean(pairing['ticks'])}
+    for name in sorted(uses, key=uses.get, reverse=True):
+        report['abilities'][name] = {'uses': uses[name], 'damage': damage[name], 'damage per use': damage[name] / uses[name]}
+    return report
+
+def print_report(report):
+    print('{} matches in {:.1f} s ({:.0f} matches/s)'.format(report['matches'], report['seconds'], report['matches'] / report['seconds']))
+    print()
+    print('{:<40} {:>8} {:>7} {:>7} {:>7} {:>8} {:>8}'.format('pairing', 'matches', 'win 1', 'win 2', 'draw', 'turns', 'ticks'))
+    for name, pairing in report['pairings'].items():
+        print('{:<40} {:>8} {:>7.1%} {:>7.1%} {:>7.1%} {:>8.1f} {:>8.1f}'.format(name, pairing['matches'],
+                pairing['win rate 1'], pairing['win rate 2'], pairing['draw rate'], pairing['mean turns'], pairing['mean ticks']))
+    print()
+    print('{:<24} {:>10} {:>12} {:>10}'.format('ability', 'uses', 'damage', 'per use'))
+    for name, ability in report['abilities'].items():
+        print('{:<24} {:>10} {:>12.0f} {:>10.2f}'.format(name, ability['uses'], ability['damage'], ability['damage per use']))
+
+def main():
+    parser = argparse.ArgumentParser(description='self-play tournament between team compositions')
+    parser.add_argument('--compositions', help='json file mapping names to lists of [weapon, [abilities]]')
+    parser.add_argument('--matches', type=int, default=100, help='matches per ordered pair of compositions')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, all cores by default')
+    parser.add_argument('--ai', choices=('random', 'search'), default='random', help='controller of both teams')
+    parser.add_argument('--time-budget', type=float, default=0.1, help='seconds per turn of the search ai')
+    parser.add_argument('--max-turns', type=int, default=1000, help='matches still running after this are draws')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    if args.compositions:
+        with open(args.compositions) as f:
+            compositions = json.load(f)
+    else:
+        compositions = {'standard 1': engine.standard_teams[1], 'standard 2': engine.standard_teams[2]}
+    report = run(compositions, args.matches, args.processes, args.ai, args.time_budget, args.max_turns)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()